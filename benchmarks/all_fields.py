@@ -0,0 +1,107 @@
+"""
+Compares the latency of searching all text of a content type in a language with a `multi_match` over every localized
+field and with a `match` on its `_all_<locale>` field (see `ALL_FIELDS`), as well as the size of both indices.
+
+Needs a running cluster (see `ELASTIC_HOST`), the indices it creates are removed afterwards.
+
+    CF_SPACE_ID=x CF_ACCESS_TOKEN=x python -m benchmarks.all_fields [--documents 10000] [--fields 20] [--queries 500]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from elasticsearch.helpers import bulk
+
+from benchmarks.vocabulary import words
+from cf_es_mirror.config import Config, config
+
+
+LOCALE = "en"
+
+
+def content_type(fields):
+    from cf_es_mirror.contentful import ContentType
+    return ContentType({
+        "sys": {"id": "benchmark", "type": "ContentType", "space": {"sys": {"id": config.SPACE_ID}}},
+        "fields": [{"id": f"text{i}", "type": "Text", "localized": True} for i in range(fields)],
+    })
+
+
+def documents(index, amount, fields, seed=42):
+    rnd = random.Random(seed)
+    for i in range(amount):
+        yield {
+            "_index": index,
+            "_id": f"entry{i}",
+            "_source": {
+                "sys": {"id": f"entry{i}", "type": "Entry"},
+                "fields": {f"text{f}": {LOCALE: words(rnd, rnd.randint(5, 50))} for f in range(fields)},
+            },
+        }
+
+
+def create(index, fields, all_fields, documents_amount):
+    Config.instance.ALL_FIELDS = ["benchmark"] if all_fields else []
+    ct = content_type(fields)
+    config.elastic.indices.create(index=index, body=ct.get_settings(), wait_for_active_shards=1)
+    config.elastic.indices.put_mapping(ct.build_mapping(), index=index)
+    bulk(config.elastic, documents(index, documents_amount, fields), chunk_size=config.ELASTIC_BULK_SIZE)
+    config.elastic.indices.forcemerge(index=index, max_num_segments=1)
+    config.elastic.indices.refresh(index=index)
+    return config.elastic.indices.stats(index=index)["indices"][index]["primaries"]["store"]["size_in_bytes"]
+
+
+def measure(index, queries):
+    """
+    Runs each query body against `index`, returning the "took" and wall clock time of each in milliseconds.
+    """
+    took, wall = [], []
+    for body in queries:
+        start = time.perf_counter()
+        response = config.elastic.search(index=index, body=body, request_cache=False)
+        wall.append((time.perf_counter() - start) * 1000)
+        took.append(response["took"])
+    return took, wall
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    Config.from_env()
+    rnd = random.Random(7)
+    terms = [words(rnd, rnd.randint(1, 3)) for _ in range(args.queries)]
+    paths = [f"fields.text{i}.{LOCALE}" for i in range(args.fields)]
+    variants = {
+        "multi_match": ("benchmark-multi-match", False, [
+            {"query": {"multi_match": {"query": term, "fields": paths}}} for term in terms
+        ]),
+        "_all": ("benchmark-all-fields", True, [
+            {"query": {"match": {f"_all_{LOCALE}": term}}} for term in terms
+        ]),
+    }
+
+    print(f"{args.documents} documents, {args.fields} text fields, {args.queries} queries")
+    print(f"{'query':<12} {'bytes':>12} {'took p50':>9} {'took p95':>9} {'wall p50':>9} {'wall p95':>9}")
+    try:
+        for name, (index, all_fields, queries) in variants.items():
+            size = create(index, args.fields, all_fields, args.documents)
+            measure(index, queries[:50])  # Warm up the caches first.
+            took, wall = measure(index, queries)
+            print(f"{name:<12} {size:>12,} {statistics.median(took):>7.1f}ms {percentile(took, 0.95):>7.1f}ms "
+                  f"{statistics.median(wall):>7.1f}ms {percentile(wall, 0.95):>7.1f}ms")
+    finally:
+        for index, _, _ in variants.values():
+            config.elastic.indices.delete(index=index, ignore=[404])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Measures the throughput of extracting the text of RichText documents (see `cf_es_mirror.contentful.richtext`), for
+large documents made up of many blocks and for deeply nested ones, compared to a plain recursive walk.
+
+    CF_SPACE_ID=x CF_ACCESS_TOKEN=x python -m benchmarks.richtext [--documents 100] [--paragraphs 1000] [--depth 5000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.vocabulary import words
+from cf_es_mirror.config import Config
+
+
+def text(rnd, amount, marks=()):
+    return {"nodeType": "text", "value": words(rnd, amount) + " ",
+            "marks": [{"type": mark} for mark in marks], "data": {}}
+
+
+def node(node_type, content, data=None):
+    return {"nodeType": node_type, "content": content, "data": data or {}}
+
+
+def paragraph(rnd):
+    content = []
+    for _ in range(rnd.randint(1, 6)):
+        if rnd.random() < 0.1:
+            content.append(node("hyperlink", [text(rnd, 3)], {"uri": "https://example.com"}))
+        else:
+            content.append(text(rnd, rnd.randint(3, 20), marks=("bold",) if rnd.random() < 0.2 else ()))
+    return node("paragraph", content)
+
+
+def large_document(rnd, paragraphs):
+    """
+    A long article: headings, paragraphs, lists and embedded entries.
+    """
+    content = []
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            content.append(node("heading-2", [text(rnd, 5)]))
+        if i % 10 == 5:
+            content.append(node("unordered-list", [node("list-item", [paragraph(rnd)]) for _ in range(3)]))
+        elif i % 25 == 7:
+            content.append(node("embedded-entry-block", [], {"target": {"sys": {"id": "x", "type": "Link", "linkType": "Entry"}}}))
+        else:
+            content.append(paragraph(rnd))
+    return node("document", content)
+
+
+def nested_document(rnd, depth):
+    """
+    Lists nested `depth` deep, as pasted content sometimes ends up.
+    """
+    document = paragraph(rnd)
+    for _ in range(depth):
+        document = node("unordered-list", [node("list-item", [paragraph(rnd), document])])
+    return node("document", [document])
+
+
+def count_nodes(document) -> int:
+    count = 0
+    stack = [document]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.get("content", []))
+    return count
+
+
+def recursive_walk(node):
+    if not isinstance(node, dict):
+        return ""
+    if node.get("nodeType") == "text":
+        return node.get("value", "")
+    return " ".join(recursive_walk(child) for child in node.get("content", []))
+
+
+def recursive_text(document):
+    """
+    The straightforward recursive walk, for comparison. Collapses whitespace like `extract_text` does.
+    """
+    return " ".join(recursive_walk(document).split())
+
+
+def measure(extract, documents, rounds):
+    """
+    Returns the best time to extract the text of all `documents`, or None if `extract` fails on them.
+    """
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        try:
+            for document in documents:
+                extract(document)
+        except RecursionError:
+            return None
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    Config.from_env()
+    from cf_es_mirror.contentful.richtext import extract_text
+
+    rnd = random.Random(42)
+    shapes = {
+        "large": [large_document(rnd, args.paragraphs) for _ in range(args.documents)],
+        "nested": [nested_document(rnd, args.depth) for _ in range(max(1, args.documents // 10))],
+    }
+    print(f"best of {args.rounds} rounds")
+    print(f"{'shape':<8} {'walk':<10} {'documents':>9} {'nodes':>10} {'time':>9} {'nodes/s':>12} {'docs/s':>9}")
+    for shape, documents in shapes.items():
+        nodes = sum(count_nodes(document) for document in documents)
+        for name, extract in (("iterative", extract_text), ("recursive", recursive_text)):
+            elapsed = measure(extract, documents, args.rounds)
+            if elapsed is None:
+                print(f"{shape:<8} {name:<10} {len(documents):>9} {nodes:>10,} {'RecursionError':>31}")
+                continue
+            print(f"{shape:<8} {name:<10} {len(documents):>9} {nodes:>10,} {elapsed * 1000:>7.1f}ms "
+                  f"{nodes / elapsed:>12,.0f} {len(documents) / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
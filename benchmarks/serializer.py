@@ -0,0 +1,87 @@
+"""
+Compares the cost of serializing bulk requests with the `json` module and with `orjson`, and the amount of bytes
+saved by compressing them (see `ELASTIC_COMPRESS`).
+
+    CF_SPACE_ID=x CF_ACCESS_TOKEN=x python -m benchmarks.serializer [--documents 10000]
+"""
+import argparse
+import gzip
+import random
+import time
+
+from benchmarks.vocabulary import words
+from cf_es_mirror.config import Config
+
+
+def documents(amount, seed=42):
+    """
+    Entries shaped like the delivery API returns them, with a handful of localized fields.
+    """
+    rnd = random.Random(seed)
+    for i in range(amount):
+        yield {
+            "sys": {
+                "id": f"entry{i}",
+                "type": "Entry",
+                "revision": rnd.randint(1, 20),
+                "createdAt": "2021-03-01T12:00:00.000Z",
+                "updatedAt": "2021-03-02T12:00:00.000Z",
+                "locale": "en",
+            },
+            "fields": {
+                "title": {"en": words(rnd, 5), "nl": words(rnd, 5)},
+                "slug": {"en": f"entry-{i}"},
+                "summary": {"en": words(rnd, 30), "nl": words(rnd, 30)},
+                "body": {"en": words(rnd, 300), "nl": words(rnd, 300)},
+                "tags": {"en": [words(rnd, 1) for _ in range(5)]},
+                "rating": {"en": rnd.random() * 5},
+            },
+        }
+
+
+def bulk_lines(docs):
+    for doc in docs:
+        yield {"index": {"_index": "space-article", "_id": doc["sys"]["id"]}}
+        yield doc
+
+
+def measure(codec, lines, rounds):
+    """
+    Serializes `lines` into a bulk request body the way the elastic client does, returning the best time and the body.
+    """
+    Config.instance.SERIALIZER = codec
+    from cf_es_mirror.serializer import JSONSerializer
+    serializer = JSONSerializer()
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        body = "\n".join(serializer.dumps(line) for line in lines).encode("utf-8")
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    start = time.perf_counter()
+    for line in lines[1::2]:
+        serializer.loads(serializer.dumps(line))
+    return best, time.perf_counter() - start, body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    Config.from_env()
+    lines = list(bulk_lines(documents(args.documents)))
+    print(f"{args.documents} documents, best of {args.rounds} rounds")
+    print(f"{'codec':<8} {'dumps':>9} {'round trip':>11} {'bytes':>12} {'gzip bytes':>12} {'gzip time':>10}")
+    for codec in ("json", "orjson"):
+        dumps, round_trip, body = measure(codec, lines, args.rounds)
+        start = time.perf_counter()
+        compressed = gzip.compress(body, compresslevel=6)
+        compress = time.perf_counter() - start
+        print(f"{codec:<8} {dumps * 1000:>7.1f}ms {round_trip * 1000:>9.1f}ms {len(body):>12,} {len(compressed):>12,} "
+              f"{compress * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Random text for the benchmarks. It is made up of a limited vocabulary, like real content, so it compresses and
+analyzes like real content as well.
+
+The benchmarks are run as modules from the root of the repository, so both `benchmarks` and `cf_es_mirror` can be
+imported, e.g.:
+
+    CF_SPACE_ID=x CF_ACCESS_TOKEN=x python -m benchmarks.serializer
+"""
+import random
+import string
+
+
+_vocabulary = random.Random(0)
+VOCABULARY = ["".join(_vocabulary.choices(string.ascii_lowercase, k=_vocabulary.randint(2, 10))) for _ in range(5000)]
+
+
+def words(rnd, amount):
+    """
+    Returns `amount` words picked using `rnd`, separated by spaces.
+    """
+    return " ".join(rnd.choices(VOCABULARY, k=amount))
@@ -0,0 +1,89 @@
+"""
+A minimal ASGI application serving the webhook endpoint, e.g. `uvicorn cf_es_mirror.asgi:application`.
+
+Entries are written using `config.async_elastic`, so a single process can handle many webhooks at the same time without
+a worker thread per request. Requires `aiohttp` to be installed.
+"""
+import asyncio
+
+from requests.structures import CaseInsensitiveDict
+
+from cf_es_mirror.config import Config, config
+from cf_es_mirror import serializer
+from cf_es_mirror.contentful import Entry
+from cf_es_mirror.validation import validate_request
+
+
+WEBHOOK_PATH = "/hooks/v1/webhook-update"
+
+
+async def handle_webhook(obj, action: str):
+    """
+    Runs a validated webhook action (see `validate_request`).
+    Entries use their async write path, anything else is handled in a thread.
+    """
+    if isinstance(obj, Entry):
+        await obj.async_handle(action)
+    else:
+        await asyncio.to_thread(getattr(obj, action))
+
+
+async def webhook_update(headers, body: bytes) -> int:
+    """
+    :returns: The HTTP status code to respond with.
+    """
+    def json_data():
+        return serializer.loads(body) if body else None
+
+    try:
+        validation = validate_request(headers, None, json_data)
+    except ValueError:
+        return 500
+    if validation == -1:
+        return 404
+    elif validation == -2:
+        return 401
+    elif not isinstance(validation, tuple):
+        return 204
+
+    obj, action = validation
+    try:
+        await handle_webhook(obj, action)
+    except Exception:
+        config.logger.exception(f"Failed to handle webhook '{action}'.")
+        return 500
+    return 200
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if "async_elastic" in Config.instance.__dict__:
+                    await config.async_elastic.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    if scope["path"] != WEBHOOK_PATH:
+        status = 404
+    elif scope["method"] != "POST":
+        status = 405
+    else:
+        headers = CaseInsensitiveDict((k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"])
+        status = await webhook_update(headers, await read_body(receive))
+    await send({"type": "http.response.start", "status": status, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
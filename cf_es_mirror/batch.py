@@ -0,0 +1,94 @@
+from cf_es_mirror.bulk import BulkIndexer
+from cf_es_mirror.config import config
+from cf_es_mirror import serializer
+from cf_es_mirror.contentful import Entry
+from cf_es_mirror.util import get_path
+from cf_es_mirror.validation import parse_topic, validate_event
+
+
+def parse_events(data: bytes) -> list:
+    """
+    Parses the events posted to the batch webhook endpoint, either a JSON array or newline delimited JSON.
+    Each event is a `{"topic": ..., "body": ...}` object, the topic and body of a single webhook request.
+
+    :raises ValueError: If the data can't be parsed.
+    """
+    data = data.strip()
+    if data.startswith(b"["):
+        events = serializer.loads(data)
+    else:
+        events = [serializer.loads(line) for line in data.splitlines() if line.strip()]
+    if not isinstance(events, list):
+        raise ValueError("Expected a list of events.")
+    return events
+
+
+def apply_events(events: list) -> list:
+    """
+    Applies a batch of webhook events, writing all entries using a single `_bulk` request.
+
+    Events are applied in order of `sys.version` per document, so the latest version wins regardless of the order
+    the events were delivered in. Content type events go first, these are applied right away (even with
+    `REINDEX_IN_BACKGROUND`) when the batch has entries of the content type, so its index exists for them.
+
+    :returns: The result of each event, in the order they were given. Each result is a dict with a "status", using
+              the status codes of the single webhook endpoint, and an "error" for failed events.
+    """
+    results = [None] * len(events)
+    pending = []
+    for i, event in enumerate(events):
+        topic = parse_topic(event.get("topic")) if isinstance(event, dict) else None
+        if topic is None or not isinstance(event.get("body"), dict):
+            results[i] = {"status": 400, "error": "Invalid event."}
+            continue
+        try:
+            validation = validate_event(*topic, event["body"])
+        except KeyError:
+            validation = None
+        if validation is None or (isinstance(validation, tuple) and not getattr(validation[0], "valid", True)):
+            # Missing sys.id and the like.
+            results[i] = {"status": 400, "error": "Invalid event."}
+            continue
+        if not isinstance(validation, tuple):
+            results[i] = {"status": 204}
+            continue
+        pending.append((i, *validation))
+
+    pending.sort(key=lambda item: (
+        type(item[1]).__name__, item[1].space, str(item[1].document_id), get_path(item[1].data, "sys", "version", default=0)
+    ))
+
+    content_types = {(obj.space, obj.content_type) for _, obj, _ in pending if isinstance(obj, Entry)}
+    for _, obj, _ in pending:
+        if not isinstance(obj, Entry) and (obj.space, obj.document_id) in content_types:
+            obj.in_background = False
+
+    # Large enough to never flush before we do. Webhooks tell us about changes, so we don't look for unchanged documents.
+    indexer = BulkIndexer(batch_size=len(pending) + 1, skip_unchanged=False)
+    entries = []
+    for i, obj, action in pending:
+        if isinstance(obj, Entry):
+            obj.indexer = indexer
+            entries.append((i, obj))
+        try:
+            getattr(obj, action)()
+        except Exception as e:
+            config.logger.exception(f"Failed to apply batched webhook event '{action}'.")
+            results[i] = {"status": 500, "error": str(e)}
+            continue
+        if not isinstance(obj, Entry):
+            results[i] = {"status": 200}
+
+    try:
+        indexer.flush()
+    except Exception as e:
+        config.logger.exception("Failed to apply batched webhook events.")
+        for i, obj in entries:
+            if results[i] is None:
+                results[i] = {"status": 500, "error": str(e)}
+
+    for i, obj in entries:
+        if results[i] is None:
+            # Entries that did not write anything, e.g. drafts when we don't store unpublished content.
+            results[i] = obj.result or {"status": 204}
+    return results
@@ -0,0 +1,405 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from elasticsearch.exceptions import TransportError
+
+from cf_es_mirror.config import config
+from cf_es_mirror.reconcile import sys_version
+from cf_es_mirror.transport import OVERLOADED, CircuitOpenError, overloaded, spool_delete
+from cf_es_mirror.contentful import links
+from cf_es_mirror.contentful.content_type import HASH_FIELD
+from cf_es_mirror.contentful.entry import index_action
+from cf_es_mirror.contentful.schema import alias_names
+from cf_es_mirror.util import get_path, merge
+
+from cf_es_mirror.signals import *
+
+
+class BulkController:
+    """
+    Sizes our bulk requests using AIMD (additive increase, multiplicative decrease), driven by how elastic responds.
+
+    Every bulk request that is accepted within `target_latency` seconds grows the batch size by `step` actions, up to
+    `maximum`, after which the amount of requests we send at the same time grows by one, up to `max_concurrency`.
+    A slow request halves the batch size, a request elastic rejects (429/503, for the request or any of its items)
+    halves both the batch size and the concurrency.
+    """
+
+    def __init__(self, size: int = 500, minimum: int = 50, maximum: int = 5000, step: int = None,
+                 max_concurrency: int = 4, target_latency: float = 5):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.size = min(max(size, minimum), self.maximum)
+        self.step = step or minimum
+        self.max_concurrency = max(max_concurrency, 1)
+        self.concurrency = 1
+        self.target_latency = target_latency
+        self.latency = None
+        self.requests = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def success(self, latency: float):
+        with self.lock:
+            self.requests += 1
+            self.latency = latency
+            if latency > self.target_latency:
+                self.size = max(self.minimum, self.size // 2)
+            elif self.size < self.maximum:
+                self.size = min(self.maximum, self.size + self.step)
+            elif self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+
+    def reject(self, latency: float = None):
+        with self.lock:
+            self.requests += 1
+            self.rejected += 1
+            if latency is not None:
+                self.latency = latency
+            self.size = max(self.minimum, self.size // 2)
+            self.concurrency = max(1, self.concurrency // 2)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "size": self.size,
+                "concurrency": self.concurrency,
+                "latency": self.latency,
+                "requests": self.requests,
+                "rejected": self.rejected,
+            }
+
+
+class BulkIndexer:
+    """
+    Collects entry writes and sends them to elastic using `_bulk` requests.
+
+    Entries created with `indexer=` (see `BulkIndexer.entry`) queue their `store`/`remove` calls here instead of
+    hitting elastic once per document. Use it as a context manager to ensure the last batch is flushed:
+
+        with BulkIndexer() as indexer:
+            for data in documents:
+                indexer.entry(data).publish()
+
+    Without a `batch_size` the size of our requests (and the amount we send at the same time) is decided by
+    `config.bulk_controller`, falling back to `ELASTIC_BULK_SIZE` if `ELASTIC_BULK_ADAPTIVE` is disabled.
+    """
+
+    def __init__(self, batch_size: int = None, refresh=False, cascade=True, skip_unchanged=None):
+        self.fixed_size = batch_size
+        self.refresh = refresh
+        # Whether to skip writing documents elastic has already (see `Config.SKIP_UNCHANGED`), which costs an `mget`
+        #  per flush. This pays off for imports, rather than for writing what we know to be changed.
+        self.skip_unchanged = config.SKIP_UNCHANGED if skip_unchanged is None else skip_unchanged and config.SKIP_UNCHANGED
+        # Whether to re-index the documents embedding the entries we write (see `cf_es_mirror.contentful.links`).
+        self.cascade = cascade
+        # The `(entry, body)` pairs to write, `body` is None for removals.
+        self.actions = []
+        self.indexed = 0
+        self.removed = 0
+        self.failed = 0
+        # Documents we did not write, as elastic has them already.
+        self.skipped = 0
+        # Writes we spooled as elastic was overloaded (see `Config.spool`).
+        self.spooled = 0
+        # Items elastic rejected (429/503) that we sent again.
+        self.retried = 0
+        # The `(expires, aliases)` we looked up per set of alias names, see `lookup_aliases`.
+        self._aliases = {}
+
+    @property
+    def controller(self):
+        return None if self.fixed_size else config.bulk_controller
+
+    @property
+    def batch_size(self) -> int:
+        """
+        The amount of queued actions we flush at, enough to fill every request we may send at the same time.
+        """
+        controller = self.controller
+        if controller is not None:
+            return controller.size * controller.concurrency
+        return self.fixed_size or config.ELASTIC_BULK_SIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def entry(self, data):
+        from cf_es_mirror.contentful import Entry
+        return Entry(data, indexer=self)
+
+    def lookup_aliases(self, names: list) -> set:
+        """
+        Cached version of `Entry.aliases`, so we only check the aliases of each content type once in a while during
+        an import. Not for the whole import, as we have to notice a reindex starting (see `Entry.write_targets`).
+        """
+        key = tuple(names)
+        expires, aliases = self._aliases.get(key, (0, None))
+        if expires <= time.monotonic():
+            aliases = alias_names(config.elastic.indices.get_alias(name=",".join(names), ignore=[404]))
+            self._aliases[key] = (time.monotonic() + config.REINDEX_ALIAS_TTL, aliases)
+        return aliases
+
+    def forget(self, alias: str):
+        """
+        Forget the cached aliases of a content type alias, e.g. after (re)creating a content type index.
+        """
+        for key in [key for key in self._aliases if key[0] == alias]:
+            self._aliases.pop(key, None)
+
+    def index(self, entry, body: dict):
+        self.actions.append((entry, body))
+        if len(self.actions) >= self.batch_size:
+            self.flush()
+
+    def delete(self, entry):
+        self.actions.append((entry, None))
+        if len(self.actions) >= self.batch_size:
+            self.flush()
+
+    def annotate(self, actions, groups):
+        """
+        Sends `annotate_entry_batch` for each group of entries we are about to index, merging the annotations into
+        their bodies. Receivers return a `{id: annotations}` dict for the `(space, id, body)` items they are given.
+        """
+        for (space, content_type), indexes in groups.items():
+            if not annotate_entry_batch.has_receivers_for(content_type):
+                continue
+            annotations = {}
+            for handler, data in annotate_entry_batch.send(content_type, space=space, items=[
+                (space, actions[i][0].document_id, actions[i][1]) for i in indexes
+            ]):
+                if isinstance(data, dict):
+                    for doc_id, value in data.items():
+                        merge(annotations.setdefault(doc_id, {}), value)
+            for i in indexes:
+                entry, body = actions[i]
+                if entry.document_id in annotations:
+                    if entry.shares_data:
+                        # Our body shares its values with the entry (see `Entry.build_body`), don't change its data.
+                        body = copy.deepcopy(body)
+                        actions[i] = (entry, body)
+                    merge(body, annotations[entry.document_id])
+
+    @staticmethod
+    def lines(operations, indexes, spool=False) -> list:
+        """
+        Returns the bulk request lines of the given operations. When spooling, deletes carry the version of the entry
+        they remove (see `cf_es_mirror.transport.Spool.current`).
+        """
+        lines = []
+        for i in indexes:
+            action, document, _, _, version = operations[i]
+            if spool and version is not None:
+                action = spool_delete(action, version)
+            lines.append(action)
+            if document is not None:
+                lines.append(document)
+        return lines
+
+    def request(self, operations, indexes):
+        """
+        Sends the given operations using a single `_bulk` request, reporting back to our controller (if any).
+
+        :returns: The response, or the `TransportError` elastic responded with.
+        """
+        controller = self.controller
+        start = time.monotonic()
+        try:
+            response = config.elastic.bulk(body=self.lines(operations, indexes), refresh=self.refresh)
+        except TransportError as e:
+            if controller is not None and overloaded(e):
+                controller.reject()
+            return e
+        if controller is not None:
+            latency = time.monotonic() - start
+            if any(next(iter(item.values())).get("status") in OVERLOADED for item in response["items"]):
+                controller.reject(latency)
+            else:
+                controller.success(latency)
+        return response
+
+    def send(self, operations) -> list:
+        """
+        Sends the operations to elastic, in requests sized by our controller. Whatever elastic rejects as it is
+        overloaded (429/503) is sent again, up to `ELASTIC_BULK_RETRIES` times, and spooled after that (if we have
+        a spool, see `Config.spool`).
+
+        :returns: The bulk response item of each operation, None for the operations we spooled.
+        :raises TransportError: When elastic fails a request for any other reason, or is still overloaded and we
+                                have no spool.
+        """
+        items = [None] * len(operations)
+        pending = list(range(len(operations)))
+        error = None
+        if not pending:
+            return items
+        for attempt in range(config.ELASTIC_BULK_RETRIES + 1):
+            if attempt:
+                config.logger.info("Elastic rejected %d bulk actions, retrying.", len(pending))
+                self.retried += len(pending)
+                time.sleep(config.ELASTIC_BULK_BACKOFF * 2 ** (attempt - 1))
+            controller = self.controller
+            size = controller.size if controller is not None else len(pending)
+            chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+            workers = min(controller.concurrency if controller is not None else 1, len(chunks))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cf-bulk") as pool:
+                    responses = list(pool.map(lambda chunk: self.request(operations, chunk), chunks))
+            else:
+                responses = [self.request(operations, chunk) for chunk in chunks]
+
+            pending = []
+            error = None
+            for chunk, response in zip(chunks, responses):
+                if isinstance(response, TransportError):
+                    if not overloaded(response):
+                        raise response
+                    error = response
+                    pending.extend(chunk)
+                    continue
+                for i, item in zip(chunk, response["items"]):
+                    items[i] = item
+                    if next(iter(item.values())).get("status") in OVERLOADED:
+                        pending.append(i)
+            if not pending or isinstance(error, CircuitOpenError):
+                # There is no use in retrying while the breaker is open.
+                break
+
+        if pending:
+            if config.spool is not None:
+                config.logger.warning("Elastic is overloaded, spooling %d bulk actions.", len(pending))
+                config.spool.append(self.lines(operations, pending, spool=True))
+                for i in pending:
+                    items[i] = None
+            elif error is not None:
+                raise error
+        return items
+
+    def unchanged(self, actions, documents) -> set:
+        """
+        Looks up the hashes of the documents we are about to write (see `Config.SKIP_UNCHANGED`) using a single `mget`.
+
+        :param documents: The `(alias, document)` pairs to write, per index in `actions`.
+        :returns: The indexes of the actions elastic has all documents of already.
+        """
+        docs = [
+            {"_index": alias, "_id": actions[n][0].document_id, "_source": [HASH_FIELD]}
+            for n, pairs in documents.items()
+            for alias, document in pairs
+        ]
+        if not docs:
+            return set()
+        try:
+            found = iter(config.elastic.mget(body={"docs": docs})["docs"])
+        except TransportError as e:
+            config.logger.warning("Unable to look up the hashes of %d documents, writing them regardless: %s", len(docs), e)
+            return set()
+        unchanged = set()
+        for n, pairs in documents.items():
+            # Consume the results of every document, even once we know one of them changed.
+            if all([get_path(next(found), "_source", HASH_FIELD) == document.get(HASH_FIELD) for alias, document in pairs]):
+                unchanged.add(n)
+        return unchanged
+
+    @property
+    def skip_ratio(self) -> float:
+        """
+        The share of the documents we were asked to index that were skipped as they did not change.
+        """
+        total = self.indexed + self.skipped
+        return self.skipped / total if total else 0.0
+
+    def flush(self):
+        if not self.actions:
+            return
+        actions, self.actions = self.actions, []
+
+        # The entries to index, per `(space, content type)`, as the batch signals are sent per content type.
+        groups = {}
+        for i, (entry, body) in enumerate(actions):
+            if body is not None:
+                groups.setdefault((entry.space, entry.content_type), []).append(i)
+        self.annotate(actions, groups)
+        for (space, content_type), indexes in groups.items():
+            if pre_entry_batch_index.has_receivers_for(content_type):
+                pre_entry_batch_index.send(content_type, space=space, items=[
+                    (space, actions[i][0].document_id, actions[i][1]) for i in indexes
+                ])
+
+        documents = {i: entry.documents(body) for i, (entry, body) in enumerate(actions) if body is not None}
+        unchanged = self.unchanged(actions, documents) if self.skip_unchanged else set()
+
+        operations = []
+        for n, (entry, body) in enumerate(actions):
+            if n in unchanged:
+                # Elastic has this exact document already, there is nothing to write (or to tell anyone about).
+                entry.result = {"status": 200}
+                self.skipped += 1
+            elif body is None:
+                for i, (alias, _) in enumerate(entry.write_targets):
+                    operations.append(({"delete": {"_index": alias, "_id": entry.document_id}}, None, entry if i == 0 else None, None,
+                                       sys_version(entry.data.get("sys", {})) or None))
+                if links.links_for(entry.content_type):
+                    operations.append((*links.references_action(entry, []), None, None, None))
+            else:
+                for i, (alias, document) in enumerate(documents[n]):
+                    # We report on the entry once, using its first document.
+                    operations.append((index_action(alias, entry.document_id), document, entry if i == 0 else None, body, None))
+                if entry.references is not None:
+                    operations.append((*links.references_action(entry, entry.references), None, None, None))
+
+        items = self.send(operations)
+
+        written = {}
+        indexed = {}
+        for (action, document, entry, body, _), item in zip(operations, items):
+            if item is None:
+                # Spooled, as elastic is overloaded.
+                if entry is not None:
+                    entry.result = {"status": 202}
+                    self.spooled += 1
+                continue
+            op_type, result = next(iter(item.items()))
+            status = result.get("status", 500)
+            if entry is None:
+                # Bookkeeping, such as our references, which we don't report on individually.
+                if status >= 300 and status != 404:
+                    config.logger.warning("Bulk %s of '%s' failed: %s", op_type, result.get("_id"), result.get("error"))
+                continue
+            if op_type == "delete":
+                # A missing document is fine, it is not there after all.
+                if status < 300 or status == 404:
+                    entry.result = {"status": 200}
+                    self.removed += 1
+                    links.updated(entry.space, entry.document_id)
+                    written.setdefault(entry.space, []).append(entry.document_id)
+                    if post_entry_remove.has_receivers_for(entry.content_type):
+                        post_entry_remove.send(entry.content_type, space=entry.space, id=entry.document_id)
+                    continue
+            elif status < 300:
+                entry.result = {"status": 200}
+                self.indexed += 1
+                links.updated(entry.space, entry.document_id, body)
+                written.setdefault(entry.space, []).append(entry.document_id)
+                indexed.setdefault((entry.space, entry.content_type), []).append((entry.space, entry.document_id, body))
+                if post_entry_index.has_receivers_for(entry.content_type):
+                    post_entry_index.send(entry.content_type, space=entry.space, id=entry.document_id, body=body)
+                continue
+            entry.result = {"status": status, "error": result.get("error")}
+            self.failed += 1
+            config.logger.warning("Bulk %s of document '%s' (content type '%s.%s') failed: %s", op_type,
+                                  entry.document_id, entry.space, entry.content_type, result.get("error"))
+
+        for (space, content_type), items in indexed.items():
+            if post_entry_batch_index.has_receivers_for(content_type):
+                post_entry_batch_index.send(content_type, space=space, items=items)
+
+        if self.cascade:
+            for space, ids in written.items():
+                links.refresh_referrers(space, ids)
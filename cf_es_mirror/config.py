@@ -1,6 +1,6 @@
 import os
 
-from cf_es_mirror.util import to_bool, to_int, split_dict, split_list, cached_property
+from cf_es_mirror.util import to_bool, to_int, to_float, split_dict, split_dict_list, split_list, cached_property
 
 from elasticsearch import Elasticsearch
 
@@ -10,28 +10,97 @@ class Config:
     NUMBER_OF_SHARDS = 1
     NUMBER_OF_REPLICAS = None  # Set to something to force replicas being made.
     AUTO_EXPAND_REPLICAS = False
+    AUTO_SHARDS = False  # Size the shards of a new content type index on its current index, rather than using NUMBER_OF_SHARDS for all of them.
+    MIN_SHARDS = None  # The least amount of shards AUTO_SHARDS gives an index, NUMBER_OF_SHARDS if not set.
+    MAX_SHARDS = 16  # The most shards AUTO_SHARDS gives an index.
+    SHARD_TARGET_SIZE = 30  # The amount of gigabytes AUTO_SHARDS aims to keep each shard below.
+    SHARD_TARGET_DOCS = 50000000  # The amount of documents AUTO_SHARDS aims to keep each shard below.
     INDEX_PREFIX = None
+    INDEX_LAYOUT = "combined"  # Either "combined" (one index holding all locales) or "per_locale" (one index per locale).
     CT_INDEX = "_content-types"  # STATIC
     REINDEX_INDEX = "_reindex"  # STATIC
+    REFERENCES_INDEX = "_references"  # STATIC
+
+    REINDEX_LEASE_TTL = 60  # The amount of seconds a reindex lock is valid for without a heartbeat of its owner.
+    REINDEX_POLL_INTERVAL = 5  # The amount of seconds between checks (and heartbeats) while waiting for a reindex.
+    REINDEX_KEEP_GENERATIONS = 1  # The amount of previous generations of indices we keep (closed) per content type, to roll back to.
+    REINDEX_KEEP_DAYS = 7  # The amount of days we keep a previous generation of indices for.
+    REINDEX_BACKFILL = True  # Import the entries of a content type from Contentful when its previous index is unexpectedly missing.
+    REINDEX_VERIFY = True  # Compare the documents of a new index with those of the old one after copying them, repairing any stragglers.
+    REINDEX_WARM_QUERIES = []  # Searches (query strings or search bodies) run on new indices before they go live, to warm their caches. Separated by '|' in the environment.
+    REINDEX_WARM_TIMEOUT = 60  # How long (in seconds) we wait for new indices to be ready to serve searches, before giving up on the re-index.
+    REINDEX_WARM_REQUEST_TIMEOUT = 60  # The timeout of the requests warming new indices, never less than the time elastic waits for them.
+    REINDEX_ALIAS_TTL = 5  # The amount of seconds imports cache which aliases exist, so they notice reindexes starting (see `Entry.write_targets`).
+    INDEX_PROFILE = "full"  # The indexing profile of text fields: "minimal", "fulltext", "fuzzy" or "full", see `cf_es_mirror.contentful.content_type.PROFILES`.
+    INDEX_PROFILES = {}  # Maps '<content type>' or '<content type>.<field id>' to the indexing profile of its text fields.
+    RICH_TEXT_SEARCH = False  # Index the plain text of RichText fields (as "fields.<id>-text"), see `cf_es_mirror.contentful.richtext`.
+    RICH_TEXT_SOURCE = True  # Keep the RichText documents themselves in "_source". Set to False to only keep their text.
+    ALL_FIELDS = []  # The content types (or "*" for all) whose indices get an "_all_<locale>" field holding all of their text per locale.
+    ALL_FIELD_TRIGRAMS = False  # Whether the "_all_<locale>" fields get a "trigrams" subfield as well.
+    EAGER_GLOBAL_ORDINALS = True  # Build the global ordinals of keyword fields on refresh, so aggregations on a new index are fast right away.
+    REINDEX_IN_BACKGROUND = False  # Handle content type webhooks using background jobs, rather than during the request. Entries of a new content type are dropped until its job is done.
+    JOB_WORKERS = 2  # The amount of background jobs we run at the same time.
+    JOB_DATABASE = None  # The path of a sqlite database to keep jobs in, so they survive restarts. Jobs are only kept in memory if not set.
+    JOB_HEARTBEAT = 10.0  # How often (in seconds) a process marks the jobs it queued in the job database as its own.
+    JOB_STALE_AFTER = 60.0  # After how many seconds without a heartbeat the jobs of another process are taken over.
 
     ELASTIC_URL = None
     ELASTIC_AUTH = None
     ELASTIC_SSL = False
+    ELASTIC_TIMEOUT = 10  # The default timeout (in seconds) of our requests to elastic.
+    ELASTIC_WRITE_TIMEOUT = 10  # The timeout of writing (or deleting) a single document.
+    ELASTIC_BULK_TIMEOUT = 60  # The timeout of bulk requests.
+    ELASTIC_ALIAS_TIMEOUT = 30  # The timeout of alias changes.
+    ELASTIC_TASK_TIMEOUT = 10  # The timeout of checking on tasks, such as a running reindex.
+    ELASTIC_MAXSIZE = 10  # The amount of connections (per node) we keep open.
+    ELASTIC_MAX_RETRIES = 3  # The amount of times we retry a request on connection errors (and 502, 503 and 504).
+    ELASTIC_RETRY_ON_TIMEOUT = False  # Whether to retry requests that timed out as well.
+    ELASTIC_SNIFF = 0  # Set to the interval (in seconds) to discover the nodes of the cluster in, 0 to disable sniffing.
+    ELASTIC_BREAKER_THRESHOLD = 5  # Stop sending requests after this many 429/503 responses in a row, 0 to disable.
+    ELASTIC_BREAKER_RESET = 30  # The amount of seconds we stop sending requests for, once the breaker opened.
+    ELASTIC_SPOOL = None  # A file to spool writes to while elastic is overloaded, writes fail if not set.
+    ELASTIC_BULK_ADAPTIVE = True  # Size bulk requests (and the amount we send at the same time) by how elastic copes, see `BulkController`.
+    ELASTIC_BULK_SIZE = 500  # The amount of actions per bulk request, the initial amount if adaptive.
+    ELASTIC_BULK_MIN_SIZE = 50  # The smallest amount of actions per adaptive bulk request.
+    ELASTIC_BULK_MAX_SIZE = 5000  # The largest amount of actions per adaptive bulk request.
+    ELASTIC_BULK_CONCURRENCY = 4  # The maximum amount of adaptive bulk requests we send at the same time.
+    ELASTIC_BULK_LATENCY = 5  # The amount of seconds a bulk request may take before we consider elastic busy.
+    ELASTIC_BULK_RETRIES = 3  # The amount of times we retry the bulk actions elastic rejected (429/503).
+    ELASTIC_BULK_BACKOFF = 0.5  # The amount of seconds to wait before the first retry, doubled for every next one.
+    SKIP_UNCHANGED = True  # Store a hash of every document, so imports skip rewriting the documents that did not change.
+    ELASTIC_COMPRESS = False  # Whether to gzip our requests to elastic, which mostly pays off for bulk requests.
+    ELASTIC_ASYNC_MAXSIZE = 100  # The amount of connections (per node) the async client keeps, see `async_elastic`.
 
     # Contentful settings
     API_HOST = None  # The contenful API URL.
     SPACE_ID = None  # The contentful space ID. The space ID to fall back to
     ACCESS_TOKEN = None  # The contentful access token. Only used to do calls to the `SPACE_ID` space
+    SPACE_TOKENS = {}  # Maps <space id> to <access token>, for every space other than `SPACE_ID` we have to make calls to.
     SPACE_MAP = {}  # Maps <space id> to <name>. Useful to ensure indexes are created using easy-to-identify names, rather than a vague space ID.
 
     ACCEPTED_SPACE_IDS = [SPACE_ID]  # The space IDs we accept requests for.
     WEBHOOK_AUTH = {}  # A very crude authentication list.
+    WEBHOOK_BATCH_SIZE = 1000  # The maximum amount of events accepted in one request by the batch webhook endpoint.
+
+    SPACE_CONCURRENCY = 4  # The amount of spaces we process at the same time when mirroring multiple spaces.
+    RATE_LIMIT = None  # The maximum amount of requests per second we do to Contentful, shared by all spaces.
+    CONTENTFUL_GZIP = True  # Whether to ask Contentful for gzip compressed responses.
+
+    SERIALIZER = "orjson"  # Either "orjson" (used when installed, falling back to "json") or "json".
 
     ALLOW_UNPUBLISHED = False  # Do we accept unpublished items. Set to True to also index items that are not published, Set to False (default) for 'production ready' behavior.
 
+    # Link denormalisation settings
+    DENORMALIZE = {}  # Maps '<content type>.<field id>' to a list of field IDs of the linked entries to embed in the link.
+    ENTRY_CACHE_SIZE = 1000  # The amount of linked entries we keep in memory.
+    ENTRY_CACHE_TTL = 60  # The amount of seconds we keep a linked entry in memory.
+    SCHEMA_CACHE_SIZE = 1000  # The amount of content types we keep in memory, see `cf_es_mirror.contentful.schema`.
+    SCHEMA_CACHE_TTL = 60  # The amount of seconds we keep a content type in memory.
+
     # Language settings
     LANGUAGES = ["en"]
     DEFAULT_LANGUAGE = LANGUAGES[0]
+    LOCALE_FALLBACKS = False  # Fill in the values localized fields are missing in a locale from its fallback chain in Contentful, see `fill_fallbacks`.
     LANGUAGE_ANALYZERS = [
         'arabic',
         'armenian',
@@ -75,34 +144,207 @@ class Config:
         space = self.SPACE_MAP.get(space, space)
         return '-'.join([x for x in [prefix, space, name] if x is not None]).lower()
 
+    def index_family(self, name, space: str =None):
+        """
+        Returns the `(alias, locale)` pairs the documents of a content type are written to.
+
+        For the "combined" layout this is just the content type alias (with a `None` locale). For the "per_locale"
+        layout this is one `<alias>-<locale>` alias per language, the content type alias then spans all of them.
+        """
+        alias = self.index(name, space=space)
+        if self.INDEX_LAYOUT == "per_locale":
+            return [(f"{alias}-{lc.lower()}", lc) for lc in self.LANGUAGES]
+        return [(alias, None)]
+
     def content_type_index(self, space: str =None):
         return self.index(self.CT_INDEX, space=space)
 
     def reindex_index(self, space: str =None):
         return self.index(self.REINDEX_INDEX, space=space)
 
+    def references_index(self, space: str =None):
+        return self.index(self.REFERENCES_INDEX, space=space)
+
     @cached_property
     def logger(self):
         from logging import getLogger
         return getLogger("contnetful-es-mirror")
 
     @cached_property
-    def elastic(self) -> Elasticsearch:
+    def jobs(self):
+        from cf_es_mirror.jobs import JobRunner
+        return JobRunner(workers=self.JOB_WORKERS, database=self.JOB_DATABASE, heartbeat=self.JOB_HEARTBEAT,
+                         stale_after=self.JOB_STALE_AFTER)
+
+    def elastic_args(self):
         urls = self.ELASTIC_URL
         if urls:
             urls = list(urls.split(';'))
+        from cf_es_mirror.serializer import JSONSerializer
         kwargs = {
             'use_ssl': self.ELASTIC_SSL,
+            'http_compress': self.ELASTIC_COMPRESS,
+            'serializer': JSONSerializer(),
+            'timeout': self.ELASTIC_TIMEOUT,
         }
         if self.ELASTIC_AUTH:
             kwargs['http_auth'] = self.ELASTIC_AUTH.split(':', 1)
+        return urls, kwargs
+
+    def elastic_timeouts(self) -> dict:
+        """
+        The timeouts per operation of our elastic clients, see `cf_es_mirror.transport.TransportMixin`.
+        """
+        return {
+            'write': self.ELASTIC_WRITE_TIMEOUT,
+            'bulk': self.ELASTIC_BULK_TIMEOUT,
+            'alias': self.ELASTIC_ALIAS_TIMEOUT,
+            'task': self.ELASTIC_TASK_TIMEOUT,
+        }
+
+    @cached_property
+    def elastic(self) -> Elasticsearch:
+        from cf_es_mirror.transport import Transport
+        urls, kwargs = self.elastic_args()
+        kwargs.update({
+            'transport_class': Transport,
+            'timeouts': self.elastic_timeouts(),
+            'breaker': self.breaker,
+            'maxsize': self.ELASTIC_MAXSIZE,
+            'max_retries': self.ELASTIC_MAX_RETRIES,
+            'retry_on_timeout': self.ELASTIC_RETRY_ON_TIMEOUT,
+        })
+        if self.ELASTIC_SNIFF:
+            kwargs.update({
+                'sniff_on_start': True,
+                'sniff_on_connection_fail': True,
+                'sniffer_timeout': self.ELASTIC_SNIFF,
+            })
         return Elasticsearch(urls, **kwargs)
 
     @cached_property
+    def breaker(self):
+        """
+        The circuit breaker of our elastic client, None if disabled, see `cf_es_mirror.transport.CircuitBreaker`.
+        """
+        from cf_es_mirror.transport import CircuitBreaker
+        if self.ELASTIC_BREAKER_THRESHOLD:
+            return CircuitBreaker(threshold=self.ELASTIC_BREAKER_THRESHOLD, reset_after=self.ELASTIC_BREAKER_RESET)
+
+    @cached_property
+    def spool(self):
+        """
+        Where writes go while elastic is overloaded, None if we should fail instead, see `cf_es_mirror.transport.Spool`.
+        """
+        from cf_es_mirror.transport import Spool
+        if self.ELASTIC_SPOOL:
+            return Spool(self.ELASTIC_SPOOL)
+
+    @cached_property
+    def bulk_controller(self):
+        """
+        Sizes our bulk requests, None if disabled, see `cf_es_mirror.bulk.BulkController`.
+        """
+        from cf_es_mirror.bulk import BulkController
+        if self.ELASTIC_BULK_ADAPTIVE:
+            return BulkController(size=self.ELASTIC_BULK_SIZE, minimum=self.ELASTIC_BULK_MIN_SIZE,
+                                  maximum=self.ELASTIC_BULK_MAX_SIZE, max_concurrency=self.ELASTIC_BULK_CONCURRENCY,
+                                  target_latency=self.ELASTIC_BULK_LATENCY)
+
+    @cached_property
+    def async_elastic(self):
+        """
+        The elastic client for async webhook handlers, requires `aiohttp` to be installed.
+        Its connection pool is bound to the event loop it is first used in. Its requests use the same timeouts and
+        circuit breaker as `elastic` (see `cf_es_mirror.transport.AsyncTransport`).
+        """
+        from elasticsearch import AsyncElasticsearch
+        from cf_es_mirror.transport import AsyncTransport
+        urls, kwargs = self.elastic_args()
+        kwargs.update({
+            'transport_class': AsyncTransport,
+            'timeouts': self.elastic_timeouts(),
+            # Shared with our sync client, as both tell us how the same elastic is doing.
+            'breaker': self.breaker,
+            'maxsize': self.ELASTIC_ASYNC_MAXSIZE,
+            'max_retries': self.ELASTIC_MAX_RETRIES,
+            'retry_on_timeout': self.ELASTIC_RETRY_ON_TIMEOUT,
+        })
+        return AsyncElasticsearch(urls, **kwargs)
+
+    @property
     def contentful(self):
+        return self.client(self.SPACE_ID)
+
+    @cached_property
+    def clients(self):
+        return {}
+
+    @cached_property
+    def locale_fallbacks(self):
+        return {}
+
+    def fallback_chains(self, space: str =None) -> dict:
+        """
+        Returns the fallback chains of our `LANGUAGES` in a space as `{locale: [fallback, ...]}`, leaving out the
+        locales without a fallback. These are fetched from Contentful once per space, an empty dict if we can't.
+        """
+        space = space or self.SPACE_ID
+        if space not in self.locale_fallbacks:
+            client = self.client(space)
+            if client is None:
+                return {}
+            fallbacks = {locale["code"]: locale.get("fallbackCode", None) for locale in client.raw_locales()}
+            chains = {}
+            for lc in self.LANGUAGES:
+                chain = []
+                code = fallbacks.get(lc, None)
+                while code and code != lc and code not in chain:
+                    chain.append(code)
+                    code = fallbacks.get(code, None)
+                if chain:
+                    chains[lc] = chain
+            # Another thread may have fetched them in the meantime.
+            self.locale_fallbacks.setdefault(space, chains)
+        return self.locale_fallbacks[space]
+
+    @cached_property
+    def rate_limiter(self):
+        from cf_es_mirror.contentful.client import RateLimiter
+        if self.RATE_LIMIT:
+            return RateLimiter(self.RATE_LIMIT)
+
+    def access_token(self, space: str =None):
+        space = space or self.SPACE_ID
+        if space == self.SPACE_ID:
+            return self.ACCESS_TOKEN
+        return self.SPACE_TOKENS.get(space, None)
+
+    def spaces(self):
+        """
+        Returns all spaces we have credentials for, and accept requests for.
+        """
+        spaces = [space for space in [self.SPACE_ID, *self.SPACE_TOKENS.keys()] if space and self.access_token(space)]
+        if '*' not in self.ACCEPTED_SPACE_IDS:
+            spaces = [space for space in spaces if space in self.ACCEPTED_SPACE_IDS]
+        return list(dict.fromkeys(spaces))
+
+    def client(self, space: str =None):
+        """
+        Returns the (lazily created) Contentful client for the given space, or None if we have no credentials for it.
+        """
         from cf_es_mirror.contentful.client import Client
-        if self.SPACE_ID and self.ACCESS_TOKEN:
-            return Client(api_url=self.API_HOST, space_id=self.SPACE_ID, access_token=self.ACCESS_TOKEN, content_type_cache=False, timeout_s=2)
+        space = space or self.SPACE_ID
+        token = self.access_token(space)
+        if not (space and token):
+            return None
+        if space not in self.clients:
+            client = Client(api_url=self.API_HOST, space_id=space, access_token=token, content_type_cache=False, timeout_s=2,
+                            gzip_encoded=self.CONTENTFUL_GZIP)
+            client.rate_limiter = self.rate_limiter
+            # Clients are shared between threads, so another thread may have beaten us to it.
+            self.clients.setdefault(space, client)
+        return self.clients[space]
 
     instance = None
 
@@ -155,24 +397,88 @@ class Config:
         obj.NUMBER_OF_SHARDS = get("NUMBER_OF_SHARDS", "ELASTIC", cls.NUMBER_OF_SHARDS, conv=to_int)
         obj.NUMBER_OF_REPLICAS = get("NUMBER_OF_REPLICAS", "ELASTIC", cls.NUMBER_OF_REPLICAS, conv=to_int)
         obj.AUTO_EXPAND_REPLICAS = get("AUTO_EXPAND_REPLICAS", "ELASTIC", cls.AUTO_EXPAND_REPLICAS)
+        obj.AUTO_SHARDS = get("AUTO_SHARDS", "ELASTIC", cls.AUTO_SHARDS, conv=to_bool)
+        obj.MIN_SHARDS = get("MIN_SHARDS", "ELASTIC", cls.MIN_SHARDS, conv=to_int)
+        obj.MAX_SHARDS = get("MAX_SHARDS", "ELASTIC", cls.MAX_SHARDS, conv=to_int)
+        obj.SHARD_TARGET_SIZE = get("SHARD_TARGET_SIZE", "ELASTIC", cls.SHARD_TARGET_SIZE, conv=to_float)
+        obj.SHARD_TARGET_DOCS = get("SHARD_TARGET_DOCS", "ELASTIC", cls.SHARD_TARGET_DOCS, conv=to_int)
         obj.INDEX_PREFIX = get("INDEX_PREFIX", "ELASTIC", cls.INDEX_PREFIX)
+        obj.INDEX_LAYOUT = get("INDEX_LAYOUT", "ELASTIC", cls.INDEX_LAYOUT)
+        obj.REINDEX_LEASE_TTL = get("REINDEX_LEASE_TTL", "ELASTIC", cls.REINDEX_LEASE_TTL, conv=to_int)
+        obj.REINDEX_POLL_INTERVAL = get("REINDEX_POLL_INTERVAL", "ELASTIC", cls.REINDEX_POLL_INTERVAL, conv=to_int)
+        obj.REINDEX_KEEP_GENERATIONS = get("REINDEX_KEEP_GENERATIONS", "ELASTIC", cls.REINDEX_KEEP_GENERATIONS, conv=to_int)
+        obj.REINDEX_KEEP_DAYS = get("REINDEX_KEEP_DAYS", "ELASTIC", cls.REINDEX_KEEP_DAYS, conv=to_float)
+        obj.REINDEX_BACKFILL = get("REINDEX_BACKFILL", "ELASTIC", cls.REINDEX_BACKFILL, conv=to_bool)
+        obj.REINDEX_VERIFY = get("REINDEX_VERIFY", "ELASTIC", cls.REINDEX_VERIFY, conv=to_bool)
+        obj.REINDEX_WARM_TIMEOUT = get("REINDEX_WARM_TIMEOUT", "ELASTIC", cls.REINDEX_WARM_TIMEOUT, conv=to_float)
+        obj.REINDEX_WARM_REQUEST_TIMEOUT = get("REINDEX_WARM_REQUEST_TIMEOUT", "ELASTIC", cls.REINDEX_WARM_REQUEST_TIMEOUT, conv=to_float)
+        obj.REINDEX_WARM_QUERIES = get("REINDEX_WARM_QUERIES", "ELASTIC", cls.REINDEX_WARM_QUERIES, conv=split_list, sep="|")
+        obj.REINDEX_ALIAS_TTL = get("REINDEX_ALIAS_TTL", "ELASTIC", cls.REINDEX_ALIAS_TTL, conv=to_float)
+        obj.INDEX_PROFILE = get("INDEX_PROFILE", "ELASTIC", cls.INDEX_PROFILE)
+        obj.INDEX_PROFILES = get("INDEX_PROFILES", "ELASTIC", cls.INDEX_PROFILES, conv=split_dict)
+        obj.RICH_TEXT_SEARCH = get("RICH_TEXT_SEARCH", "ELASTIC", cls.RICH_TEXT_SEARCH, conv=to_bool)
+        obj.RICH_TEXT_SOURCE = get("RICH_TEXT_SOURCE", "ELASTIC", cls.RICH_TEXT_SOURCE, conv=to_bool)
+        obj.ALL_FIELDS = get("ALL_FIELDS", "ELASTIC", cls.ALL_FIELDS, conv=split_list)
+        obj.ALL_FIELD_TRIGRAMS = get("ALL_FIELD_TRIGRAMS", "ELASTIC", cls.ALL_FIELD_TRIGRAMS, conv=to_bool)
+        obj.EAGER_GLOBAL_ORDINALS = get("EAGER_GLOBAL_ORDINALS", "ELASTIC", cls.EAGER_GLOBAL_ORDINALS, conv=to_bool)
+        obj.REINDEX_IN_BACKGROUND = get("REINDEX_IN_BACKGROUND", "", cls.REINDEX_IN_BACKGROUND, conv=to_bool)
+        obj.JOB_WORKERS = get("JOB_WORKERS", "", cls.JOB_WORKERS, conv=to_int)
+        obj.JOB_DATABASE = get("JOB_DATABASE", "", cls.JOB_DATABASE)
+        obj.JOB_HEARTBEAT = get("JOB_HEARTBEAT", "", cls.JOB_HEARTBEAT, conv=to_float)
+        obj.JOB_STALE_AFTER = get("JOB_STALE_AFTER", "", cls.JOB_STALE_AFTER, conv=to_float)
         obj.ELASTIC_URL = get("URL", "ELASTIC", cls.ELASTIC_URL)
         obj.ELASTIC_AUTH = get("AUTH", "ELASTIC", cls.ELASTIC_AUTH)
         obj.ELASTIC_SSL = get("SSL" "ELASTIC", cls.ELASTIC_SSL)
+        obj.ELASTIC_TIMEOUT = get("TIMEOUT", "ELASTIC", cls.ELASTIC_TIMEOUT, conv=to_float)
+        obj.ELASTIC_WRITE_TIMEOUT = get("WRITE_TIMEOUT", "ELASTIC", cls.ELASTIC_WRITE_TIMEOUT, conv=to_float)
+        obj.ELASTIC_BULK_TIMEOUT = get("BULK_TIMEOUT", "ELASTIC", cls.ELASTIC_BULK_TIMEOUT, conv=to_float)
+        obj.ELASTIC_ALIAS_TIMEOUT = get("ALIAS_TIMEOUT", "ELASTIC", cls.ELASTIC_ALIAS_TIMEOUT, conv=to_float)
+        obj.ELASTIC_TASK_TIMEOUT = get("TASK_TIMEOUT", "ELASTIC", cls.ELASTIC_TASK_TIMEOUT, conv=to_float)
+        obj.ELASTIC_MAXSIZE = get("MAXSIZE", "ELASTIC", cls.ELASTIC_MAXSIZE, conv=to_int)
+        obj.ELASTIC_MAX_RETRIES = get("MAX_RETRIES", "ELASTIC", cls.ELASTIC_MAX_RETRIES, conv=to_int)
+        obj.ELASTIC_RETRY_ON_TIMEOUT = get("RETRY_ON_TIMEOUT", "ELASTIC", cls.ELASTIC_RETRY_ON_TIMEOUT, conv=to_bool)
+        obj.ELASTIC_SNIFF = get("SNIFF", "ELASTIC", cls.ELASTIC_SNIFF, conv=to_int)
+        obj.ELASTIC_BREAKER_THRESHOLD = get("BREAKER_THRESHOLD", "ELASTIC", cls.ELASTIC_BREAKER_THRESHOLD, conv=to_int)
+        obj.ELASTIC_BREAKER_RESET = get("BREAKER_RESET", "ELASTIC", cls.ELASTIC_BREAKER_RESET, conv=to_float)
+        obj.ELASTIC_SPOOL = get("SPOOL", "ELASTIC", cls.ELASTIC_SPOOL)
+        obj.ELASTIC_BULK_ADAPTIVE = get("BULK_ADAPTIVE", "ELASTIC", cls.ELASTIC_BULK_ADAPTIVE, conv=to_bool)
+        obj.ELASTIC_BULK_SIZE = get("BULK_SIZE", "ELASTIC", cls.ELASTIC_BULK_SIZE, conv=to_int)
+        obj.ELASTIC_BULK_MIN_SIZE = get("BULK_MIN_SIZE", "ELASTIC", cls.ELASTIC_BULK_MIN_SIZE, conv=to_int)
+        obj.ELASTIC_BULK_MAX_SIZE = get("BULK_MAX_SIZE", "ELASTIC", cls.ELASTIC_BULK_MAX_SIZE, conv=to_int)
+        obj.ELASTIC_BULK_CONCURRENCY = get("BULK_CONCURRENCY", "ELASTIC", cls.ELASTIC_BULK_CONCURRENCY, conv=to_int)
+        obj.ELASTIC_BULK_LATENCY = get("BULK_LATENCY", "ELASTIC", cls.ELASTIC_BULK_LATENCY, conv=to_float)
+        obj.ELASTIC_BULK_RETRIES = get("BULK_RETRIES", "ELASTIC", cls.ELASTIC_BULK_RETRIES, conv=to_int)
+        obj.ELASTIC_BULK_BACKOFF = get("BULK_BACKOFF", "ELASTIC", cls.ELASTIC_BULK_BACKOFF, conv=to_float)
+        obj.SKIP_UNCHANGED = get("SKIP_UNCHANGED", "ELASTIC", cls.SKIP_UNCHANGED, conv=to_bool)
+        obj.ELASTIC_COMPRESS = get("COMPRESS", "ELASTIC", cls.ELASTIC_COMPRESS, conv=to_bool)
+        obj.ELASTIC_ASYNC_MAXSIZE = get("ASYNC_MAXSIZE", "ELASTIC", cls.ELASTIC_ASYNC_MAXSIZE, conv=to_int)
 
         obj.SPACE_ID = get("SPACE_ID", "CONTENTFUL", required=True)
         obj.ACCESS_TOKEN = get("ACCESS_TOKEN", "CONTENTFUL", required=True)
         obj.API_HOST = get("HOST", "CONTENTFUL", "cdn.contentful.com")
+        obj.SPACE_TOKENS = get("SPACE_TOKENS", "CONTENTFUL", cls.SPACE_TOKENS, conv=split_dict)
         obj.SPACE_MAP = get("SPACE_MAP", "CONTENTFUL", cls.SPACE_MAP, conv=split_dict)
         obj.ACCEPTED_SPACE_IDS = get("ACCEPTED_SPACE_IDS", "CONTENTFUL", [obj.SPACE_ID], conv=split_list)
         obj.WEBHOOK_AUTH = get("WEBHOOK_AUTH", "CONTENTFUL", {}, conv=split_dict)
+        obj.WEBHOOK_BATCH_SIZE = get("WEBHOOK_BATCH_SIZE", "CONTENTFUL", cls.WEBHOOK_BATCH_SIZE, conv=to_int)
+        obj.SPACE_CONCURRENCY = get("SPACE_CONCURRENCY", "CONTENTFUL", cls.SPACE_CONCURRENCY, conv=to_int)
+        obj.RATE_LIMIT = get("RATE_LIMIT", "CONTENTFUL", cls.RATE_LIMIT, conv=to_float)
+        obj.CONTENTFUL_GZIP = get("GZIP", "CONTENTFUL", cls.CONTENTFUL_GZIP, conv=to_bool)
 
+        obj.SERIALIZER = get("SERIALIZER", "", cls.SERIALIZER)
         obj.ALLOW_UNPUBLISHED = get("ALLOW_UNPUBLISHED", "", cls.ALLOW_UNPUBLISHED, conv=to_bool)
 
+        obj.DENORMALIZE = get("DENORMALIZE", "ELASTIC", cls.DENORMALIZE, conv=split_dict_list)
+        obj.ENTRY_CACHE_SIZE = get("ENTRY_CACHE_SIZE", "", cls.ENTRY_CACHE_SIZE, conv=to_int)
+        obj.ENTRY_CACHE_TTL = get("ENTRY_CACHE_TTL", "", cls.ENTRY_CACHE_TTL, conv=to_int)
+        obj.SCHEMA_CACHE_SIZE = get("SCHEMA_CACHE_SIZE", "", cls.SCHEMA_CACHE_SIZE, conv=to_int)
+        obj.SCHEMA_CACHE_TTL = get("SCHEMA_CACHE_TTL", "", cls.SCHEMA_CACHE_TTL, conv=to_int)
+
         obj.LANGUAGES = get("LANGUAGES", "CONTENTFUL", None, conv=split_list)
         if not obj.LANGUAGES:
             obj.LANGUAGES = get("LANGUAGES", "", cls.LANGUAGES, conv=split_list)
         obj.DEFAULT_LANGUAGE = get("DEFAULT_LANGUAGE", "", obj.LANGUAGES[0])
+        obj.LOCALE_FALLBACKS = get("LOCALE_FALLBACKS", "", cls.LOCALE_FALLBACKS, conv=to_bool)
         obj.LANGUAGE_ANALYZERS = get("LANGUAGE_ANALYZERS", "", cls.LANGUAGE_ANALYZERS)
 
         cls.instance = obj
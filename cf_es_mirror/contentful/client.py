@@ -1,13 +1,81 @@
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.exceptions import ConnectTimeoutError
 
 from contentful.client import Client as BaseClient
-from contentful.errors import RateLimitExceededError
+from contentful.errors import RateLimitExceededError, get_error
+from contentful.utils import retry_request
+
+
+class RateLimiter:
+    """
+    A token bucket limiting the amount of requests per second, which can be shared between clients and threads.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RawSync:
+    """
+    The items of a sync as raw JSON, without building SDK resources for them.
+
+    Pages are fetched one at a time as we go, so only a single page is held in memory. Once iterated, the token to
+    continue the sync with later is available as `next_sync_token`.
+    """
+
+    def __init__(self, client, query: dict):
+        self.client = client
+        self.query = query
+        self.next_sync_token = None
+
+    def pages(self):
+        """
+        Yields the items of each page of the sync.
+        """
+        query = dict(self.query)
+        self.client._normalize_sync(query)
+        while True:
+            page = self.client.raw_get(self.client.environment_url('/sync'), query)
+            next_url = page.get('nextPageUrl') or page.get('nextSyncUrl')
+            self.next_sync_token = parse_qs(urlsplit(next_url).query)['sync_token'][0]
+            yield page.get('items', [])
+            if not page.get('nextPageUrl'):
+                return
+            query = {'sync_token': self.next_sync_token}
+
+    def __iter__(self):
+        """
+        Yields `(sys.type, item)` tuples, e.g. `("Entry", {...})` or `("DeletedAsset", {...})`.
+        """
+        for items in self.pages():
+            for item in items:
+                yield item['sys']['type'], item
 
 
 class Client(BaseClient):
     max_retries = 3
+    rate_limiter = None
 
     def _http_get(self, url, query):
         """
@@ -29,6 +97,9 @@ class Client(BaseClient):
         if self._has_proxy():
             kwargs['proxies'] = self._proxy_parameters()
 
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
         with requests.Session() as s:
             _url = self._url(url)
             s.mount(_url, HTTPAdapter(max_retries=self.max_retries))
@@ -44,3 +115,37 @@ class Client(BaseClient):
             if response.status_code == 429:
                 raise RateLimitExceededError(response)
         return response
+
+    def raw_get(self, url, query=None) -> dict:
+        """
+        Same as `_get`, returning the JSON response as is rather than building resources from it.
+        """
+        response = retry_request(self)(self._http_get)(url, query=query or {})
+        if response.status_code != 200:
+            raise get_error(response)
+        return response.json()
+
+    def raw_content_types(self, limit: int = 1000):
+        """
+        Yields all content types as raw JSON, fetching them a page at a time.
+        """
+        skip = 0
+        while True:
+            page = self.raw_get(self.environment_url('/content_types'), {'limit': limit, 'skip': skip})
+            items = page.get('items', [])
+            yield from items
+            skip += len(items)
+            if not items or skip >= page.get('total', 0):
+                return
+
+    def raw_locales(self) -> list:
+        """
+        Returns the locales of our environment as raw JSON.
+        """
+        return self.raw_get(self.environment_url('/locales'), {'limit': 1000}).get('items', [])
+
+    def raw_sync(self, query=None) -> RawSync:
+        """
+        Same as `sync`, returning raw JSON items, see `RawSync`.
+        """
+        return RawSync(self, query or {})
@@ -1,18 +1,31 @@
 import copy
-import hashlib
-import json
+import math
+import re
+import time
 
 import babel
+from elasticsearch.exceptions import TransportError
 
 from cf_es_mirror.contentful import ContentfulType, mapping
 from cf_es_mirror.config import config
-from cf_es_mirror.util import cached_property, merge
+from cf_es_mirror import serializer
+from cf_es_mirror.contentful.richtext import text_field
+from cf_es_mirror.contentful.schema import FINGERPRINT_FIELD, TARGETS_FIELD, GENERATIONS_FIELD, get_registry
+from cf_es_mirror.lease import Lease
+from cf_es_mirror.reconcile import elastic_items, merge_join
+from cf_es_mirror.util import cached_property, get_path, merge
 
 from cf_es_mirror.signals import *
 
 
 ENGLISH = babel.Locale.parse('en')
 
+# The possible outcomes of `ContentType.reindex_if_needed`
+REINDEX_DONE = "reindexed"
+REINDEX_UNCHANGED = "unchanged"
+REINDEX_COALESCED = "coalesced"
+REINDEX_FAILED = "failed"
+
 DEFAULT_SETTINGS = {
     "analysis": {
         "tokenizer": {
@@ -57,12 +70,53 @@ DISPLAY_FIELD_EXTRA_FIELDS = {
 }
 
 
-def get_language_analyzer(lang_code: str, mapping_type: dict, displayField=False, keywordField=False) -> dict:
+# What each indexing profile adds to text fields, from cheapest to most expensive. See `field_profile`.
+PROFILES = {
+    # Plain text, searchable by word using the standard analyzer.
+    "minimal": {"analyzer": False, "trigrams": False, "term_vector": False},
+    # Analyzed for its language (stemming, stop words and the like).
+    "fulltext": {"analyzer": True, "trigrams": False, "term_vector": False},
+    # As "fulltext", searchable by substring as well using the "trigrams" subfield.
+    "fuzzy": {"analyzer": True, "trigrams": True, "term_vector": False},
+    # As "fuzzy", with term vectors for highlighting and finding related documents.
+    "full": {"analyzer": True, "trigrams": True, "term_vector": True},
+}
+DEFAULT_PROFILE = "full"
+# Picks the profile of a field from the message of one of its validations, e.g. "Keep it short [index:minimal]".
+PROFILE_MARKER = re.compile(r"\[index:(\w+)\]")
+
+
+def field_profile(content_type: str, field: dict) -> str:
+    """
+    Returns the indexing profile (see `PROFILES`) of a field of a content type, the first one of:
+
+    1. `INDEX_PROFILES` for '<content type>.<field id>'
+    2. An `[index:<profile>]` marker in the message of one of the validations of the field (or its items)
+    3. `INDEX_PROFILES` for '<content type>'
+    4. `INDEX_PROFILE`
+    """
+    validations = [*field.get("validations", []), *field.get("items", {}).get("validations", [])]
+    markers = (PROFILE_MARKER.search(validation.get("message", None) or "") for validation in validations)
+    candidates = [
+        config.INDEX_PROFILES.get(f"{content_type}.{field.get('id')}", None),
+        next((marker.group(1) for marker in markers if marker), None),
+        config.INDEX_PROFILES.get(content_type, None),
+    ]
+    for profile in candidates:
+        if profile in PROFILES:
+            return profile
+        if profile is not None:
+            config.logger.warning(f"Unknown indexing profile '{profile}' for '{content_type}.{field.get('id')}'.")
+    return config.INDEX_PROFILE if config.INDEX_PROFILE in PROFILES else DEFAULT_PROFILE
+
+
+def get_language_analyzer(lang_code: str, mapping_type: dict, displayField=False, keywordField=False, profile=None) -> dict:
     """
     To provide better searchability, we provide a per-language analyzer for text fields.
 
     :param lang_code: The language code (as specified by Contentful) that this field is for.
     :param mapping_type: The mapping type we will be applying to this field.
+    :param profile: The indexing profile of this field (see `PROFILES`), defaults to the "full" profile.
     :returns: The applied analyzers on this mapping, if applicable.
     """
     if not mapping_type.get("type", None) == "text":
@@ -80,20 +134,73 @@ def get_language_analyzer(lang_code: str, mapping_type: dict, displayField=False
         fields.update(KEYWORD_FIELD_EXTRA_FIELDS)
     if displayField:
         fields.update(DISPLAY_FIELD_EXTRA_FIELDS)
-    if lang in config.LANGUAGE_ANALYZERS:
-        # Apply the following:
+    if config.EAGER_GLOBAL_ORDINALS:
+        # Build the global ordinals of our keywords (used for aggregations) when a new index is warmed, rather than
+        #  when the first search after an alias flip needs them (see `ContentType.warm`).
+        fields = {
+            name: {**field, "eager_global_ordinals": True} if field.get("type") == "keyword" else field
+            for name, field in fields.items()
+        }
+    options = PROFILES[profile or DEFAULT_PROFILE]
+    if lang in config.LANGUAGE_ANALYZERS and options["analyzer"]:
+        # Apply the following, as far as our profile asks for it:
         # 1. Our analyzer. Elastic has a list of supported analyzers (specified in config.LANGUAGE_ANALYZERS)
         #    for full-text searching
         # 2. Our extra analzyers. By default we add a trigrams field analyzer
         # 3. Term vector information, for faster searching and finding related documents
-        fields.update(EXTRA_ANALYZERS_FIELDS)
-        extra.update({
-            "term_vector": "with_positions_offsets",
-            "analyzer": lang,
-        })
+        if options["trigrams"]:
+            fields.update(EXTRA_ANALYZERS_FIELDS)
+        if options["term_vector"]:
+            extra["term_vector"] = "with_positions_offsets"
+        extra["analyzer"] = lang
     return {**mapping_type, "fields": fields, **extra}
 
 
+# The prefix of the per-locale fields holding all text of a document, see `add_all_fields`.
+ALL_FIELD_PREFIX = "_all_"
+
+
+def language_analyzer(lang_code: str):
+    """
+    Returns the elastic language analyzer for a language code, None if we don't have one for it.
+    """
+    try:
+        loc = babel.Locale.parse(lang_code, sep='-')
+    except ValueError:
+        return None
+    lang = loc.get_language_name(ENGLISH).lower()
+    return lang if lang in config.LANGUAGE_ANALYZERS else None
+
+
+def add_all_fields(properties: dict, locale=None):
+    """
+    Adds an `_all_<locale>` field per locale to the `properties` of a mapping, which every text field of that locale
+    copies its values into, so searching all text of a document in a language takes a single field. The values of
+    fields that are not localized (kept for the default language) are copied into the field of every locale.
+
+    :param locale: The locale of the index (for the "per_locale" layout), which gets a single `_all_<locale>` field
+                   holding all of its text.
+    """
+    locales = [locale] if locale is not None else config.LANGUAGES
+    for field in properties["fields"]["properties"].values():
+        languages = field.get("properties", {})
+        localized = set(languages) != {config.DEFAULT_LANGUAGE}
+        for lc, mapped in languages.items():
+            if mapped.get("type", None) != "text":
+                continue
+            targets = [lc] if locale is None and localized else locales
+            # Mapped types can be shared, so we don't change them in place.
+            languages[lc] = {**mapped, "copy_to": [f"{ALL_FIELD_PREFIX}{target}" for target in targets]}
+    for lc in locales:
+        all_field = {"type": "text"}
+        analyzer = language_analyzer(lc)
+        if analyzer:
+            all_field["analyzer"] = analyzer
+        if config.ALL_FIELD_TRIGRAMS:
+            all_field["fields"] = copy.deepcopy(EXTRA_ANALYZERS_FIELDS)
+        properties[f"{ALL_FIELD_PREFIX}{lc}"] = all_field
+
+
 def get_mapping_type(field):
     """
     Fetch the mapping type for this field type
@@ -107,59 +214,272 @@ def get_mapping_type(field):
     return mapping.DISABLED
 
 
-def per_language_field(field, displayField=False, keywordField=False):
+def per_language_field(field, displayField=False, keywordField=False, locale=None, profile=None):
+    """
+    Maps a field for each of our languages.
+
+    :param locale: When given, only map the field for this locale (for the "per_locale" index layout). The default
+                   language is always mapped as well, since that is what we store when a value is not localized.
+    :param profile: The indexing profile of the field, see `field_profile`.
+    """
     mapped = get_mapping_type(field)
+    if not field.get("localized", False):
+        codes = [config.DEFAULT_LANGUAGE]
+    elif locale is not None:
+        codes = list(dict.fromkeys([locale, config.DEFAULT_LANGUAGE]))
+    else:
+        codes = config.LANGUAGES
     return {
         "properties": {
-            lc: get_language_analyzer(lc, mapped, displayField=displayField, keywordField=keywordField)
-            for lc in (config.LANGUAGES if field.get("localized", False) else [config.DEFAULT_LANGUAGE])
+            lc: get_language_analyzer(lc, mapped, displayField=displayField, keywordField=keywordField, profile=profile)
+            for lc in codes
         }
     }
 
 
+# Reduces a document of the "combined" layout to the document we store for a single locale, see `localize_body`.
+LOCALIZE_SCRIPT = """
+if (ctx._source.fields != null) {
+    for (def field : ctx._source.fields.values()) {
+        if (field instanceof Map) {
+            def keep = field.containsKey(params.locale) ? params.locale : params.fallback;
+            field.keySet().removeIf(k -> k != keep);
+        }
+    }
+}
+ctx._source.locale = params.locale;
+"""
+
+
+def localize_body(body: dict, locale: str) -> dict:
+    """
+    Returns the document we store in the index of a single locale (for the "per_locale" index layout).
+
+    Each field only keeps its value for `locale`, or the default language value when it has none (which is also
+    where non-localized values live). The document is marked with the locale it is for.
+    """
+    fields = {}
+    for field_id, values in body.get("fields", {}).items():
+        if not isinstance(values, dict):
+            fields[field_id] = values
+        elif locale in values:
+            fields[field_id] = {locale: values[locale]}
+        elif config.DEFAULT_LANGUAGE in values:
+            fields[field_id] = {config.DEFAULT_LANGUAGE: values[config.DEFAULT_LANGUAGE]}
+    return {**body, "fields": fields, "locale": locale}
+
+
+# The field listing the `<field>.<locale>` values of a document we filled in from a fallback locale.
+FALLBACK_FIELD = "cf_mirror_fallbacks"
+
+
+def fill_fallbacks(body: dict, localized: list, chains: dict) -> dict:
+    """
+    Returns `body` with the values of its `localized` fields filled in for the locales they are missing in, taking
+    the value of the first locale of their fallback chain (see `Config.fallback_chains`) that has one, so a locale
+    can be searched using a single field. The values filled in are listed in its `FALLBACK_FIELD`.
+
+    `body` itself is left as is, as it may be the data of an entry.
+    """
+    fields = dict(body.get("fields", {}))
+    filled = []
+    for field_id in localized:
+        values = fields.get(field_id, None)
+        if not isinstance(values, dict):
+            continue
+        missing = {}
+        for lc in config.LANGUAGES:
+            if lc in values:
+                continue
+            fallback = next((code for code in chains.get(lc, ()) if code in values), None)
+            if fallback is not None:
+                missing[lc] = values[fallback]
+                filled.append(f"{field_id}.{lc}")
+        if missing:
+            fields[field_id] = {**values, **missing}
+    if not filled:
+        return body
+    return {**body, "fields": fields, FALLBACK_FIELD: filled}
+
+
+# The field holding the hash of a document, so imports can skip writing documents that did not change.
+HASH_FIELD = "cf_mirror_hash"
+
+
+def hash_body(body: dict) -> dict:
+    """
+    Returns `body` with its hash (see `HASH_FIELD`) added. The hash covers everything we send to elastic, other than
+    any hash `body` already has, e.g. when it is read back from our own index.
+    """
+    body = {key: value for key, value in body.items() if key != HASH_FIELD}
+    body[HASH_FIELD] = serializer.digest(body)
+    return body
+
+
+# While a reindex populates a new index, it is the target of an alias by this suffix (on top of the alias it is for),
+#  so entries written in the meantime are written to the new index as well. See `ContentType.rebuild_indices`.
+PENDING_SUFFIX = "+pending"
+
+
+def pending_alias(alias: str) -> str:
+    return f"{alias}{PENDING_SUFFIX}"
+
+
+def is_pending(alias: str) -> bool:
+    return alias.endswith(PENDING_SUFFIX)
+
+
+def shard_count(docs: int, size: int) -> int:
+    """
+    Returns the amount of primary shards for an index of `docs` documents taking `size` bytes, so no shard holds more
+    than `SHARD_TARGET_SIZE` gigabytes or `SHARD_TARGET_DOCS` documents, within `MIN_SHARDS` (`NUMBER_OF_SHARDS` if
+    not set) and `MAX_SHARDS`.
+    """
+    needed = max(math.ceil(size / (config.SHARD_TARGET_SIZE * 1024 ** 3)), math.ceil(docs / config.SHARD_TARGET_DOCS))
+    minimum = config.NUMBER_OF_SHARDS if config.MIN_SHARDS is None else config.MIN_SHARDS
+    return min(max(needed, minimum), max(config.MAX_SHARDS, minimum))
+
+
+class ReindexInProgress(Exception):
+    """
+    Raised when we can't change the indices of a content type, as someone else is (re)indexing it.
+    """
+
+
 class ContentType(ContentfulType):
     def __init__(self, data):
         super().__init__(data)
 
         self.content_type_index = config.content_type_index(space=self.space)
         self.reindex_index = config.reindex_index(space=self.space)
+        self.references_index = config.references_index(space=self.space)
 
         self.index_alias = config.index(self.document_id, space=self.space)
         self.index_wildcard = f"{self.index_alias}-*"
+        # The aliases (and their locale) our documents are written to. With the "combined" layout this is just
+        #  `index_alias`, otherwise `index_alias` spans the indices of all of these.
+        self.index_targets = config.index_family(self.document_id, space=self.space)
+        self.indices_ensured = False
+        # Whether `publish`/`unpublish` leave the work to a background job, see `REINDEX_IN_BACKGROUND`.
+        self.in_background = config.REINDEX_IN_BACKGROUND
+        # The `(documents, seconds)` of our last `backfill`.
+        self.backfilled = None
 
-    def check_indices(self):
+    @property
+    def profiles(self) -> dict:
+        """
+        The indexing profile of each of our fields not using the default one, see `field_profile`.
+        """
+        profiles = {field["id"]: field_profile(self.document_id, field) for field in self.data.get("fields", []) if "id" in field}
+        return {field_id: profile for field_id, profile in profiles.items() if profile != DEFAULT_PROFILE}
+
+    @property
+    def rich_text_fields(self) -> list:
+        """
+        The IDs of our RichText fields.
+        """
+        return [field["id"] for field in self.data.get("fields", []) if field.get("type", None) == "RichText"]
+
+    @property
+    def all_fields(self) -> bool:
+        """
+        Whether our indices get an `_all_<locale>` field holding all of their text, see `add_all_fields`.
+        """
+        return self.document_id in config.ALL_FIELDS or "*" in config.ALL_FIELDS
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        The fingerprint of our fields (and the options changing their mapping), which is also the suffix of our indices.
+        """
+        fields = self.data.get("fields", {"_non_existent_data": "new"})
+        options = {}
+        if self.profiles:
+            options["profiles"] = self.profiles
+        if self.all_fields:
+            options["all_fields"] = {"trigrams": config.ALL_FIELD_TRIGRAMS}
+        rich_text = {"search": config.RICH_TEXT_SEARCH, "source": config.RICH_TEXT_SOURCE}
+        if rich_text != {"search": False, "source": True} and self.rich_text_fields:
+            options["rich_text"] = rich_text
+        # The fields `build_mapping` adds for these settings.
+        for option, enabled in (("hash", config.SKIP_UNCHANGED), ("fallbacks", config.LOCALE_FALLBACKS),
+                                ("eager_global_ordinals", config.EAGER_GLOBAL_ORDINALS)):
+            if enabled:
+                options[option] = True
+        # Only covering the options when there are any keeps the fingerprints of indices from before we had them, as
+        #  long as none of these are used.
+        return serializer.fingerprint({"fields": fields, **options} if options else fields)
+
+    @property
+    def targets(self) -> list:
+        return [alias for alias, _ in self.index_targets]
+
+    def store_schema(self):
+        """
+        Stores our fingerprint and targets along with our data in the content types index, see `SchemaRegistry`.
+        Only done once our indices are up to date, so `update` does not take a failed re-index for an unchanged one.
+        """
+        schema = {FINGERPRINT_FIELD: self.fingerprint, TARGETS_FIELD: self.targets}
+        config.elastic.update(index=self.content_type_index, id=self.document_id, body={"doc": schema})
+        get_registry().put(self.space, self.document_id, {**self.data, **schema})
+
+    def ensure_indices(self):
         #
         # We require 2 indices to always exist, regardless of the amount of content indices.
         #  These indices allow us to perform various tasks, as well as keeping track of some information.
         #
+        if self.indices_ensured:
+            return
         if not config.elastic.indices.exists(index=self.reindex_index):
-            # Create the reindex index. This index only keeps track of content types being reindexed, as a crude locking mechanism.
+            # Create the reindex index. This index only keeps track of content types being reindexed, using a `Lease` per content type.
             config.elastic.indices.create(index=self.reindex_index, body=self.get_settings(),
                                           wait_for_active_shards=1)
+            config.elastic.indices.put_mapping(mapping.LEASE_MAPPING, index=self.reindex_index)
         if not config.elastic.indices.exists(index=self.content_type_index):
             # Create the content type index. This index keeps track of all content types and their layout.
             config.elastic.indices.create(index=self.content_type_index, body=self.get_settings(),
                                           wait_for_active_shards=1)
             config.elastic.indices.put_mapping(mapping.TYPES_MAPPING, index=self.content_type_index)
+        if config.DENORMALIZE and not config.elastic.indices.exists(index=self.references_index):
+            # Create the references index. This index keeps track of which documents embed which linked entries.
+            config.elastic.indices.create(index=self.references_index, body=self.get_settings(),
+                                          wait_for_active_shards=1)
+            config.elastic.indices.put_mapping(mapping.REFERENCES_MAPPING, index=self.references_index)
+        self.indices_ensured = True
 
+    def check_indices(self):
+        self.ensure_indices()
+        self.find_indices()
+
+    def find_indices(self):
+        """
+        Looks up our existing indices and content type, without creating anything (see `check_indices`).
+        """
         # Next up we check if our index alias exists
         self.index_alias_exists = config.elastic.indices.exists_alias(name=self.index_alias)
-        self.existing_indices = config.elastic.indices.get_alias(index=self.index_wildcard, name=self.index_alias, expand_wildcards='open',
-                                                                 ignore_unavailable=True, ignore=[404])
-        if 'error' in self.existing_indices and self.existing_indices.get('status', 200) == 404:
-            self.existing_indices = {}
+        # Our index alias always spans all indices of this content type, regardless of the layout.
+        aliases = list(dict.fromkeys([self.index_alias, *[alias for alias, _ in self.index_targets]]))
+        existing = config.elastic.indices.get_alias(index=self.index_wildcard, name=','.join(aliases), expand_wildcards='open',
+                                                    ignore_unavailable=True, ignore=[404])
+        if 'error' in existing and existing.get('status', 200) == 404:
+            existing = {}
+        # Maps the existing indices to the aliases of ours they have.
+        self.existing_aliases = {name: list(data.get('aliases', {}).keys()) for name, data in existing.items()}
+        self.existing_indices = {name: data for name, data in existing.items() if self.index_alias in self.existing_aliases[name]}
         
         self.existing_content_type = {}
         if config.elastic.exists(index=self.content_type_index, id=self.document_id):
             self.existing_content_type = config.elastic.get_source(index=self.content_type_index, id=self.document_id)
 
-    def get_settings(self):
+    def get_settings(self, shards: int = None):
         """
         Returns a new instance of the default settings
+
+        :param shards: The amount of primary shards, `NUMBER_OF_SHARDS` if not given (see `plan_shards`).
         """
         settings = copy.deepcopy(DEFAULT_SETTINGS)
         settings.update({
-            "number_of_shards": config.NUMBER_OF_SHARDS,
+            "number_of_shards": shards or config.NUMBER_OF_SHARDS,
             "number_of_replicas": config.NUMBER_OF_REPLICAS if config.NUMBER_OF_REPLICAS is not None else 0,
             "auto_expand_replicas": config.AUTO_EXPAND_REPLICAS if config.AUTO_EXPAND_REPLICAS else False,
         })
@@ -167,8 +487,40 @@ class ContentType(ContentfulType):
             "settings": settings,
         }
 
-    def build_mapping(self):
+    def build_mapping(self, locale=None):
+        """
+        Builds the mapping of our index.
+
+        :param locale: The locale of the index we build the mapping for, None for the "combined" layout.
+        """
         displayField = self.data.get("displayField", None)
+        fields = {}
+        excludes = []
+        for field in sorted(self.data['fields'], key=lambda x: x['id']):
+            profile = field_profile(self.document_id, field)
+            fields[field['id']] = per_language_field(field, displayField=(field['id'] == displayField), locale=locale,
+                                                     profile=profile)
+            if field['type'] == "RichText":
+                if config.RICH_TEXT_SEARCH:
+                    # The text of the field, see `cf_es_mirror.contentful.richtext`.
+                    fields[text_field(field['id'])] = per_language_field({**field, "type": "Text"}, locale=locale,
+                                                                         profile=profile)
+                if not config.RICH_TEXT_SOURCE:
+                    excludes.append(f"fields.{field['id']}")
+        properties = {
+            "sys": mapping.SYS,
+            "fields": {
+                "properties": fields
+            }
+        }
+        if self.all_fields:
+            add_all_fields(properties, locale=locale)
+        if locale is not None:
+            properties["locale"] = mapping.KEYWORD
+        if config.LOCALE_FALLBACKS:
+            properties[FALLBACK_FIELD] = mapping.KEYWORD
+        if config.SKIP_UNCHANGED:
+            properties[HASH_FIELD] = mapping.STORED_KEYWORD
         return {
             "_source": {
                 "enabled": True,
@@ -178,29 +530,181 @@ class ContentType(ContentfulType):
                     "sys.space",
                     "sys.contentType",
                     "sys.environment",
+                    *excludes,
                 ],
             },
-            "properties": {
-                "sys": mapping.SYS,
-                "fields": {
-                    "properties": {
-                        field['id']: per_language_field(field, displayField=(field['id'] == displayField))
-                        for field in sorted(self.data['fields'], key=lambda x: x['id'])
-                    }
-                }
-            }
+            "properties": properties,
+        }
+
+    def index_stats(self) -> dict:
+        """
+        Returns the `(documents, bytes)` of the primary shards of each of our existing indices.
+        """
+        if not self.existing_aliases:
+            return {}
+        response = config.elastic.indices.stats(index=",".join(self.existing_aliases), metric="docs,store")
+        return {
+            name: (get_path(data, "primaries", "docs", "count", default=0), get_path(data, "primaries", "store", "size_in_bytes", default=0))
+            for name, data in response.get("indices", {}).items()
         }
 
-    def reindex_if_needed(self, force=False, **kwargs):
+    def plan_shards(self) -> dict:
+        """
+        Decides the amount of primary shards of each of our new indices, sized on the existing index we copy its
+        documents from (see `shard_count`). Without `AUTO_SHARDS`, or anything to go on, this is `NUMBER_OF_SHARDS`.
+
+        :returns: The `{alias: (shards, documents, bytes)}` for our `index_targets`, the documents and bytes being
+                  None when unknown.
+        """
+        stats = self.index_stats() if config.AUTO_SHARDS else {}
+        plan = {}
+        for alias, locale in self.index_targets:
+            name, localize = self.old_index_for(alias)
+            if name in stats:
+                docs, size = stats[name]
+                if localize:
+                    # Every locale gets the same documents, each only holding its own share of the values.
+                    size //= len(self.index_targets)
+            elif locale is None and len(stats) > 1:
+                # Back to the "combined" layout, which holds the documents of every locale index.
+                docs, size = max(count for count, _ in stats.values()), sum(size for _, size in stats.values())
+            else:
+                plan[alias] = (config.NUMBER_OF_SHARDS, None, None)
+                continue
+            plan[alias] = (shard_count(docs, size), docs, size)
+        return plan
+
+    def old_index_for(self, alias):
+        """
+        Returns the existing index holding the documents for one of our `index_targets`, and whether these documents
+        have to be reduced to a single locale (when switching from the "combined" to the "per_locale" layout).
+        """
+        for name, aliases in self.existing_aliases.items():
+            if alias in aliases:
+                return name, False
+        for name, aliases in self.existing_aliases.items():
+            if aliases == [self.index_alias]:
+                return name, True
+        return None, False
+
+    def reindex_if_needed(self, force=False, backfill=None, **kwargs):
         """
         (re)creates a search index for this content type.
 
+        Only one process (re)creates the indices of a content type at a time, guarded by a `Lease` in the reindex
+        index. When someone else is already busy, we leave our request on their lease, to be handled once they are
+        done, rather than waiting for them.
+
+        :param backfill: Whether to import our entries from Contentful into new indices we have nothing to copy into
+                         them from, see `backfill`. Defaults to `REINDEX_BACKFILL`, which only does so when our
+                         previous index is unexpectedly missing. True also backfills content types that had no indices.
+        :returns: One of the REINDEX_* constants.
+        """
+        self.ensure_indices()
+        lease = Lease(self.reindex_index, self.document_id)
+        for attempt in range(3):
+            if lease.acquire():
+                break
+            if lease.request({"data": self.data, "force": force, "backfill": backfill}):
+                config.logger.info(f"A re-index of '{self.space}.{self.document_id}' is already in progress, coalesced.")
+                return REINDEX_COALESCED
+            # The lease got released in the meantime, try again.
+        else:
+            config.logger.error(f"Unable to acquire the re-index lease for '{self.space}.{self.document_id}'.")
+            return REINDEX_FAILED
+
+        try:
+            result = self.rebuild_indices(lease, force=force, backfill=backfill, **kwargs)
+        finally:
+            pending = lease.release()
+        if pending:
+            config.logger.info(f"Handling the re-index of '{self.space}.{self.document_id}' requested while we were busy.")
+            return ContentType(pending["data"]).reindex_if_needed(force=pending.get("force", False),
+                                                                  backfill=pending.get("backfill", None), **kwargs)
+        return result
+
+    def wait_for_task(self, lease, task_id):
+        """
+        Waits for an elastic task to complete, renewing our lease while we wait.
+        """
+        while True:
+            task = config.elastic.tasks.get(task_id=task_id, ignore=[400, 404])
+            if task.get("completed", True):
+                return task
+            lease.heartbeat()
+            time.sleep(config.REINDEX_POLL_INTERVAL)
+
+    def verify(self, lease, body: dict) -> int:
+        """
+        Compares the source and destination of a finished reindex `body` by id and version, and repairs the
+        stragglers in bulk: documents the copy missed or copied an older version of, and documents it brought back
+        after they were removed (the copy works from a snapshot of the source).
+
+        Both sides are scanned in id order (see `cf_es_mirror.reconcile`), the new index first. Any document written
+        to both while we scan is then either found as it is in both, or newer in the source, which is repaired.
+        Scanning large indices takes a while, so our lease is renewed every `REINDEX_POLL_INTERVAL` while we do.
+
+        :returns: The amount of documents repaired.
+        """
+        source, dest = body["source"]["index"], body["dest"]["index"]
+        counts = {"source": 0, "dest": 0}
+        stragglers, removed = [], []
+        repaired = 0
+        next_heartbeat = time.monotonic() + config.REINDEX_POLL_INTERVAL
+        for doc_id, new, old in merge_join(elastic_items(dest, None), elastic_items(source, None)):
+            counts["dest"] += new is not None
+            counts["source"] += old is not None
+            if time.monotonic() >= next_heartbeat:
+                lease.heartbeat()
+                next_heartbeat = time.monotonic() + config.REINDEX_POLL_INTERVAL
+            if old is None:
+                removed.append(doc_id)
+            elif new is None or new[1] < old[1]:
+                stragglers.append(doc_id)
+            else:
+                continue
+            repaired += 1
+            if len(stragglers) + len(removed) >= config.ELASTIC_BULK_SIZE:
+                self.repair(lease, body, stragglers, removed)
+                stragglers, removed = [], []
+        self.repair(lease, body, stragglers, removed)
+        config.logger.info(f"Verified re-index of '{source}' ({counts['source']} documents) to '{dest}' "
+                           f"({counts['dest']} documents), repaired {repaired} documents")
+        return repaired
+
+    def repair(self, lease, body: dict, stragglers: list, removed: list):
+        """
+        Copies the `stragglers` of reindex `body` again, overwriting what its destination has, and deletes the
+        `removed` documents from its destination. See `verify`.
+        """
+        dest = body["dest"]["index"]
+        if stragglers:
+            # A copy of many stragglers can outlast a request, so we wait for it like we wait for the copy itself.
+            data = config.elastic.reindex({
+                **{key: value for key, value in body.items() if key != "conflicts"},
+                "source": {**body["source"], "query": {"ids": {"values": stragglers}}},
+                "dest": {"index": dest},
+            }, refresh=True, wait_for_completion=False)
+            self.wait_for_task(lease, data["task"])
+        if removed:
+            config.elastic.bulk(body=[{"delete": {"_index": dest, "_id": doc_id}} for doc_id in removed], refresh=True)
+        lease.heartbeat()
+
+    def rebuild_indices(self, lease, force=False, backfill=None, **kwargs):
+        """
+        Does the actual (re)creation of our indices, while we own the reindex `lease`.
+
         This process takes the following steps:
 
-        1. Build a new index
+        1. Build a new index (one per locale for the "per_locale" layout)
         2. Apply our generated mapping to said index
-        3. Update the content type alias to this new index
-        4. Re-index the existing content type data into this new index
+        3. Point a pending alias at this new index (see `pending_alias`), so entries are written to both old and new
+           indices from here on
+        4. Re-index the existing content type data into this new index, or import it from Contentful when there is no
+           existing data (see `backfill`). Documents written since step 3 are not overwritten, and whatever the copy
+           got wrong is repaired (see `verify`)
+        5. Refresh and warm up this new index (see `warm`)
+        6. Update the content type alias(es) to this new index, all at once
         """
         self.check_indices()
 
@@ -209,111 +713,342 @@ class ContentType(ContentfulType):
             # This should never happen, as <space>-<type> should always be mapped to <space>-<type>-<id>,
             #  but just in case
             config.logger.error(f"An alias has been found for the '{self.space}.{self.document_id}' content type, but not index is connected.")
-            return
+            return REINDEX_FAILED
 
         new_fields = self.data.get("fields", {"_non_existent_data": "new"})  # Defaulting to a specific value so it does not match any existing data.
         existing_fields = self.existing_content_type.get("fields", {"_non_existent_data": "current"})  # Defaulting to a specific value so it does not match any new data.
+        # A change of layout means we need a new set of indices, even when the fields are the same.
+        layout_changed = bool(self.existing_indices) and (
+            len(self.existing_indices) != len(self.index_targets)
+            or any(self.old_index_for(alias)[1] for alias, _ in self.index_targets)
+        )
 
-        # Test if we actually have to do something.
-        if new_fields == existing_fields and (self.index_alias_exists or self.existing_indices) and not force:
+        # Test if we actually have to do something. The fingerprint covers the indexing profiles of our fields as well.
+        profiles_changed = self.existing_content_type.get(FINGERPRINT_FIELD, None) not in (None, self.fingerprint)
+        if new_fields == existing_fields and not profiles_changed and (self.index_alias_exists or self.existing_indices) and not force and not layout_changed:
             # If we don't notice any changes to the field layout, we do not need to do any reindexing.
             config.logger.info(f"Content type '{self.space}.{self.document_id}'' has not changed, not re-indexing.")
-            return
+            if (self.existing_content_type.get(FINGERPRINT_FIELD, None), self.existing_content_type.get(TARGETS_FIELD, None)) != (self.fingerprint, self.targets):
+                # Stored before we kept track of these.
+                self.store_schema()
+            return REINDEX_UNCHANGED
 
-        suffix = hashlib.sha1(json.dumps(new_fields, sort_keys=True).encode('ascii', 'ignore')).hexdigest()[:8]  # This should be sufficient for a uniqueness check
-        new_index_name = base_new_index_name = f"{self.index_alias}-{suffix}"
-        # Ensure that if we force a reindex we create a new unique index name.
-        i = 1
-        while config.elastic.indices.exists(index=new_index_name):
-            i += 1
-            new_index_name = f"{base_new_index_name}-{i}"
+        self.discard_pending()
 
-        # Signal we are about to create an index
-        pre_index_create.send(self.document_id, space=self.space, index=new_index_name, **kwargs)
+        suffix = self.fingerprint  # This should be sufficient for a uniqueness check
+        new_indices = {}
+        for alias, locale in self.index_targets:
+            new_index_name = base_new_index_name = f"{alias}-{suffix}"
+            # Ensure that if we force a reindex we create a new unique index name.
+            i = 1
+            while config.elastic.indices.exists(index=new_index_name):
+                i += 1
+                new_index_name = f"{base_new_index_name}-{i}"
+            new_indices[alias] = new_index_name
 
-        # 1. Build a new index
-        config.logger.info(f"Building a new index: '{self.space}.{self.document_id}' -> '{new_index_name}'")
-        config.elastic.indices.create(index=new_index_name, body=self.get_settings(), wait_for_active_shards=1)
-        config.elastic.index(index=self.content_type_index, id=self.document_id, body=self.data)
+        shards = self.plan_shards()
+        for alias, locale in self.index_targets:
+            new_index_name = new_indices[alias]
 
-        mapping = None
-        # 2. Apply our generated mapping to said index
-        try:
-            mapping = self.build_mapping()
-            annotations = {}
-            # Annotate our mapping via signal
-            for handler, data in annotate_index_create.send(self.document_id, space=self.space, mapping=mapping, data=self.data):
-                if isinstance(data, dict):
-                    merge(annotations, data)
-            merge(mapping, annotations)
-            # Build our mapping. If this process fails we have to abort early.
-            config.elastic.indices.put_mapping(mapping, index=new_index_name)
-        except:
-            config.logger.exception(f"An error happened while creating the mapping for the new index '{new_index_name}' for '{self.space}.{self.document_id}'")
-            config.logger.error("Cleaning up the index we created")
-            config.elastic.indices.close(index=new_index_name)
-            config.elastic.indices.delete(index=new_index_name)
-            config.logger.error("Aborting creation")
-            config.logger.debug("Mapping data: ")
-            config.logger.debug(mapping)
-            return
+            # Signal we are about to create an index
+            pre_index_create.send(self.document_id, space=self.space, index=new_index_name, locale=locale, **kwargs)
 
-        # 3. Update the content type alias to this new index
-        if not self.index_alias_exists:
-            config.logger.debug(f"Creating alias '{self.index_alias}' for '{new_index_name}'")
-            config.elastic.indices.put_alias(index=new_index_name, name=self.index_alias)
-        else:
-            config.logger.debug(f"Updating alias '{self.index_alias}' for '{new_index_name}'")
-            # Add our new index as an alias, and at the same time, iterate over all existing indices for our alias and remove them.
-            # This should leave us with just one target for the alias; our newly created index.
-            # This also means that at this point, the new index becomes primary.
-            config.elastic.indices.update_aliases({
-                "actions": [
-                    {"add": {"index": new_index_name, "alias": self.index_alias}},
-                    *[
-                        {"remove": {"index": name, "alias": self.index_alias}}
-                        for name in self.existing_indices.keys()
-                    ]
-                ]
-            })
+            mapping = None
+            try:
+                mapping = self.build_mapping(locale=locale)
+                annotations = {}
+                # Annotate our mapping via signal. Annotations may override our index settings as well, using a
+                #  "settings" key (e.g. `{"settings": {"number_of_shards": 3}}`).
+                for handler, data in annotate_index_create.send(self.document_id, space=self.space, mapping=mapping, data=self.data, locale=locale):
+                    if isinstance(data, dict):
+                        merge(annotations, data)
+                settings = self.get_settings(shards=shards[alias][0])
+                merge(settings["settings"], annotations.pop("settings", {}))
+                merge(mapping, annotations)
+
+                # 1. Build a new index
+                config.logger.info(f"Building a new index: '{self.space}.{self.document_id}' -> '{new_index_name}' "
+                                   f"({settings['settings']['number_of_shards']} shard(s))")
+                config.elastic.indices.create(index=new_index_name, body=settings, wait_for_active_shards=1)
+                # 2. Apply our generated mapping to said index. If this process fails we have to abort early.
+                config.elastic.indices.put_mapping(mapping, index=new_index_name)
+            except:
+                config.logger.exception(f"An error happened while creating the new index '{new_index_name}' for '{self.space}.{self.document_id}'")
+                config.logger.error("Cleaning up the index(es) we created")
+                for name in list(new_indices.values())[:list(new_indices.keys()).index(alias) + 1]:
+                    config.elastic.indices.close(index=name, ignore=[404])
+                    config.elastic.indices.delete(index=name, ignore=[404])
+                config.logger.error("Aborting creation")
+                config.logger.debug("Mapping data: ")
+                config.logger.debug(mapping)
+                return REINDEX_FAILED
+            lease.heartbeat()
+
+        # 3. Point the pending aliases at our new indices, from here on entries are written to both old and new indices.
+        config.elastic.indices.update_aliases({"actions": [
+            {"add": {"index": new_index_name, "alias": pending_alias(alias)}} for alias, new_index_name in new_indices.items()
+        ]})
 
-        old_suffix = hashlib.sha1(json.dumps(existing_fields, sort_keys=True).encode('ascii', 'ignore')).hexdigest()[:8]
-        old_index_name = f"{self.index_alias}-{old_suffix}"
-        if self.index_alias_exists and self.existing_indices:
-            old_index_name = list(self.existing_indices.keys())[0]
-
-        # Quickly check if an existing reindex might already be happening, in this case, we wait.
-        while config.elastic.exists(index=self.reindex_index, id=self.document_id):
-                config.logger.info("A re-index is already underway, checking for completion status.")
-                # Grab the task data
-                data = config.elastic.get_source(index=self.reindex_index, id=self.document_id)
-                # Get the task, tell elastic we'll wait until it's done.
-                config.elastic.tasks.get(task_id=data['task'], wait_for_completion=True, ignore=[400, 404])
-                # Remove the task item, since we're done.
-                config.elastic.delete(index=self.reindex_index, id=self.document_id, ignore=[400, 404])
-
-        # 4. Re-index the existing content type data into this new index
-        if old_index_name in self.existing_indices:
+        old_suffix = self.existing_content_type.get(FINGERPRINT_FIELD, None) or serializer.fingerprint(existing_fields)
+
+        # 4. Re-index the existing content type data into the new index(es)
+        missing = []
+        for alias, locale in self.index_targets:
+            new_index_name = new_indices[alias]
+            if locale is None and len(self.existing_indices) > 1:
+                # Going from the "per_locale" layout back to "combined". We can't merge the per-locale documents
+                #  back together, so we only copy what we have for the default language.
+                config.logger.warning(f"Switching '{self.space}.{self.document_id}' to the combined layout, only the "
+                                      f"default language is kept. A (re-)import is needed to restore other languages.")
+                old_index_name = ','.join(self.existing_indices.keys())
+                body = {
+                    "source": {"index": list(self.existing_indices.keys()), "query": {"term": {"locale": config.DEFAULT_LANGUAGE}}},
+                    "dest": {"index": new_index_name},
+                    "script": {"lang": "painless", "source": "ctx._source.remove('locale')"},
+                }
+            else:
+                old_index_name, localize = self.old_index_for(alias)
+                if old_index_name is None:
+                    # Either of these tells us we mirrored this content type before.
+                    if self.existing_indices or self.existing_content_type:
+                        old_index_name = f"{alias}-{old_suffix}"
+                        config.logger.warning(f"We expected index '{old_index_name}' to exist, but it was not present in the existing list of indices.")
+                        missing.append(alias)
+                    elif backfill:
+                        missing.append(alias)
+                    continue
+                body = {"source": {"index": old_index_name}, "dest": {"index": new_index_name}}
+                if localize:
+                    body["script"] = {"lang": "painless", "source": LOCALIZE_SCRIPT,
+                                      "params": {"locale": locale, "fallback": config.DEFAULT_LANGUAGE}}
             config.logger.info(f"Re-indexing '{old_index_name}' to '{new_index_name}'")
+            # Only create documents, as anything the new index has already was written (through its pending alias)
+            #  after the copy started, and is newer than what we would copy.
+            body["dest"]["op_type"] = "create"
+            body["conflicts"] = "proceed"
             # Start the reindex, don't wait (yet) so we get the task information
-            data = config.elastic.reindex({"source": {"index": old_index_name}, "dest": {"index": new_index_name}},
-                                          refresh=True, wait_for_completion=False)
-            # Store our task data in the reindex index, so we effective lock it
-            config.elastic.create(index=self.reindex_index, id=self.document_id, body=data)
-            # Now we wait until it's done
-            # We're setting a longer timeout here since reindexing can take quite a while. (Default is 10s)
-            config.elastic.tasks.get(task_id=data['task'], wait_for_completion=True, ignore=[400, 404], request_timeout=90)
-            # Remove the task item, since we're done.
-            config.elastic.delete(index=self.reindex_index, id=self.document_id, ignore=[400, 404])
-            config.logger.info(f"Removing old index: '{old_index_name}'")
-            config.elastic.indices.close(index=old_index_name)
-            config.elastic.indices.delete(index=old_index_name)
-        elif self.existing_indices:
-            config.logger.warning(f"We expected index '{old_index_name}' to exist, but it was not present in the existing list of indices.")
+            data = config.elastic.reindex(body, refresh=True, wait_for_completion=False)
+            # Store our task data with our lease, so others can see what we are doing
+            lease.heartbeat(task=data['task'])
+            # Now we wait until it's done, polling so we keep our lease alive, since reindexing can take quite a while.
+            self.wait_for_task(lease, data['task'])
+            if config.REINDEX_VERIFY and "query" not in body["source"]:
+                self.verify(lease, body)
+
+        if missing and (config.REINDEX_BACKFILL if backfill is None else backfill):
+            lease.heartbeat()
+            self.backfill(lease)
+
+        # 5. Make sure our new indices are ready to serve searches before they go live, rather than having the first
+        #  searches after the alias flip pay for loading their data.
+        lease.heartbeat()
+        config.elastic.indices.refresh(index=",".join(new_indices.values()))
+        self.warm(list(new_indices.values()), queries=config.REINDEX_WARM_QUERIES, lease=lease)
+        lease.heartbeat()
+
+        # Our previous generations (see `retire`) are kept, they are not part of our data.
+        generations = self.existing_content_type.get(GENERATIONS_FIELD, [])
+        config.elastic.index(index=self.content_type_index, id=self.document_id, body={**self.data, GENERATIONS_FIELD: generations})
+        get_registry().put(self.space, self.document_id, self.data)
+
+        # 6. Update the content type alias(es) to the new index(es)
+        config.logger.debug(f"Updating alias '{self.index_alias}' for '{', '.join(new_indices.values())}'")
+        # Add our new indices to their aliases, and at the same time, iterate over all existing indices for our aliases and remove them.
+        # This should leave us with just our newly created indices as the targets of our aliases.
+        # This also means that at this point, the new indices become primary.
+        actions = []
+        for alias, new_index_name in new_indices.items():
+            actions.append({"add": {"index": new_index_name, "alias": alias}})
+            actions.append({"remove": {"index": new_index_name, "alias": pending_alias(alias)}})
+            if alias != self.index_alias:
+                actions.append({"add": {"index": new_index_name, "alias": self.index_alias}})
+        for name, aliases in self.existing_aliases.items():
+            actions.extend({"remove": {"index": name, "alias": alias}} for alias in aliases)
+        config.elastic.indices.update_aliases({"actions": actions})
+
+        self.store_schema()
+        self.retire(self.existing_aliases, self.existing_content_type)
 
         # Signal we are done creating the index
-        post_index_create.send(self.document_id, space=self.space, index=new_index_name, **kwargs)
+        for alias, locale in self.index_targets:
+            post_index_create.send(self.document_id, space=self.space, index=new_indices[alias], locale=locale, **kwargs)
+        return REINDEX_DONE
+
+
+    def generation(self, aliases: dict, data: dict) -> dict:
+        """
+        Returns the record of a previous generation of our indices, see `retire`.
+
+        :param aliases: The `{index: aliases}` of the generation.
+        :param data: The content type data as stored with the generation, our data if empty.
+        """
+        if data:
+            # The fingerprint the indices were created with, which covers the options of their mapping as well. Only
+            #  records from before we stored it don't have it, their indices are named after their fields alone.
+            fingerprint = data.get(FINGERPRINT_FIELD, None) or serializer.fingerprint(data.get("fields", {"_non_existent_data": "new"}))
+        else:
+            fingerprint = self.fingerprint
+        data = {key: value for key, value in (data or self.data).items() if key not in (FINGERPRINT_FIELD, TARGETS_FIELD, GENERATIONS_FIELD)}
+        return {
+            "aliases": aliases,
+            "data": data,
+            FINGERPRINT_FIELD: fingerprint,
+            "retired": time.time(),
+        }
 
+    def retire(self, aliases: dict, data: dict):
+        """
+        Closes the indices we just replaced, keeping them as our latest previous generation so we can `rollback` to
+        them, unless we keep no generations (`REINDEX_KEEP_GENERATIONS`). Closed indices take no heap, only disk.
+
+        :param aliases: The `{index: aliases}` of the indices we replaced.
+        :param data: The content type data these indices were built for.
+        """
+        generations = list(data.get(GENERATIONS_FIELD, []))
+        for name in aliases.keys():
+            config.logger.info(f"Closing old index: '{name}'")
+            config.elastic.indices.close(index=name)
+        if aliases:
+            generations.insert(0, self.generation(aliases, data))
+        self.store_generations(generations)
+
+    def store_generations(self, generations: list):
+        """
+        Stores our previous generations, deleting the indices of the generations we no longer keep: those beyond
+        `REINDEX_KEEP_GENERATIONS`, or retired over `REINDEX_KEEP_DAYS` ago.
+        """
+        oldest = time.time() - config.REINDEX_KEEP_DAYS * 86400
+        kept = [generation for generation in generations if generation["retired"] >= oldest][:config.REINDEX_KEEP_GENERATIONS]
+        for generation in generations:
+            if generation not in kept:
+                for name in generation["aliases"].keys():
+                    config.logger.info(f"Removing old index: '{name}'")
+                    config.elastic.indices.delete(index=name, ignore=[404])
+        config.elastic.update(index=self.content_type_index, id=self.document_id, body={"doc": {GENERATIONS_FIELD: kept}})
+        return kept
+
+    def warm(self, indices, queries=(), lease=None):
+        """
+        Waits for new (or reopened) indices to be ready to serve searches, and warms their caches with a first search.
+
+        We wait up to `REINDEX_WARM_TIMEOUT` seconds, in steps of `REINDEX_POLL_INTERVAL` so we can renew our lease
+        in between. Each of these requests (and the searches) may take up to `REINDEX_WARM_REQUEST_TIMEOUT` seconds.
+
+        :param queries: Searches to run as well, e.g. those our users run the most. Either query strings or search
+                        bodies, see `Config.REINDEX_WARM_QUERIES`.
+        :param lease: The lease to renew while we wait, if any.
+        """
+        index = ",".join(indices)
+        deadline = time.monotonic() + config.REINDEX_WARM_TIMEOUT
+        while True:
+            wait = max(1, min(config.REINDEX_POLL_INTERVAL, deadline - time.monotonic()))
+            last = time.monotonic() + wait >= deadline
+            # Elastic answers with a 408 if the indices are not ready in time, which only is an error the last time.
+            health = config.elastic.cluster.health(index=index, wait_for_status="yellow", timeout=f"{wait:.0f}s",
+                                                   request_timeout=max(config.REINDEX_WARM_REQUEST_TIMEOUT, wait + 1),
+                                                   ignore=[] if last else [408])
+            if lease is not None:
+                lease.heartbeat()
+            if not health.get("timed_out", False):
+                break
+        config.elastic.search(index=index, body={"query": {"match_all": {}}, "size": 0}, request_cache=False,
+                              request_timeout=config.REINDEX_WARM_REQUEST_TIMEOUT)
+        for query in queries:
+            body = query if isinstance(query, dict) else {"query": {"query_string": {"query": query}}}
+            try:
+                config.elastic.search(index=index, body=body, ignore_unavailable=True,
+                                      request_timeout=config.REINDEX_WARM_REQUEST_TIMEOUT)
+                if lease is not None:
+                    lease.heartbeat()
+            except TransportError as e:
+                # A warm-up query not fitting our mapping (any longer) is no reason to stay on the old indices.
+                config.logger.warning(f"Warm-up query {query!r} failed on '{index}': {e}")
+
+    def discard_pending(self):
+        """
+        Deletes the indices an interrupted rebuild left behind, still behind their pending aliases (see `pending_alias`).
+        We hold the lease, so there is no rebuild in progress that uses them.
+        """
+        names = ",".join(pending_alias(alias) for alias, _ in self.index_targets)
+        response = config.elastic.indices.get_alias(name=names, ignore=[404])
+        for name, data in response.items():
+            if isinstance(data, dict) and data.get("aliases"):
+                config.logger.warning(f"Deleting index '{name}', left behind by an interrupted re-index of '{self.space}.{self.document_id}'")
+                config.elastic.indices.delete(index=name, ignore=[404])
+
+    def rollback(self, backfill=False):
+        """
+        Moves our aliases back to our latest previous generation of indices, all at once. The indices we move away
+        from become our latest previous generation in turn, so another rollback goes back to them.
+
+        Documents written since the generation was retired are not in it, use `backfill` to import them again.
+
+        :returns: The names of the indices we rolled back to, None if there is nothing to roll back to.
+        :raises ReindexInProgress: If someone else is (re)indexing us.
+        """
+        self.ensure_indices()
+        lease = Lease(self.reindex_index, self.document_id)
+        if not lease.acquire():
+            raise ReindexInProgress(f"A re-index of '{self.space}.{self.document_id}' is in progress.")
+        try:
+            self.check_indices()
+            generations = self.existing_content_type.get(GENERATIONS_FIELD, [])
+            if not generations:
+                return None
+            previous, generations = generations[0], generations[1:]
+            names = list(previous["aliases"].keys())
+
+            config.logger.info(f"Rolling '{self.space}.{self.document_id}' back to '{', '.join(names)}'")
+            for name in names:
+                config.elastic.indices.open(index=name)
+            self.warm(names, lease=lease)
+            lease.heartbeat()
+
+            actions = [{"add": {"index": name, "alias": alias}} for name, aliases in previous["aliases"].items() for alias in aliases]
+            for name, aliases in self.existing_aliases.items():
+                actions.extend({"remove": {"index": name, "alias": alias}} for alias in aliases)
+            config.elastic.indices.update_aliases({"actions": actions})
+
+            # We are the content type the generation was built for again, as far as `update` is concerned.
+            targets = sorted({alias for aliases in previous["aliases"].values() for alias in aliases} - {self.index_alias}) or [self.index_alias]
+            data = {**previous["data"], FINGERPRINT_FIELD: previous[FINGERPRINT_FIELD], TARGETS_FIELD: targets,
+                    GENERATIONS_FIELD: generations}
+            config.elastic.index(index=self.content_type_index, id=self.document_id, body=data)
+            get_registry().put(self.space, self.document_id, data)
+            self.retire(self.existing_aliases, {**self.existing_content_type, GENERATIONS_FIELD: generations})
+
+            if backfill:
+                self.backfill(lease)
+        finally:
+            pending = lease.release()
+        if pending:
+            config.logger.info(f"Handling the re-index of '{self.space}.{self.document_id}' requested while we were busy.")
+            ContentType(pending["data"]).reindex_if_needed(force=pending.get("force", False), backfill=pending.get("backfill", None))
+        return names
+
+    def backfill(self, lease=None):
+        """
+        Imports our entries straight from Contentful, using an initial sync of just our content type. This is how new
+        indices are filled when there is no previous index to copy from. Our alias(es) have to point to our new
+        indices already, as this is where the entries are written to.
+
+        :returns: The amount of documents indexed.
+        """
+        from cf_es_mirror.bulk import BulkIndexer
+        from cf_es_mirror.contentful.sync import backfill_content_type
+
+        client = config.client(self.space)
+        if client is None:
+            config.logger.warning(f"Unable to backfill '{self.space}.{self.document_id}', we have no credentials for this space.")
+            return 0
+        start = time.monotonic()
+        # Our new indices are empty, so there is no use in looking for unchanged documents.
+        indexer = BulkIndexer(skip_unchanged=False)
+        backfill_content_type(client, self.document_id, indexer, heartbeat=lease.heartbeat if lease is not None else None)
+        self.backfilled = (indexer.indexed, time.monotonic() - start)
+        config.logger.info(f"Backfilled {indexer.indexed} documents of '{self.space}.{self.document_id}' in {self.backfilled[1]:.1f}s "
+                           f"({indexer.failed} failed).")
+        return indexer.indexed
 
     def remove_index(self):
         """
@@ -323,26 +1058,28 @@ class ContentType(ContentfulType):
 
         pre_index_remove.send(self.document_id)
 
-        # Remove our content type data from the content types index
+        # Remove our content type data from the content types index, along with our previous generations
         if self.existing_content_type:
             config.elastic.delete(index=self.content_type_index, id=self.document_id, ignore=[400, 404])
+            for generation in self.existing_content_type.get(GENERATIONS_FIELD, []):
+                for name in generation["aliases"].keys():
+                    config.elastic.indices.delete(index=name, ignore=[404])
+        get_registry().discard(self.space, self.document_id)
 
         # Sanity check first
         if self.index_alias_exists and not self.existing_indices:
             config.logger.error(f"An alias has been found for the '{self.space}.{self.document_id}' content type, but not index is connected.")
             return
 
-        # Remove our content type alias
-        if self.index_alias_exists:
-            config.logger.info(f"Removing alias: '{self.index_alias}'")
-            config.elastic.indices.delete_alias(index="_all", name=self.index_alias, ignore=[400, 404])
-        # Close all our indices first (this should be only one)
-        for name in self.existing_indices.keys():
-            config.logger.info(f"Closing index: '{name}'")
-            config.elastic.indices.close(index=name, ignore=[400, 404])
-        for name in self.existing_indices.keys():
-            config.logger.info(f"Deleting index: '{name}'")
-            config.elastic.indices.delete(index=name, ignore=[400, 404])
+        # Remove our content type alias(es) and indices, all at once.
+        if self.existing_aliases:
+            config.logger.info(f"Removing alias '{self.index_alias}' and indices: '{', '.join(self.existing_aliases.keys())}'")
+            config.elastic.indices.update_aliases({
+                "actions": [
+                    {"remove_index": {"index": name}}
+                    for name in self.existing_aliases.keys()
+                ]
+            })
 
         post_index_remove.send(self.document_id)
 
@@ -359,10 +1096,18 @@ class ContentType(ContentfulType):
         pass
 
     def publish(self):
-        self.reindex_if_needed()
+        if self.in_background:
+            # (Re)indexing can take a while, much longer than we want to keep a webhook waiting.
+            config.jobs.enqueue(f"{self.space}.{self.document_id}", "publish", self.data)
+        else:
+            self.reindex_if_needed()
 
     def unpublish(self):
-        self.remove_index()
+        if self.in_background:
+            # Shares the job (key) with `publish`, so whatever happened last wins.
+            config.jobs.enqueue(f"{self.space}.{self.document_id}", "unpublish", self.data)
+        else:
+            self.remove_index()
 
     ACTIONS = [
         'create',
@@ -1,16 +1,62 @@
+import asyncio
 import copy
 
-from cf_es_mirror.contentful import ContentfulType
+from elasticsearch.exceptions import TransportError
+
+from cf_es_mirror.contentful import ContentfulType, links
+from cf_es_mirror.contentful.content_type import fill_fallbacks, hash_body, localize_body, pending_alias, is_pending
+from cf_es_mirror.contentful.richtext import add_rich_text
+from cf_es_mirror.contentful.schema import alias_names, get_registry
 from cf_es_mirror.config import config
+from cf_es_mirror.reconcile import sys_version, with_revision
+from cf_es_mirror.transport import overloaded, raise_for_items, spool_delete
 from cf_es_mirror.util import get_path, cached_property, merge
 
 from cf_es_mirror.signals import *
 
 
+def index_action(alias: str, document_id: str) -> dict:
+    """
+    Returns the bulk action line to index a document through `alias`.
+    """
+    meta = {"_index": alias, "_id": document_id}
+    if is_pending(alias):
+        # The reindex may have finished by the time this arrives, in which case we must not create an index by this name.
+        meta["require_alias"] = True
+    return {"index": meta}
+
+
+# The signals whose receivers are handed the body of an entry, and so may change it.
+BODY_SIGNALS = (annotate_entry_index, pre_entry_index, post_entry_index, annotate_entry_batch, pre_entry_batch_index,
+                post_entry_batch_index)
+
+
+def copy_fields(data: dict) -> dict:
+    """
+    Returns a copy of `data` down to the locales of each of its fields, the values themselves are not copied.
+    """
+    fields = data.get("fields", None)
+    if not isinstance(fields, dict):
+        return dict(data)
+    return {**data, "fields": {
+        field_id: dict(values) if isinstance(values, dict) else values for field_id, values in fields.items()
+    }}
+
+
 class Entry(ContentfulType):
-    def __init__(self, data):
+    def __init__(self, data, indexer=None):
         super().__init__(data)
 
+        # When an indexer (see `cf_es_mirror.bulk.BulkIndexer`) is given, writes are queued on it rather than being
+        #  sent to elastic one by one.
+        self.indexer = indexer
+        # The IDs of the linked entries embedded in our document, None if we don't denormalise this content type.
+        self.references = None
+        # Whether the body we built last shares the values of its fields with our data (see `build_body`).
+        self.shares_data = False
+        # The outcome of our last write through an indexer, a dict with a "status" (and "error"), set once flushed.
+        self.result = None
+
         # Ensure validity of this Entry document:
         #  - It must have a sys.id
         #  - It must have a sys.contentType.sys.id
@@ -19,15 +65,65 @@ class Entry(ContentfulType):
             # self.content_type triggers KeyError if it is not present in the document
             # self.space triggers KeyError if it is not present in the document
             self.content_type_index = config.index(self.content_type, space=self.space)
+            # The aliases (and their locale) we write to, see `Config.index_family`.
+            self.index_targets = config.index_family(self.content_type, space=self.space)
             self.valid = self.valid_for_space() and self.document_id is not None
         except KeyError:
             # This is triggered when we cannot find an item in the document. Assume the document is invalid.
             self.valid = False
 
-        if self.valid:
-            # Don't hit elastic until we're convinced this document is valid to process.
-            self.index_exists = config.elastic.indices.exists_alias(name=self.content_type_index)
+    @cached_property
+    def schema(self):
+        """
+        Our content type as we last mirrored it (see `cf_es_mirror.contentful.schema`), None if we don't mirror it.
+        """
+        if not self.valid:
+            return None
+        return get_registry().get(self.space, self.content_type)
 
+    @property
+    def alias_names(self) -> list:
+        """
+        The aliases we may write to: our content type alias, our `index_targets` and their `pending_alias`.
+        """
+        targets = [alias for alias, _ in self.index_targets]
+        return list(dict.fromkeys([self.content_type_index, *targets, *(pending_alias(alias) for alias in targets)]))
+
+    @cached_property
+    def aliases(self) -> set:
+        """
+        Which of our `alias_names` exist, using a single request.
+        """
+        # Don't hit elastic until we're convinced this document is valid to process (and need to know).
+        if not self.valid:
+            return set()
+        if self.indexer is not None:
+            return self.indexer.lookup_aliases(self.alias_names)
+        return alias_names(config.elastic.indices.get_alias(name=",".join(self.alias_names), ignore=[404]))
+
+    @property
+    def write_targets(self) -> list:
+        """
+        The `(alias, locale)` pairs we write to: those of our `index_targets` that exist, followed by the pending
+        aliases of the indices a reindex is populating, so these don't miss the writes happening in the meantime.
+        """
+        existing = self.aliases
+        return [(alias, locale) for alias, locale in self.index_targets if alias in existing] + [
+            (pending_alias(alias), locale) for alias, locale in self.index_targets if pending_alias(alias) in existing
+        ]
+
+    @property
+    def index_exists(self) -> bool:
+        return bool(self.write_targets)
+
+    async def async_index_exists(self):
+        if "aliases" not in self.__dict__:
+            if self.valid:
+                response = await config.async_elastic.indices.get_alias(name=",".join(self.alias_names), ignore=[404])
+                self.aliases = alias_names(response)
+            else:
+                self.aliases = set()
+        return self.index_exists
 
     def store(self):
         # A request is made to store this document for indexing
@@ -37,23 +133,148 @@ class Entry(ContentfulType):
                                   "exists for this content type.", self.space, self.content_type, self.document_id)
             return
 
-        body = copy.deepcopy(self.data)
-        annotations = {}
-        # Annotate our body via signal output
-        for handler, data in annotate_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body):
-            if isinstance(data, dict):
-                merge(annotations, data)
-        merge(body, annotations)
+        body = self.build_body()
 
         # Signal we are about to index
-        pre_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body)
+        if pre_entry_index.has_receivers_for(self.content_type):
+            pre_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body)
 
-        # Simply push it to elastic and we should be done.
-        config.elastic.index(index=self.content_type_index, id=self.document_id, body=body, ignore=[400, 404], refresh=True)
+        if self.indexer is not None:
+            # The indexer sends `post_entry_index` once the bulk request containing this document is done.
+            self.indexer.index(self, body)
+            return
+
+        documents = self.documents(body)
+        lines = [line for alias, document in documents for line in (index_action(alias, self.document_id), document)]
+        try:
+            if len(documents) == 1 and not is_pending(documents[0][0]):
+                # Simply push it to elastic and we should be done.
+                config.elastic.index(index=documents[0][0], id=self.document_id, body=documents[0][1], ignore=[400, 404], refresh=True)
+            else:
+                # Push the documents of all locales in one go.
+                raise_for_items(config.elastic.bulk(body=lines, refresh=True))
+        except TransportError as e:
+            if self.references is not None:
+                lines.extend(line for line in links.references_action(self, self.references) if line is not None)
+            if not self.spool(e, lines):
+                raise
+            return
+        if self.references is not None:
+            links.store_references(self, self.references)
+        links.updated(self.space, self.document_id, body)
 
         # Signal we are done indexing
         post_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body)
 
+        # Any document embedding this entry has to be updated as well.
+        links.refresh_referrers(self.space, [self.document_id])
+
+    async def async_store(self):
+        """
+        Same as `store`, using `config.async_elastic`, for use in async webhook handlers.
+        """
+        if not await self.async_index_exists():
+            config.logger.warning("Attempting to index document of content type '%s.%s' (id: '%s'), but no index "
+                                  "exists for this content type.", self.space, self.content_type, self.document_id)
+            return
+
+        if links.links_for(self.content_type) or config.LOCALE_FALLBACKS or config.RICH_TEXT_SEARCH:
+            # Denormalising looks up the linked entries, and filling in fallbacks and rich text our schema (and the
+            #  fallback chains), which we don't have an async path for.
+            body = await asyncio.to_thread(self.build_body)
+        else:
+            body = self.build_body()
+
+        pre_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body)
+
+        documents = self.documents(body)
+        lines = [line for alias, document in documents for line in (index_action(alias, self.document_id), document)]
+        try:
+            if len(documents) == 1 and not is_pending(documents[0][0]):
+                await config.async_elastic.index(index=documents[0][0], id=self.document_id, body=documents[0][1], ignore=[400, 404], refresh=True)
+            else:
+                raise_for_items(await config.async_elastic.bulk(body=lines, refresh=True))
+        except TransportError as e:
+            if self.references is not None:
+                lines.extend(line for line in links.references_action(self, self.references) if line is not None)
+            if not await asyncio.to_thread(self.spool, e, lines):
+                raise
+            return
+        if self.references is not None:
+            await asyncio.to_thread(links.store_references, self, self.references)
+        links.updated(self.space, self.document_id, body)
+
+        post_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body)
+
+        if config.DENORMALIZE:
+            await asyncio.to_thread(links.refresh_referrers, self.space, [self.document_id])
+
+    def build_body(self):
+        """
+        Builds the document we send to elastic, including the annotations provided by `annotate_entry_index`,
+        the values filled in from fallback locales (see `fill_fallbacks`) and the text of our RichText fields (see
+        `add_rich_text`), as far as we are configured to add these, and the `sys.revision` we compare documents on
+        (see `cf_es_mirror.reconcile.with_revision`).
+        The body is a deep copy of our data whenever a receiver of any of the `BODY_SIGNALS` is handed it. Otherwise it
+        is a copy down to the locales of each field only, which shares the values themselves with our data.
+        """
+        annotate = annotate_entry_index.has_receivers_for(self.content_type)
+        receivers = any(signal.has_receivers_for(self.content_type) for signal in BODY_SIGNALS)
+        if not receivers and not links.links_for(self.content_type):
+            # Nothing changes our data, so a deep copy of it would be a waste.
+            self.references = None
+            self.shares_data = True
+            return copy_fields(with_revision(self.add_rich_text(self.fill_fallbacks(self.data))))
+
+        self.shares_data = False
+        body = copy.deepcopy(self.data)
+        # Embed the linked entries we are configured to denormalise.
+        self.references = links.denormalize(self, body)
+        if annotate:
+            annotations = {}
+            # Annotate our body via signal output
+            for handler, data in annotate_entry_index.send(self.content_type, space=self.space, id=self.document_id, body=body):
+                if isinstance(data, dict):
+                    merge(annotations, data)
+            merge(body, annotations)
+        return with_revision(self.add_rich_text(self.fill_fallbacks(body)))
+
+    def fill_fallbacks(self, body: dict) -> dict:
+        """
+        Fills in the values our localized fields are missing from the fallback chain of their locale, if configured
+        to (see `LOCALE_FALLBACKS`), returning `body` as is otherwise.
+        """
+        if not config.LOCALE_FALLBACKS or self.schema is None:
+            return body
+        chains = config.fallback_chains(self.space)
+        if not chains:
+            return body
+        localized = [field["id"] for field in self.schema.get("fields", []) if field.get("localized", False)]
+        return fill_fallbacks(body, localized, chains)
+
+    def add_rich_text(self, body: dict) -> dict:
+        """
+        Adds the text of our RichText fields to `body` if configured to (see `RICH_TEXT_SEARCH`), returning `body` as
+        is otherwise.
+        """
+        if not config.RICH_TEXT_SEARCH or self.schema is None:
+            return body
+        fields = [field["id"] for field in self.schema.get("fields", []) if field.get("type", None) == "RichText"]
+        return add_rich_text(body, fields)
+
+    def documents(self, body: dict):
+        """
+        Returns the `(alias, document)` pairs to store `body` as (see `write_targets`), one per locale for the
+        "per_locale" index layout. Each document carries its hash when we skip unchanged documents (see `hash_body`).
+        """
+        localized = {}
+        for alias, locale in self.write_targets:
+            if locale not in localized:
+                localized[locale] = body if locale is None else localize_body(body, locale)
+        documents = [(alias, localized[locale]) for alias, locale in self.write_targets]
+        if config.SKIP_UNCHANGED:
+            documents = [(alias, hash_body(document)) for alias, document in documents]
+        return documents
 
     def remove(self):
         # A request is made to remove this document from the index
@@ -67,12 +288,94 @@ class Entry(ContentfulType):
         # Signal we are about to remove a document
         pre_entry_remove.send(self.content_type, space=self.space, id=self.document_id)
 
+        if self.indexer is not None:
+            # The indexer sends `post_entry_remove` once the bulk request containing this removal is done.
+            self.indexer.delete(self)
+            return
+
         # Tell elastic to remove the document, ignore if the document is not indexed to begin with.
-        config.elastic.delete(index=self.content_type_index, id=self.document_id, ignore=[400, 404])
+        targets = self.write_targets
+        lines = [{"delete": {"_index": alias, "_id": self.document_id}} for alias, _ in targets]
+        try:
+            if len(targets) == 1:
+                config.elastic.delete(index=targets[0][0], id=self.document_id, ignore=[400, 404])
+            else:
+                raise_for_items(config.elastic.bulk(body=lines))
+        except TransportError as e:
+            if links.links_for(self.content_type):
+                lines.extend(line for line in links.references_action(self, []) if line is not None)
+            if not self.spool(e, lines):
+                raise
+            return
+        if links.links_for(self.content_type):
+            links.store_references(self, [])
+        links.updated(self.space, self.document_id)
 
         # Signal we are done removing
         post_entry_remove.send(self.content_type, space=self.space, id=self.document_id)
 
+        # Any document embedding this entry should no longer do so.
+        links.refresh_referrers(self.space, [self.document_id])
+
+    async def async_remove(self):
+        """
+        Same as `remove`, using `config.async_elastic`, for use in async webhook handlers.
+        """
+        if not await self.async_index_exists():
+            config.logger.warning("Attempting to remove document of content type '%s.%s' (id: '%s'), but no index "
+                                  "exists for this content type.", self.space, self.content_type, self.document_id)
+            return
+
+        pre_entry_remove.send(self.content_type, space=self.space, id=self.document_id)
+
+        targets = self.write_targets
+        lines = [{"delete": {"_index": alias, "_id": self.document_id}} for alias, _ in targets]
+        try:
+            if len(targets) == 1:
+                await config.async_elastic.delete(index=targets[0][0], id=self.document_id, ignore=[400, 404])
+            else:
+                raise_for_items(await config.async_elastic.bulk(body=lines))
+        except TransportError as e:
+            if links.links_for(self.content_type):
+                lines.extend(line for line in links.references_action(self, []) if line is not None)
+            if not await asyncio.to_thread(self.spool, e, lines):
+                raise
+            return
+        if links.links_for(self.content_type):
+            await asyncio.to_thread(links.store_references, self, [])
+        links.updated(self.space, self.document_id)
+
+        post_entry_remove.send(self.content_type, space=self.space, id=self.document_id)
+
+        if config.DENORMALIZE:
+            await asyncio.to_thread(links.refresh_referrers, self.space, [self.document_id])
+
+    def spool(self, e: Exception, lines) -> bool:
+        """
+        Spools our bulk `lines` for later if `e` tells us elastic is overloaded, and we have a spool (see `Config.spool`).
+
+        :returns: True if spooled.
+        """
+        if config.spool is None or not overloaded(e):
+            return False
+        config.logger.warning("Elastic is overloaded, spooling the write of document of content type '%s.%s' (id: '%s').",
+                              self.space, self.content_type, self.document_id)
+        # Our deletes carry our version, so these aren't replayed once we are published again. Without one, these
+        #  are always replayed.
+        version = sys_version(self.data.get("sys", {}))
+        config.spool.append([spool_delete(line, version) if version and next(iter(line), None) == "delete" else line
+                             for line in lines])
+        return True
+
+    async def async_handle(self, action: str):
+        """
+        Runs a webhook action using the async write path, this mirrors the action methods below.
+        """
+        if action in ('archive', 'delete') or (action == 'unpublish' and not self.store_unpublished):
+            await self.async_remove()
+        elif action == 'publish' or (action in ('save', 'auto_save', 'unarchive') and self.store_unpublished):
+            await self.async_store()
+
 
     # Contentful has a events it calls webhooks for:
     # - create: The entry is created
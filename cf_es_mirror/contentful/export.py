@@ -0,0 +1,118 @@
+import mmap
+import os
+import re
+
+from cf_es_mirror.config import config
+from cf_es_mirror import serializer
+from cf_es_mirror.contentful import ContentType
+from cf_es_mirror.util import get_path
+
+
+# Matches either a complete JSON string (so we can skip over any brackets inside of it) or a single bracket.
+TOKENS = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+
+
+def iter_items(buf, sections=None):
+    """
+    Iterates over the items of the top-level arrays of a JSON document, without parsing the document as a whole.
+
+    `contentful space export` files are a single object of the form `{"contentTypes": [...], "entries": [...], ...}`.
+    We scan `buf` for the boundaries of each object inside those arrays and only parse that slice.
+
+    :param buf: The raw JSON document, as `bytes` or any buffer supporting the `re` module (such as `mmap`).
+    :param sections: An optional list of top-level keys to yield items for, all sections are yielded if not given.
+    :returns: A generator of `(section, item)` tuples.
+    """
+    depth = 0
+    key = section = start = None
+    for match in TOKENS.finditer(buf):
+        pos = match.start()
+        char = buf[pos:pos + 1]
+        if char == b'"':
+            if depth == 1:
+                # Any string on the top level is either a key, or a value we don't care about.
+                key = serializer.loads(match.group())
+            continue
+        if char in b'[{':
+            depth += 1
+            if depth == 2:
+                section = key if char == b'[' and (sections is None or key in sections) else None
+            elif depth == 3 and section is not None:
+                start = pos
+        else:
+            if depth == 3 and start is not None:
+                yield section, serializer.loads(buf[start:match.end()])
+                start = None
+            depth -= 1
+
+
+def iter_export(path, sections=None):
+    """
+    Iterates over the items of a `contentful space export` file.
+
+    The file is memory-mapped, so only the item being parsed is ever held in memory.
+
+    :param path: The path to the export file.
+    :param sections: An optional list of top-level keys to yield items for, all sections are yielded if not given.
+    :returns: A generator of `(section, item)` tuples.
+    """
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield from iter_items(buf, sections=sections)
+
+
+def import_export(path, indexer, force=False, echo=None):
+    """
+    Imports a `contentful space export` file, without doing any calls to the Contentful API.
+
+    Content types are created through `ContentType.reindex_if_needed`, entries are stored through `Entry` using the
+    given `cf_es_mirror.bulk.BulkIndexer`. Export files contain the management API representation of each entry,
+    so we use the publish state in `sys` to determine what to do with it.
+
+    The `fields` of an entry in an export are its latest draft. Unless we store unpublished content, entries that were
+    never published are skipped, as are entries with changes that are not published yet (their published fields are
+    not in the export), which are logged so they can be synced from the delivery API instead.
+
+    :returns: A tuple of the amount of processed content types and entries.
+    """
+    content_types = entries = pending = 0
+    for section, item in iter_export(path, sections=["contentTypes", "entries"]):
+        if section == "contentTypes":
+            obj = ContentType(item)
+            if not obj.valid_for_space():
+                continue
+            content_types += 1
+            if echo: echo(f"Processing content type: '{obj.document_id}'")
+            # The export has our entries, so we don't import them from Contentful.
+            obj.reindex_if_needed(force=force, backfill=False)
+            indexer.forget(obj.index_alias)
+            continue
+
+        obj = indexer.entry(item)
+        if not obj.valid:
+            continue  # We could echo something but that could get really spammy really quick.
+        archived = get_path(item, "sys", "archivedVersion")
+        published = get_path(item, "sys", "publishedVersion")
+        if archived is None and not obj.store_unpublished:
+            if published is None:
+                continue  # Only a draft, there is nothing to deliver.
+            if get_path(item, "sys", "version", default=0) > published + 1:
+                pending += 1
+                config.logger.warning("Skipping entry '%s' of the export, it has unpublished changes so its published "
+                                      "version is not in the export.", obj.document_id)
+                continue
+        entries += 1
+        if archived is not None:
+            obj.archive()
+        elif published is None:
+            obj.save()
+        else:
+            obj.publish()
+        if echo and entries % 10000 == 0:
+            echo(f"Processed {entries} entries.")
+    indexer.flush()
+    if echo and pending:
+        echo(f"Skipped {pending} entries with unpublished changes, sync these to index their published version.")
+    return content_types, entries
@@ -0,0 +1,211 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from elasticsearch.helpers import scan
+
+from cf_es_mirror.config import config
+from cf_es_mirror.util import get_path, merge
+
+
+class EntryCache:
+    """
+    A bounded LRU cache of entry documents, keyed by `(space, id)`.
+
+    Entries are kept for at most `ttl` seconds, since other processes may update them without us knowing.
+    """
+
+    def __init__(self, size: int = 1000, ttl: int = 60):
+        self.size = size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key, None)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def get_many(self, space: str, ids) -> dict:
+        """
+        Returns a `{id: document}` dict for the given entry IDs, fetching whatever we don't have in one go.
+        """
+        found = {}
+        missing = []
+        for doc_id in ids:
+            value = self.get((space, doc_id))
+            if value is None:
+                missing.append(doc_id)
+            else:
+                found[doc_id] = value
+        if missing:
+            for doc_id, value in fetch_entries(space, missing).items():
+                self.put((space, doc_id), value)
+                found[doc_id] = value
+        return found
+
+
+_cache = None
+
+
+def get_cache() -> EntryCache:
+    global _cache
+    if _cache is None:
+        _cache = EntryCache(size=config.ENTRY_CACHE_SIZE, ttl=config.ENTRY_CACHE_TTL)
+    return _cache
+
+
+def fetch_entries(space: str, ids) -> dict:
+    """
+    Fetches the given entries, from our own indices first, falling back to Contentful for what we don't have (yet).
+    """
+    found = {}
+    # Entries can live in any of our content type indices, so we look them up in all of them at once.
+    response = config.elastic.search(index=config.index("*", space=space), body={
+        "query": {"bool": {"filter": [
+            {"ids": {"values": list(ids)}},
+            {"term": {"sys.type": "Entry"}},
+        ]}},
+        "_source": ["sys.id", "fields"],
+        "size": len(ids) * len(config.LANGUAGES),
+    }, ignore_unavailable=True)
+    for hit in response["hits"]["hits"]:
+        # With the "per_locale" index layout an entry is spread over multiple documents.
+        merge(found.setdefault(hit["_id"], {}), hit["_source"])
+
+    missing = [x for x in ids if x not in found]
+    client = config.client(space)
+    if missing and client:
+        for item in client.entries({"sys.id[in]": ",".join(missing), "locale": "*", "include": 0,
+                                    "limit": len(missing)}):
+            found[item.id] = item.raw
+    return found
+
+
+def links_for(content_type: str) -> dict:
+    """
+    Returns the `{field id: [linked field ids]}` we denormalise for the given content type.
+    """
+    links = {}
+    for key, fields in config.DENORMALIZE.items():
+        ct, _, field_id = key.partition('.')
+        if ct == content_type and field_id:
+            links[field_id] = fields
+    return links
+
+
+def denormalize(entry, body: dict):
+    """
+    Embeds the configured fields of linked entries into their links in `body`.
+
+    :returns: The sorted list of linked entry IDs, or None if we don't denormalise this content type.
+    """
+    links = links_for(entry.content_type)
+    if not links:
+        return None
+
+    targets = []
+    for field_id, wanted in links.items():
+        for value in get_path(body, "fields", field_id, default={}).values():
+            for link in (value if isinstance(value, list) else [value]):
+                if get_path(link, "sys", "linkType") == "Entry" and get_path(link, "sys", "id"):
+                    # Remove anything we embedded before, in case the linked entry disappeared since.
+                    link.pop("fields", None)
+                    targets.append((link, wanted))
+    ids = sorted({link["sys"]["id"] for link, _ in targets})
+    if not ids:
+        return ids
+
+    found = get_cache().get_many(entry.space, ids)
+    for link, wanted in targets:
+        linked = found.get(link["sys"]["id"], None)
+        if linked:
+            link["fields"] = {k: v for k, v in linked.get("fields", {}).items() if k in wanted}
+    return ids
+
+
+def references_action(entry, refs):
+    """
+    Returns the bulk action (and body) to record which entries `entry` embeds.
+    """
+    meta = {"_index": config.references_index(entry.space), "_id": f"{entry.content_type}:{entry.document_id}"}
+    if not refs:
+        return {"delete": meta}, None
+    return {"index": meta}, {"content_type": entry.content_type, "id": entry.document_id, "refs": refs}
+
+
+def store_references(entry, refs):
+    action, body = references_action(entry, refs)
+    meta = next(iter(action.values()))
+    if body is None:
+        config.elastic.delete(index=meta["_index"], id=meta["_id"], ignore=[400, 404])
+    else:
+        config.elastic.index(index=meta["_index"], id=meta["_id"], body=body)
+
+
+def updated(space: str, doc_id: str, body: dict = None):
+    """
+    Keep our cache in sync with an entry we just stored (or removed, when no `body` is given).
+    """
+    if not config.DENORMALIZE:
+        return
+    if body is None:
+        get_cache().discard((space, doc_id))
+    else:
+        get_cache().put((space, doc_id), body)
+
+
+def refresh_referrers(space: str, ids) -> int:
+    """
+    Re-indexes all documents that embed any of the given entries, in bulk.
+
+    :returns: The amount of documents re-indexed.
+    """
+    if not config.DENORMALIZE or not ids:
+        return 0
+    from cf_es_mirror.bulk import BulkIndexer
+
+    referrers = {}
+    for hit in scan(config.elastic, query={"query": {"terms": {"refs": list(ids)}}}, index=config.references_index(space),
+                    _source=["content_type", "id"], ignore_unavailable=True):
+        referrers.setdefault(hit["_source"]["content_type"], []).append(hit["_source"]["id"])
+
+    # Don't refresh the referrers of our referrers, they don't embed anything that changed.
+    with BulkIndexer(cascade=False, skip_unchanged=False) as indexer:
+        for content_type, doc_ids in referrers.items():
+            for i in range(0, len(doc_ids), indexer.batch_size):
+                # We search rather than `mget`, as our alias spans multiple indices for the "per_locale" layout.
+                documents = {}
+                for hit in scan(config.elastic, query={"query": {"ids": {"values": doc_ids[i:i + indexer.batch_size]}}},
+                                index=config.index(content_type, space=space), ignore_unavailable=True):
+                    merge(documents.setdefault(hit["_id"], {}), hit["_source"])
+                for data in documents.values():
+                    data.pop("locale", None)
+                    # These are excluded from our `_source`, but we need them to rebuild the Entry.
+                    data.setdefault("sys", {}).update({
+                        "type": "Entry",
+                        "space": {"sys": {"type": "Link", "linkType": "Space", "id": space}},
+                        "contentType": {"sys": {"type": "Link", "linkType": "ContentType", "id": content_type}},
+                    })
+                    obj = indexer.entry(data)
+                    if obj.valid:
+                        obj.store()
+    return indexer.indexed
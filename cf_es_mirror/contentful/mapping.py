@@ -3,6 +3,7 @@ NOT_INDEXED = dict(enabled=False)
 
 # Default field types for ES
 KEYWORD = dict(type="keyword")
+STORED_KEYWORD = dict(type="keyword", index=False, doc_values=False)  # Only kept in `_source`.
 TEXT = dict(type="text")
 BOOL = dict(type="boolean")
 DATE = dict(type="date")
@@ -44,7 +45,7 @@ SYS = {
 FIELDS = {
     "Symbol": TEXT,
     "Text": TEXT,
-    "RichText": DISABLED,  # TODO: Figure out how to best index RichText
+    "RichText": DISABLED,  # Its text is indexed separately, see `cf_es_mirror.contentful.richtext`.
     "Object": DISABLED,
     "Boolean": BOOL,
     "Link": LINK,
@@ -59,5 +60,26 @@ TYPES_MAPPING = {
         "fields": DISABLED,
         "description": DISABLED,
         "displayField": DISABLED,
+        "fingerprint": KEYWORD,
+        "targets": KEYWORD,
+        "generations": DISABLED,
+    }
+}
+
+REFERENCES_MAPPING = {
+    "properties": {
+        "content_type": KEYWORD,
+        "id": KEYWORD,
+        "refs": KEYWORD,
+    }
+}
+
+LEASE_MAPPING = {
+    "properties": {
+        "owner": KEYWORD,
+        "heartbeat": {"type": "double"},
+        "expires": {"type": "double"},
+        "task": KEYWORD,
+        "pending": {"type": "keyword", "index": False, "doc_values": False},
     }
 }
@@ -0,0 +1,76 @@
+"""
+Plain text extraction of RichText field values, so these can be searched (see `RICH_TEXT_SEARCH`).
+
+The text of a RichText field is stored next to it, as `fields.<id>-text`. Contentful field IDs can't contain a "-",
+so this never clashes with a field of the content type itself.
+"""
+
+# Appended to the ID of a RichText field to name the field holding its text.
+TEXT_SUFFIX = "-text"
+
+# Nodes that are part of the text surrounding them, rather than a block of their own.
+INLINES = {
+    "text",
+    "hyperlink",
+    "entry-hyperlink",
+    "asset-hyperlink",
+    "resource-hyperlink",
+    "embedded-entry-inline",
+    "embedded-resource-inline",
+}
+
+
+def text_field(field_id: str) -> str:
+    """
+    Returns the ID of the field holding the text of RichText field `field_id`.
+    """
+    return f"{field_id}{TEXT_SUFFIX}"
+
+
+def extract_text(document) -> str:
+    """
+    Returns the text of a RichText document as a single string, with its whitespace collapsed.
+
+    The document is walked using a stack rather than recursion, so there is no limit to how deeply it may be nested.
+    Blocks (paragraphs, headings, list items, ...) are separated by a space, the text of inline nodes is kept as is.
+    """
+    parts = []
+    append = parts.append
+    # The children we have yet to visit of each node we are in.
+    stack = [iter((document,))]
+    while stack:
+        for node in stack[-1]:
+            if type(node) is not dict:
+                continue
+            node_type = node.get("nodeType", None)
+            if node_type == "text":
+                value = node.get("value", None)
+                if type(value) is str:
+                    append(value)
+                continue
+            content = node.get("content", None)
+            if type(content) is list and content:
+                if node_type not in INLINES:
+                    append(" ")
+                stack.append(iter(content))
+                break
+        else:
+            stack.pop()
+    return " ".join("".join(parts).split())
+
+
+def add_rich_text(body: dict, fields: list) -> dict:
+    """
+    Returns `body` with the text of each of its RichText `fields` added per locale (see `text_field`).
+
+    `body` itself is left as is, as it may be the data of an entry.
+    """
+    values = body.get("fields", {})
+    texts = {}
+    for field_id in fields:
+        documents = values.get(field_id, None)
+        if isinstance(documents, dict):
+            texts[text_field(field_id)] = {lc: extract_text(document) for lc, document in documents.items()}
+    if not texts:
+        return body
+    return {**body, "fields": {**values, **texts}}
@@ -0,0 +1,123 @@
+"""
+The schema registry: the content types we mirror, as stored in the content types index (see `Config.content_type_index`).
+
+Every content type is stored along with the fingerprint of its fields and the aliases its documents are written to,
+so `update_content_types` can tell which content types changed using a single request, rather than comparing each of
+them. Entry writers read the content types from here as well, rather than asking Contentful.
+"""
+from cf_es_mirror.config import config
+from cf_es_mirror.contentful.links import EntryCache
+
+
+FINGERPRINT_FIELD = "fingerprint"
+TARGETS_FIELD = "targets"
+# The previous generations of the indices of a content type, see `ContentType.retire`.
+GENERATIONS_FIELD = "generations"
+
+
+class SchemaRegistry:
+    """
+    Reads the content types index, caching content types for `ttl` seconds as other processes may update them.
+    """
+
+    def __init__(self, size: int = 1000, ttl: int = 60):
+        self.cache = EntryCache(size=size, ttl=ttl)
+
+    def fingerprints(self, space: str) -> dict:
+        """
+        Returns the `{content type: (fingerprint, targets)}` we stored for a space, using a single request. Both are
+        None for content types stored before we kept them.
+        """
+        response = config.elastic.search(index=config.content_type_index(space=space), body={
+            "query": {"match_all": {}},
+            "_source": [FINGERPRINT_FIELD, TARGETS_FIELD],
+            "size": 10000,
+        }, ignore_unavailable=True)
+        return {
+            hit["_id"]: (hit["_source"].get(FINGERPRINT_FIELD, None), hit["_source"].get(TARGETS_FIELD, None))
+            for hit in response["hits"]["hits"]
+        }
+
+    def get(self, space: str, content_type: str):
+        """
+        Returns the content type as we last mirrored it, None if we don't mirror it.
+        """
+        data = self.cache.get((space, content_type))
+        if data is None:
+            response = config.elastic.get(index=config.content_type_index(space=space), id=content_type, ignore=[404])
+            # We cache content types we don't know about as well, as an empty dict.
+            data = response.get("_source", None) or {}
+            self.cache.put((space, content_type), data)
+        return data or None
+
+    def put(self, space: str, content_type: str, data: dict):
+        self.cache.put((space, content_type), data)
+
+    def discard(self, space: str, content_type: str):
+        self.cache.discard((space, content_type))
+
+
+_registry = None
+
+
+def get_registry() -> SchemaRegistry:
+    global _registry
+    if _registry is None:
+        _registry = SchemaRegistry(size=config.SCHEMA_CACHE_SIZE, ttl=config.SCHEMA_CACHE_TTL)
+    return _registry
+
+
+def alias_names(response: dict) -> set:
+    """
+    Returns the aliases in a `get_alias` response, which also holds an "error" when some of the aliases asked for
+    are missing.
+    """
+    return {alias for name, data in response.items() if isinstance(data, dict) for alias in data.get("aliases", {})}
+
+
+def existing_aliases(space: str) -> set:
+    """
+    Returns the aliases of all indices of a space, using a single request.
+    """
+    return alias_names(config.elastic.indices.get_alias(index=config.index("*", space=space), ignore=[404]))
+
+
+def update_content_types(client, force=False, dry_run=False, backfill=None, echo=None) -> dict:
+    """
+    Brings the indices of all content types of a space up to date (see `ContentType.reindex_if_needed`).
+
+    Content types whose fingerprint and targets match what we stored, and whose aliases exist, are unchanged without
+    any further requests.
+
+    :param backfill: See `ContentType.reindex_if_needed`.
+    :param dry_run: Don't change anything, only echo how many shards the indices of each content type would get.
+
+    :returns: The `{content type: result}` of the content types we processed, results being one of the REINDEX_*
+              constants.
+    """
+    from cf_es_mirror.contentful.content_type import ContentType, REINDEX_UNCHANGED
+
+    known = {} if force or dry_run else get_registry().fingerprints(client.space_id)
+    aliases = existing_aliases(client.space_id) if known else set()
+    results = {}
+    for data in client.raw_content_types():
+        obj = ContentType(data)
+        if echo: echo(f"Processing content type: '{client.space_id}.{obj.document_id}'")
+        if dry_run:
+            if echo and obj.valid_for_space():
+                obj.find_indices()
+                for alias, (shards, docs, size) in obj.plan_shards().items():
+                    sized = f"{docs} documents, {size / 1024 ** 2:.1f} MB" if docs is not None else "no existing index"
+                    echo(f"Content type '{obj.document_id}': '{alias}' would get {shards} shard(s) ({sized}).")
+            continue
+        if not obj.valid_for_space():
+            if echo: echo("Invalid for space, skipping")
+            continue
+        if known.get(obj.document_id, None) == (obj.fingerprint, obj.targets) and aliases.issuperset(obj.targets):
+            results[obj.document_id] = REINDEX_UNCHANGED
+        else:
+            results[obj.document_id] = obj.reindex_if_needed(force=force, backfill=backfill)
+        if echo: echo(f"Content type '{obj.document_id}': {results[obj.document_id]}")
+        if echo and obj.backfilled:
+            echo(f"Backfilled {obj.backfilled[0]} documents of '{obj.document_id}' in {obj.backfilled[1]:.1f}s.")
+    return results
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cf_es_mirror.config import config
+
+
+def for_each_space(func, spaces, concurrency: int = None) -> dict:
+    """
+    Calls `func(space)` for each of the given spaces, processing up to `concurrency` spaces at the same time.
+
+    Calls to Contentful are bound by the shared `config.rate_limiter`, regardless of the amount of spaces.
+
+    :returns: A `{space: exception}` dict of the spaces that failed.
+    """
+    concurrency = max(1, min(concurrency or config.SPACE_CONCURRENCY or 1, len(spaces) or 1))
+    if concurrency == 1:
+        # No need for threads, this also keeps tracebacks readable for the single-space case.
+        errors = {}
+        for space in spaces:
+            try:
+                func(space)
+            except Exception as e:
+                config.logger.exception(f"Processing space '{space}' failed.")
+                errors[space] = e
+        return errors
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="cf-space") as pool:
+        futures = {space: pool.submit(func, space) for space in spaces}
+    errors = {}
+    for space, future in futures.items():
+        if future.exception() is not None:
+            config.logger.error(f"Processing space '{space}' failed.", exc_info=future.exception())
+            errors[space] = future.exception()
+    return errors
@@ -0,0 +1,109 @@
+from elasticsearch.helpers import scan
+
+from cf_es_mirror.config import config
+from cf_es_mirror.util import get_path
+
+
+ENTRY_TYPES = ("Entry", "DeletedEntry")
+
+
+def content_type_aliases(space: str) -> dict:
+    """
+    Returns the `{alias: content type}` of the content types we mirror for a space.
+    """
+    index = config.content_type_index(space=space)
+    if not config.elastic.indices.exists(index=index):
+        return {}
+    return {
+        config.index(hit["_id"], space=space): hit["_id"]
+        for hit in scan(config.elastic, index=index, query={"_source": False})
+    }
+
+
+def resolve_deleted(space: str, items, aliases: dict):
+    """
+    Deleted entries in a sync don't tell us their content type, so we look them up in our own indices instead,
+    adding the content type to the `sys` of each item we find.
+    """
+    ids = [item["sys"]["id"] for item in items]
+    response = config.elastic.search(index=config.index("*", space=space), body={
+        "query": {"bool": {"filter": [
+            {"ids": {"values": ids}},
+            {"term": {"sys.type": "Entry"}},
+        ]}},
+        "_source": False,
+        "size": len(ids) * len(config.LANGUAGES),
+    }, ignore_unavailable=True)
+    indices = {}
+    for hit in response["hits"]["hits"]:
+        indices.setdefault(hit["_id"], hit["_index"])
+    if not indices:
+        return
+    index_aliases = config.elastic.indices.get_alias(index=",".join(set(indices.values())))
+    for item in items:
+        index = indices.get(item["sys"]["id"], None)
+        if index is None:
+            continue  # Not something we have indexed.
+        for alias in index_aliases.get(index, {}).get("aliases", {}):
+            if alias in aliases:
+                item["sys"]["contentType"] = {"sys": {"type": "Link", "linkType": "ContentType", "id": aliases[alias]}}
+                break
+
+
+def import_sync(client, indexer, token=None, echo=None):
+    """
+    Imports the entries of a space using the sync API, either from scratch or continuing from `token`.
+
+    Items are read as raw JSON (see `Client.raw_sync`) one page at a time, and written using the given
+    `cf_es_mirror.bulk.BulkIndexer`, which is flushed after every page.
+
+    :returns: The token to continue the sync with later on.
+    """
+    if not token:
+        if echo: echo(f"Performing initial sync of space '{client.space_id}'.")
+        sync = client.raw_sync({'initial': True})
+    else:
+        if echo: echo(f"Continuing with existing sync of space '{client.space_id}'.")
+        sync = client.raw_sync({'sync_token': token})
+
+    aliases = None
+    for items in sync.pages():
+        if echo: echo(f"Sync batch items to process: {len(items)}.")
+        entries = [item for item in items if item["sys"]["type"] in ENTRY_TYPES]  # We don't index assets
+        deleted = [item for item in entries if get_path(item, "sys", "contentType") is None]
+        if deleted:
+            if aliases is None:
+                aliases = content_type_aliases(client.space_id)
+            resolve_deleted(client.space_id, deleted, aliases)
+        for item in entries:
+            obj = indexer.entry(item)
+            if not obj.valid:
+                continue  # We could echo something but that could get really spammy really quick.
+            if item["sys"]["type"] == "DeletedEntry":
+                obj.unpublish()
+            else:
+                obj.publish()
+        indexer.flush()
+        if echo: echo(f"Processed {len(entries)} items of space '{client.space_id}', next token: {sync.next_sync_token}.")
+    return sync.next_sync_token
+
+
+def backfill_content_type(client, content_type: str, indexer, heartbeat=None) -> int:
+    """
+    Imports the published entries of a single content type, using an initial sync filtered on it.
+    Nothing is removed, an initial sync only contains the entries that exist.
+
+    :param heartbeat: Called after every page, e.g. to keep a reindex lease alive.
+    :returns: The amount of entries processed.
+    """
+    processed = 0
+    sync = client.raw_sync({'initial': True, 'type': 'Entry', 'content_type': content_type})
+    for items in sync.pages():
+        for item in items:
+            obj = indexer.entry(item)
+            if obj.valid:
+                obj.publish()
+                processed += 1
+        indexer.flush()
+        if heartbeat: heartbeat()
+    return processed
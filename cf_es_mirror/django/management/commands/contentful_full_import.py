@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from cf_es_mirror.config import config
 from cf_es_mirror.contentful import ContentType, Entry
+from cf_es_mirror.contentful.spaces import for_each_space
 
 from .contentful_update import Command as UpdateCommand
 from .contentful_import_all_documents import Command as ImportCommand
@@ -16,9 +17,17 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--verbose', action='store_true', default=False)
         parser.add_argument('--force', action='store_true', default=False)
+        parser.add_argument('--space', action='append', default=[])
+        parser.add_argument('--all-spaces', action='store_true', default=False)
 
-    def handle(self, verbose=False, force=False, *args, **kwargs):
-        if not config.contentful:
+    def handle(self, verbose=False, force=False, space=None, all_spaces=False, *args, **kwargs):
+        spaces = config.spaces() if all_spaces else (space or [config.SPACE_ID])
+        errors = for_each_space(lambda current: self.import_space(current, verbose=verbose, force=force), spaces)
+        if errors:
+            raise CommandError("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
+
+    def import_space(self, space, verbose=False, force=False):
+        if not config.client(space):
             raise CommandError("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                "CONTENTFUL_ACCESS_TOKEN settingd.")
         doc = {
@@ -27,11 +36,11 @@ class Command(BaseCommand):
             }
         }
         if not force:
-            results = config.elastic.search(index=config.content_type_index(), body=doc)
+            results = config.elastic.search(index=config.content_type_index(space=space), body=doc)
             if len(results["hits"]["hits"]) > 0:
-                self.stdout.write(f"Data already exists in database, skipping import. Use --force to force import on an existing database.")
+                self.stdout.write(f"Data already exists in database for space '{space}', skipping import. Use --force to force import on an existing database.")
                 return
-        self.stdout.write(f"Importing all content types.")
-        UpdateCommand().handle(verbose=verbose)
-        self.stdout.write(f"Importing all content. This might take a while...")
-        ImportCommand().handle(verbose=verbose)
+        self.stdout.write(f"Importing all content types of space '{space}'.")
+        UpdateCommand(stdout=self.stdout, stderr=self.stderr).update(space, verbose=verbose)
+        self.stdout.write(f"Importing all content of space '{space}'. This might take a while...")
+        ImportCommand(stdout=self.stdout, stderr=self.stderr).import_space(space, verbose=verbose)
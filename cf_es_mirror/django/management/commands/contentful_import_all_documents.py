@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from cf_es_mirror.config import config
 from cf_es_mirror.contentful import ContentType, Entry
+from cf_es_mirror.contentful.spaces import for_each_space
 
 
 class Command(BaseCommand):
@@ -15,36 +16,28 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--verbose', action='store_true', default=False)
         parser.add_argument('--token', default=None)
+        parser.add_argument('--space', action='append', default=[])
+        parser.add_argument('--all-spaces', action='store_true', default=False)
 
-    def handle(self, verbose=False, token=None, *args, **kwargs):
-        from contentful import DeletedAsset, DeletedEntry, Asset, Entry as CFEntry
-        ASSET_TYPES = (DeletedAsset, Asset)
-        ENTRY_TYPES = (CFEntry, DeletedEntry)
+    def handle(self, verbose=False, token=None, space=None, all_spaces=False, *args, **kwargs):
+        spaces = config.spaces() if all_spaces else (space or [config.SPACE_ID])
+        if token and len(spaces) > 1:
+            raise CommandError("A sync token can only be used when importing a single space.")
+        errors = for_each_space(lambda current: self.import_space(current, verbose=verbose, token=token), spaces)
+        if errors:
+            raise CommandError("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
 
-        if not config.contentful:
+    def import_space(self, space, verbose=False, token=None):
+        from cf_es_mirror.bulk import BulkIndexer
+        from cf_es_mirror.contentful.sync import import_sync
+
+        client = config.client(space)
+        if not client:
             raise CommandError("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                "CONTENTFUL_ACCESS_TOKEN settingd.")
 
-        if not token:
-            if verbose: self.stdout.write("Performing initial sync.")
-            sync = config.contentful.sync({'initial': True})
-        else:
-            if verbose: self.stdout.write("Continuing with existing sync.")
-            sync = config.contentful.sync({'sync_token': token})
-        while sync.items:
-            if verbose: self.stdout.write(f"Sync batch items to process: {len(sync.items)}.")
-            processed = 0
-            for item in sync.items:
-                if isinstance(item, ASSET_TYPES):
-                    continue  # We don't index assets
-                elif isinstance(item, ENTRY_TYPES):
-                    processed += 1
-                    obj = Entry(item.raw)
-                    if not obj.valid_for_space():
-                        continue  # We could echo something but that could get really spammy really quick.
-                    if isinstance(item, DeletedEntry):
-                        obj.unpublish()
-                    else:
-                        obj.publish()
-            self.stdout.write(f"Processed {processed} items, next token: {sync.next_sync_token}.")
-            sync = config.contentful.sync({'sync_token': sync.next_sync_token})
+        indexer = BulkIndexer()
+        token = import_sync(client, indexer, token=token, echo=self.stdout.write if verbose else None)
+        self.stdout.write(f"Processed space '{space}' ({indexer.indexed} indexed, {indexer.skipped} unchanged "
+                          f"({indexer.skip_ratio:.0%}), {indexer.removed} removed, "
+                          f"{indexer.failed} failed), next token: {token}.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.bulk import BulkIndexer
+from cf_es_mirror.contentful.export import import_export
+
+
+class Command(BaseCommand):
+    """
+    Imports a `contentful space export` file.
+
+    ---
+    The file is read incrementally, so this works for exports of any size, and no calls to Contentful are made.
+    Specify --force to force reindexing of all content types in the export.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument('--verbose', action='store_true', default=False)
+        parser.add_argument('--force', action='store_true', default=False)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, path, verbose=False, force=False, batch_size=None, *args, **kwargs):
+        indexer = BulkIndexer(batch_size=batch_size)
+        try:
+            content_types, entries = import_export(path, indexer, force=force, echo=self.stdout.write if verbose else None)
+        except OSError as e:
+            raise CommandError(f"Unable to read export file '{path}': {e}")
+        self.stdout.write(f"Processed {content_types} content types and {entries} entries ({indexer.indexed} indexed, "
+                          f"{indexer.skipped} unchanged ({indexer.skip_ratio:.0%}), {indexer.removed} removed, "
+                          f"{indexer.failed} failed).")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.config import config
+from cf_es_mirror.contentful.spaces import for_each_space
+from cf_es_mirror.metrics import describe_costs, index_costs
+
+
+class Command(BaseCommand):
+    """
+    Shows what the index of each content type costs.
+    ---
+    Lists the documents, disk usage and indexing time per alias. Specify --fields to break the disk usage down
+    per field (along with its indexing profile) and per feature, such as trigram subfields and term vectors.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fields', action='store_true', default=False)
+        parser.add_argument('--space', action='append', default=[])
+        parser.add_argument('--all-spaces', action='store_true', default=False)
+
+    def handle(self, fields=False, space=None, all_spaces=False, *args, **kwargs):
+        spaces = config.spaces() if all_spaces else (space or [config.SPACE_ID])
+        errors = for_each_space(lambda current: self.index_stats(current, fields=fields), spaces)
+        if errors:
+            raise CommandError("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
+
+    def index_stats(self, space, fields=False):
+        costs = index_costs(space, fields=fields)
+        if not costs:
+            self.stdout.write(f"Space '{space}': no content type indices.")
+        for line in describe_costs(costs):
+            self.stdout.write(line)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.config import config
+from cf_es_mirror.jobs import QUEUED, RUNNING, load_jobs
+
+
+class Command(BaseCommand):
+    """
+    Shows the background (re)indexing jobs.
+    ---
+    Requires JOB_DATABASE, as jobs are otherwise only kept in the memory of the web process.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, limit=20, *args, **kwargs):
+        if not config.JOB_DATABASE:
+            raise CommandError("No job database is configured, please specify the JOB_DATABASE setting.")
+        status = load_jobs(config.JOB_DATABASE, limit=limit)
+        for state in (QUEUED, RUNNING, "finished"):
+            for job in status[state]:
+                duration = f"{job['duration']:.1f}s" if job["duration"] is not None else "-"
+                self.stdout.write(f"{job['id']} {job['state']:<8} {job['key']} ({job['action']}) {duration} "
+                                  f"{job['owner'] or '-'} "
+                                  f"{job['error'] or job['result'] or ''}".rstrip())
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.bulk import BulkIndexer
+from cf_es_mirror.config import config
+from cf_es_mirror.contentful.spaces import for_each_space
+from cf_es_mirror.reconcile import Reconciler
+
+
+class Command(BaseCommand):
+    """
+    Finds and repairs the differences between Contentful and the search index.
+    ---
+    Entries missing from the index or outdated are re-imported, documents no longer in Contentful are removed.
+    Specify --dry-run to only report the differences.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose', action='store_true', default=False)
+        parser.add_argument('--dry-run', action='store_true', default=False)
+        parser.add_argument('--space', action='append', default=[])
+        parser.add_argument('--all-spaces', action='store_true', default=False)
+
+    def handle(self, verbose=False, dry_run=False, space=None, all_spaces=False, *args, **kwargs):
+        spaces = config.spaces() if all_spaces else (space or [config.SPACE_ID])
+        errors = for_each_space(lambda current: self.reconcile(current, verbose=verbose, dry_run=dry_run), spaces)
+        if errors:
+            raise CommandError("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
+
+    def reconcile(self, space, verbose=False, dry_run=False):
+        if not config.client(space):
+            raise CommandError("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
+                               "CONTENTFUL_ACCESS_TOKEN settingd.")
+        if verbose: self.stdout.write(f"Reconciling space '{space}'.")
+        stats = Reconciler(space, BulkIndexer(), dry_run=dry_run).run()
+        self.stdout.write(f"Space '{space}': checked {stats['checked']} entries, {stats['missing']} missing, "
+                          f"{stats['stale']} stale, {stats['orphaned']} orphaned" + (" (dry run, nothing repaired)." if dry_run else ", repaired."))
@@ -11,9 +11,10 @@ class Command(BaseCommand):
     """
     
     def add_arguments(self, parser):
+        parser.add_argument("content_type")
         parser.add_argument("--space", default=config.SPACE_ID)
 
-    def handle(self, space=None, *args, **kwargs):
+    def handle(self, content_type=None, space=None, *args, **kwargs):
         if not config.contentful:
             raise CommandError("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                "CONTENTFUL_ACCESS_TOKEN settingd.")
@@ -22,4 +23,4 @@ class Command(BaseCommand):
         if not obj.valid_for_space():
             raise CommandError("Invalid for space.")
         else:
-            obj.unpublish()
+            obj.remove_index()
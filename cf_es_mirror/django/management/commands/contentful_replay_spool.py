@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.config import config
+
+
+class Command(BaseCommand):
+    """
+    Sends the writes spooled while elastic was overloaded.
+    ---
+    Writes elastic rejects as it is still overloaded are kept in the spool, so this can safely be run repeatedly.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, batch_size=None, *args, **kwargs):
+        if not config.spool:
+            raise CommandError("No spool is configured, please specify the ELASTIC_SPOOL setting.")
+        self.stdout.write(f"Replayed {config.spool.replay(config.elastic, batch_size=batch_size, controller=config.bulk_controller)} spooled actions.")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from cf_es_mirror.config import config
+from cf_es_mirror.contentful import ContentType
+from cf_es_mirror.contentful.content_type import ReindexInProgress
+
+
+class Command(BaseCommand):
+    """
+    Rolls a content type back to its previous generation of indices.
+    ---
+    The indices we roll back from are kept as the previous generation, so rolling back again undoes the rollback.
+    Documents written since the previous generation was replaced are missing from it, specify --backfill to import
+    them again.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("content_type")
+        parser.add_argument("--space", default=config.SPACE_ID)
+        parser.add_argument("--backfill", action="store_true", default=False)
+
+    def handle(self, content_type=None, space=None, backfill=False, *args, **kwargs):
+        space = space or config.SPACE_ID
+        obj = ContentType({"sys": {"id": content_type, "space": {"sys": {"id": space}}}})
+        if not obj.valid_for_space():
+            raise CommandError("Invalid for space.")
+        try:
+            names = obj.rollback(backfill=backfill)
+        except ReindexInProgress as e:
+            raise CommandError(str(e))
+        if not names:
+            raise CommandError(f"There is no previous generation of '{space}.{content_type}' to roll back to.")
+        self.stdout.write(f"Rolled '{space}.{content_type}' back to '{', '.join(names)}'.")
+        if obj.backfilled:
+            self.stdout.write(f"Backfilled {obj.backfilled[0]} documents in {obj.backfilled[1]:.1f}s.")
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand, CommandError
 from cf_es_mirror.config import config
 from cf_es_mirror.contentful import ContentType, Entry
+from cf_es_mirror.contentful.schema import update_content_types
+from cf_es_mirror.contentful.spaces import for_each_space
 
 
 class Command(BaseCommand):
@@ -8,22 +10,29 @@ class Command(BaseCommand):
     Fetches all content types from the back-end, updating where needed
     ---
     Specify --force to force reindexing of all affected content types.
+    Specify --backfill to import the entries of content types getting their first index from Contentful.
+    Specify --dry-run to only show how many shards the indices of each content type would get.
     """
 
     def add_arguments(self, parser):
         parser.add_argument('--verbose', action='store_true', default=False)
         parser.add_argument('--dry-run', action='store_true', default=False)
         parser.add_argument('--force', action='store_true', default=False)
+        parser.add_argument('--backfill', action='store_true', default=None)
+        parser.add_argument('--space', action='append', default=[])
+        parser.add_argument('--all-spaces', action='store_true', default=False)
 
-    def handle(self, verbose=False, dry_run=False, force=False):
-        if not config.contentful:
+    def handle(self, verbose=False, dry_run=False, force=False, backfill=None, space=None, all_spaces=False, *args, **kwargs):
+        spaces = config.spaces() if all_spaces else (space or [config.SPACE_ID])
+        errors = for_each_space(lambda current: self.update(current, verbose=verbose, dry_run=dry_run, force=force,
+                                                            backfill=backfill), spaces)
+        if errors:
+            raise CommandError("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
+
+    def update(self, space, verbose=False, dry_run=False, force=False, backfill=None):
+        client = config.client(space)
+        if not client:
             raise CommandError("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                "CONTENTFUL_ACCESS_TOKEN settingd.")
-        for ct in config.contentful.content_types():
-            if verbose: self.stdout.write(f"Processing content type: '{ct.id}'")
-            if not dry_run:
-                obj = ContentType(ct.raw)
-                if not obj.valid_for_space():
-                    if verbose: self.stderr.write("Invalid for space, skipping")
-                else:
-                    obj.reindex_if_needed(force=force)
+        update_content_types(client, force=force, dry_run=dry_run, backfill=backfill,
+                             echo=self.stdout.write if verbose or dry_run else None)
@@ -4,6 +4,10 @@ from cf_es_mirror.django import views
 
 urlpatterns = [
     path("webhook-update", views.webhook_update, name="webhook-update"),
+    path("webhook-update-async", views.webhook_update_async, name="webhook-update-async"),
+    path("webhook-batch", views.webhook_batch, name="webhook-batch"),
+    path("jobs", views.jobs, name="jobs"),
+    path("metrics", views.metrics, name="metrics"),
 ]
 
 app_name = "cf_es_mirror"
@@ -1,14 +1,17 @@
-import json
+from django.http import Http404, HttpResponse, JsonResponse
 
-from django.http import Http404
-
-from cf_es_mirror.validation import validate_request
+from cf_es_mirror.asgi import handle_webhook
+from cf_es_mirror.batch import apply_events, parse_events
+from cf_es_mirror.config import config
+from cf_es_mirror.metrics import metrics as _metrics
+from cf_es_mirror import serializer
+from cf_es_mirror.validation import validate_auth, validate_request
 
 def webhook_update(request):
     body = None
     if request.body:
         try:
-            body = json.loads(request.body)
+            body = serializer.loads(request.body)
         except:
             return HttpResponse(500)
     validation = validate_request(request.headers, None, body)
@@ -31,3 +34,57 @@ def webhook_update(request):
     except:
         return HttpResponse(status=500)
     return HttpResponse(status=200)
+
+
+async def webhook_update_async(request):
+    """
+    The same as `webhook_update`, for Django running under ASGI. Entries are written using `config.async_elastic`.
+    """
+    body = None
+    if request.body:
+        try:
+            body = serializer.loads(request.body)
+        except:
+            return HttpResponse(status=500)
+    validation = validate_request(request.headers, None, body)
+    if validation == -1:
+        raise Http404("")
+    elif validation == -2:
+        return HttpResponse(status=401)
+    elif not isinstance(validation, tuple):
+        return HttpResponse(status=204)
+
+    obj, action = validation
+    try:
+        await handle_webhook(obj, action)
+    except:
+        return HttpResponse(status=500)
+    return HttpResponse(status=200)
+
+
+def webhook_batch(request):
+    if not validate_auth(request.headers, None):
+        return HttpResponse(status=401)
+    try:
+        events = parse_events(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
+    if len(events) > config.WEBHOOK_BATCH_SIZE:
+        return HttpResponse(status=413)
+    return JsonResponse({"results": apply_events(events)})
+
+
+def jobs(request):
+    """
+    The jobs of this process, as it keeps them in memory. Other processes (web workers, the CLI) sharing the
+    `JOB_DATABASE` have their own, use the `jobs` command to see all of them.
+    """
+    if not validate_auth(request.headers, None):
+        return HttpResponse(status=401)
+    return JsonResponse(config.jobs.status())
+
+
+def metrics(request):
+    if not validate_auth(request.headers, None):
+        return HttpResponse(status=401)
+    return JsonResponse(_metrics())
@@ -5,6 +5,10 @@ from elasticsearch.exceptions import NotFoundError
 
 from cf_es_mirror.config import config
 from cf_es_mirror.contentful import ContentType, Entry
+from cf_es_mirror.contentful.content_type import ReindexInProgress
+from cf_es_mirror.contentful.schema import update_content_types
+from cf_es_mirror.contentful.spaces import for_each_space
+from cf_es_mirror.jobs import QUEUED, RUNNING, load_jobs
 
 
 def register_cli(app):
@@ -44,32 +48,44 @@ def register_cli(app):
         click.echo("Configuration matches")
         ctx.exit(0)
 
-    def _update(verbose, dry_run=False, force=False):
+    def _spaces(space, all_spaces):
+        """
+        Returns the spaces a command should run for.
+        """
+        if all_spaces:
+            return config.spaces()
+        return list(space) or [config.SPACE_ID]
+
+    def _for_each_space(func, spaces):
+        errors = for_each_space(func, spaces)
+        if errors:
+            raise ClickException("Processing failed for space(s): %s" % ', '.join(sorted(errors.keys())))
+
+    def _update(verbose, dry_run=False, force=False, space=None, backfill=None):
         """
         Fetches all content types from the back-end, updating where needed
         ---
         Specify --force to force reindexing of all affected content types.
+        Specify --backfill to import the entries of content types getting their first index from Contentful.
+        Specify --dry-run to only show how many shards the indices of each content type would get.
         """
-        if not config.contentful:
+        client = config.client(space)
+        if not client:
             raise ClickException("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                  "CONTENTFUL_ACCESS_TOKEN environment variables.")
 
-        for ct in config.contentful.content_types():
-            if verbose: click.echo(f"Processing content type: '{ct.id}'")
-            if not dry_run:
-                obj = ContentType(ct.raw)
-                if not obj.valid_for_space():
-                    if verbose: click.echo("Invalid for space, skipping")
-                else:
-                    obj.reindex_if_needed(force=force)
+        update_content_types(client, force=force, dry_run=dry_run, backfill=backfill, echo=click.echo if verbose or dry_run else None)
 
 
     @contentful.command()
     @click.option("--verbose", "-v", count=True)
-    @click.option("--dry-run", "-n", default=False, is_flag=True)
+    @click.option("--dry-run", "-n", default=False, is_flag=True, help="Only show how many shards the indices of each content type would get.")
     @click.option("--force", "-f", default=False, is_flag=True)
-    def update(verbose, dry_run, force):
-        _update(verbose, dry_run, force)
+    @click.option("--backfill", default=None, is_flag=True, help="Import the entries of content types without an index to copy from.")
+    @click.option("--space", multiple=True, help="The space(s) to update, defaults to CONTENTFUL_SPACE_ID.")
+    @click.option("--all-spaces", default=False, is_flag=True, help="Update all spaces we have credentials for.")
+    def update(verbose, dry_run, force, backfill, space, all_spaces):
+        _for_each_space(lambda current: _update(verbose, dry_run, force, space=current, backfill=backfill), _spaces(space, all_spaces))
 
 
     @contentful.command()
@@ -88,10 +104,36 @@ def register_cli(app):
         if not obj.valid_for_space():
             raise ClickException("Invalid for space.")
         else:
-            obj.unpublish()
+            obj.remove_index()
 
 
-    def _import_all_documents(verbose, token=None):
+    @contentful.command()
+    @click.argument("content_type")
+    @click.option("--space", default=config.SPACE_ID)
+    @click.option("--backfill", default=False, is_flag=True, help="Import the entries from Contentful after rolling back.")
+    def rollback(content_type, space, backfill):
+        """
+        Rolls a content type back to its previous generation of indices.
+        ---
+        The indices we roll back from are kept as the previous generation, so rolling back again undoes the rollback.
+        Documents written since the previous generation was replaced are missing from it, specify --backfill to import
+        them again.
+        """
+        obj = ContentType({"sys": {"id": content_type, "space": {"sys": {"id": space}}}})
+        if not obj.valid_for_space():
+            raise ClickException("Invalid for space.")
+        try:
+            names = obj.rollback(backfill=backfill)
+        except ReindexInProgress as e:
+            raise ClickException(str(e))
+        if not names:
+            raise ClickException(f"There is no previous generation of '{space}.{content_type}' to roll back to.")
+        click.echo(f"Rolled '{space}.{content_type}' back to '{', '.join(names)}'.")
+        if obj.backfilled:
+            click.echo(f"Backfilled {obj.backfilled[0]} documents in {obj.backfilled[1]:.1f}s.")
+
+
+    def _import_all_documents(verbose, token=None, space=None):
         """
         Imports all documents to their specified content type(s).
 
@@ -99,76 +141,176 @@ def register_cli(app):
         Please note that the storage/removal of documents depends on the CONTENTFUL_ACCESS_TOKEN's access.
         It is _imperative_ that you do not use this method with a PREVIEW token, when ENABLE_UNPUBLISHED is False!
         """
-        from contentful import DeletedAsset, DeletedEntry, Asset, Entry as CFEntry
-        ASSET_TYPES = (DeletedAsset, Asset)
-        ENTRY_TYPES = (CFEntry, DeletedEntry)
+        from cf_es_mirror.bulk import BulkIndexer
+        from cf_es_mirror.contentful.sync import import_sync
 
-        if not config.contentful:
+        client = config.client(space)
+        if not client:
             raise ClickException("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                  "CONTENTFUL_ACCESS_TOKEN environment variables.")
-        if not token:
-            if verbose: click.echo("Performing initial sync.")
-            sync = config.contentful.sync({'initial': True})
-        else:
-            if verbose: click.echo("Continuing with existing sync.")
-            sync = config.contentful.sync({'sync_token': token})
-        while sync.items:
-            if verbose: click.echo(f"Sync batch items to process: {len(sync.items)}.")
-            processed = 0
-            for item in sync.items:
-                if isinstance(item, ASSET_TYPES):
-                    continue  # We don't index assets
-                elif isinstance(item, ENTRY_TYPES):
-                    processed += 1
-                    obj = Entry(item.raw)
-                    if not obj.valid_for_space():
-                        continue  # We could echo something but that could get really spammy really quick.
-                    if isinstance(item, DeletedEntry):
-                        obj.unpublish()
-                    else:
-                        obj.publish()
-            click.echo(f"Processed {processed} items, next token: {sync.next_sync_token}.")
-            sync = config.contentful.sync({'sync_token': sync.next_sync_token})
+        indexer = BulkIndexer()
+        token = import_sync(client, indexer, token=token, echo=click.echo if verbose else None)
+        click.echo(f"Processed space '{client.space_id}' ({indexer.indexed} indexed, {indexer.skipped} unchanged "
+                   f"({indexer.skip_ratio:.0%}), {indexer.removed} removed, "
+                   f"{indexer.failed} failed), next token: {token}.")
 
 
     @contentful.command()
     @click.option("--verbose", "-v", count=True)
     @click.option("--token", default=None, required=False)
-    def import_all_documents(verbose, token):
-        _import_all_documents(verbose, token)
+    @click.option("--space", multiple=True, help="The space(s) to import, defaults to CONTENTFUL_SPACE_ID.")
+    @click.option("--all-spaces", default=False, is_flag=True, help="Import all spaces we have credentials for.")
+    def import_all_documents(verbose, token, space, all_spaces):
+        spaces = _spaces(space, all_spaces)
+        if token and len(spaces) > 1:
+            raise ClickException("A sync token can only be used when importing a single space.")
+        _for_each_space(lambda current: _import_all_documents(verbose, token, space=current), spaces)
 
 
-    @contentful.command()
-    @click.option("--verbose", "-v", count=True)
-    @click.option("--force", "-f", default=False, is_flag=True)
-    def full_import(verbose, force):
-        """
-        Imports the entire space if the database is empty
-        ---
-        Use the --force toggle to force this regardless of data already existing in the database
-        """
+    def _full_import(verbose, force=False, space=None):
         doc = {
             "query": {
                 "match_all": {}
             }
         }
-        if not config.contentful:
+        if not config.client(space):
             raise ClickException("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
                                  "CONTENTFUL_ACCESS_TOKEN environment variables.")
         if not force:
             try:
-                results = config.elastic.search(index=config.content_type_index(), body=doc)
+                results = config.elastic.search(index=config.content_type_index(space=space), body=doc)
                 if len(results["hits"]["hits"]) > 0:
-                    click.echo(f"Data already exists in database, skipping import. Use --force to force import on an existing database.")
+                    click.echo(f"Data already exists in database for space '{space}', skipping import. Use --force to force import on an existing database.")
                     return
             except NotFoundError:  # This happens when the index does not exist, at which point we have an empty database.
-                click.echo(f"Index {config.content_type_index()} does not exist. Assume this is an empty database.")
+                click.echo(f"Index {config.content_type_index(space=space)} does not exist. Assume this is an empty database.")
                 pass
-        click.echo(f"Importing all content types.")
-        _update(verbose=verbose)
-        click.echo(f"Importing all content. This might take a while...")
-        _import_all_documents(verbose=verbose)
-        
+        click.echo(f"Importing all content types of space '{space}'.")
+        _update(verbose=verbose, space=space)
+        click.echo(f"Importing all content of space '{space}'. This might take a while...")
+        _import_all_documents(verbose=verbose, space=space)
+
+
+    @contentful.command()
+    @click.option("--verbose", "-v", count=True)
+    @click.option("--force", "-f", default=False, is_flag=True)
+    @click.option("--space", multiple=True, help="The space(s) to import, defaults to CONTENTFUL_SPACE_ID.")
+    @click.option("--all-spaces", default=False, is_flag=True, help="Import all spaces we have credentials for.")
+    def full_import(verbose, force, space, all_spaces):
+        """
+        Imports the entire space if the database is empty
+        ---
+        Use the --force toggle to force this regardless of data already existing in the database
+        """
+        _for_each_space(lambda current: _full_import(verbose, force, space=current), _spaces(space, all_spaces))
+
+
+    def _reconcile(verbose, dry_run=False, space=None):
+        from cf_es_mirror.bulk import BulkIndexer
+        from cf_es_mirror.reconcile import Reconciler
+
+        if not config.client(space):
+            raise ClickException("Contentful is not configured, please specify the CONTENTFUL_SPACE_ID and "
+                                 "CONTENTFUL_ACCESS_TOKEN environment variables.")
+        if verbose: click.echo(f"Reconciling space '{space}'.")
+        stats = Reconciler(space, BulkIndexer(), dry_run=dry_run).run()
+        click.echo(f"Space '{space}': checked {stats['checked']} entries, {stats['missing']} missing, "
+                   f"{stats['stale']} stale, {stats['orphaned']} orphaned" + (" (dry run, nothing repaired)." if dry_run else ", repaired."))
+
+
+    @contentful.command()
+    @click.option("--verbose", "-v", count=True)
+    @click.option("--dry-run", "-n", default=False, is_flag=True)
+    @click.option("--space", multiple=True, help="The space(s) to reconcile, defaults to CONTENTFUL_SPACE_ID.")
+    @click.option("--all-spaces", default=False, is_flag=True, help="Reconcile all spaces we have credentials for.")
+    def reconcile(verbose, dry_run, space, all_spaces):
+        """
+        Finds and repairs the differences between Contentful and the search index.
+        ---
+        Entries missing from the index or outdated are re-imported, documents no longer in Contentful are removed.
+        Specify --dry-run to only report the differences.
+        """
+        _for_each_space(lambda current: _reconcile(verbose, dry_run, space=current), _spaces(space, all_spaces))
+
+
+    def _index_stats(fields=False, space=None):
+        from cf_es_mirror.metrics import describe_costs, index_costs
+
+        costs = index_costs(space, fields=fields)
+        if not costs:
+            click.echo(f"Space '{space}': no content type indices.")
+        for line in describe_costs(costs):
+            click.echo(line)
+
+
+    @contentful.command()
+    @click.option("--fields", default=False, is_flag=True, help="Analyze the disk usage of every field, which is expensive.")
+    @click.option("--space", multiple=True, help="The space(s) to report on, defaults to CONTENTFUL_SPACE_ID.")
+    @click.option("--all-spaces", default=False, is_flag=True, help="Report on all spaces we have credentials for.")
+    def index_stats(fields, space, all_spaces):
+        """
+        Shows what the index of each content type costs.
+        ---
+        Lists the documents, disk usage and indexing time per alias. Specify --fields to break the disk usage down
+        per field (along with its indexing profile) and per feature, such as trigram subfields and term vectors.
+        """
+        _for_each_space(lambda current: _index_stats(fields, space=current), _spaces(space, all_spaces))
+
+
+    @contentful.command()
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--verbose", "-v", count=True)
+    @click.option("--force", "-f", default=False, is_flag=True)
+    @click.option("--batch-size", default=None, type=int, help="The amount of entries per bulk request, adaptive if not given.")
+    def import_export(path, verbose, force, batch_size):
+        """
+        Imports a `contentful space export` file.
+
+        ---
+        The file is read incrementally, so this works for exports of any size, and no calls to Contentful are made.
+        Specify --force to force reindexing of all content types in the export.
+        """
+        from cf_es_mirror.bulk import BulkIndexer
+        from cf_es_mirror.contentful.export import import_export as _import_export
+
+        indexer = BulkIndexer(batch_size=batch_size)
+        content_types, entries = _import_export(path, indexer, force=force, echo=click.echo if verbose else None)
+        click.echo(f"Processed {content_types} content types and {entries} entries ({indexer.indexed} indexed, "
+                   f"{indexer.skipped} unchanged ({indexer.skip_ratio:.0%}), {indexer.removed} removed, "
+                   f"{indexer.failed} failed).")
+
+
+    @contentful.command()
+    @click.option("--batch-size", default=None, type=int, help="The amount of actions per bulk request, adaptive if not given.")
+    def replay_spool(batch_size):
+        """
+        Sends the writes spooled while elastic was overloaded.
+        ---
+        Writes elastic rejects as it is still overloaded are kept in the spool, so this can safely be run repeatedly.
+        """
+        if not config.spool:
+            raise ClickException("No spool is configured, please specify the ELASTIC_SPOOL environment variable.")
+        click.echo(f"Replayed {config.spool.replay(config.elastic, batch_size=batch_size, controller=config.bulk_controller)} spooled actions.")
+
+
+    @contentful.command()
+    @click.option("--limit", default=20, help="The amount of jobs to show.")
+    def jobs(limit):
+        """
+        Shows the background (re)indexing jobs.
+        ---
+        Requires JOB_DATABASE, as jobs are otherwise only kept in the memory of the web process.
+        """
+        if not config.JOB_DATABASE:
+            raise ClickException("No job database is configured, please specify the JOB_DATABASE environment variable.")
+        status = load_jobs(config.JOB_DATABASE, limit=limit)
+        for state in (QUEUED, RUNNING, "finished"):
+            for job in status[state]:
+                duration = f"{job['duration']:.1f}s" if job["duration"] is not None else "-"
+                click.echo(f"{job['id']} {job['state']:<8} {job['key']} ({job['action']}) {duration} "
+                           f"{job['owner'] or '-'} "
+                           f"{job['error'] or job['result'] or ''}".rstrip())
+
 
     @contentful.command()
     @click.argument("docid")
@@ -1,11 +1,23 @@
 from cf_es_mirror.flask.base import bp
-from cf_es_mirror.validation import validate_request
+from cf_es_mirror.batch import apply_events, parse_events
+from cf_es_mirror.config import config
+from cf_es_mirror.metrics import metrics as _metrics
+from cf_es_mirror import serializer
+from cf_es_mirror.validation import validate_auth, validate_request
+
+from flask import request, abort, current_app, jsonify
+
+def _json():
+    data = request.get_data()
+    return serializer.loads(data) if data else None
 
-from flask import request, abort, current_app
 
 @bp.route('/webhook-update', methods=['POST'])
 def webhook_update():
-    validation = validate_request(request.headers, request.authorization, request.get_json)
+    try:
+        validation = validate_request(request.headers, request.authorization, _json)
+    except ValueError:
+        return '', 400
     if validation == -1:
         abort(404)
     elif validation == -2:
@@ -25,3 +37,34 @@ def webhook_update():
     except:
         return '', 500
     return '', 200
+
+
+@bp.route('/webhook-batch', methods=['POST'])
+def webhook_batch():
+    if not validate_auth(request.headers, request.authorization):
+        return '', 401
+    try:
+        events = parse_events(request.get_data())
+    except ValueError:
+        return '', 400
+    if len(events) > config.WEBHOOK_BATCH_SIZE:
+        return '', 413
+    return jsonify({"results": apply_events(events)})
+
+
+@bp.route('/jobs', methods=['GET'])
+def jobs():
+    """
+    The jobs of this process, as it keeps them in memory. Other processes (web workers, the CLI) sharing the
+    `JOB_DATABASE` have their own, use the `jobs` command to see all of them.
+    """
+    if not validate_auth(request.headers, request.authorization):
+        return '', 401
+    return jsonify(config.jobs.status())
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    if not validate_auth(request.headers, request.authorization):
+        return '', 401
+    return jsonify(_metrics())
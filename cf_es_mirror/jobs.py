@@ -0,0 +1,267 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from cf_es_mirror.config import config
+
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+def process_owner() -> str:
+    """
+    Identifies a runner in this process as the owner of jobs, as `<hostname>:<pid>:<token>`.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def owner_gone(owner: str) -> bool:
+    """
+    Whether we can tell the process that owns a job no longer exists, which we only can for processes on our host.
+    """
+    host, _, pid = (owner or "").rsplit(":", 1)[0].rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # It exists, we are just not allowed to signal it.
+    return False
+
+
+class Job:
+    def __init__(self, key: str, action: str, payload: dict, id: str = None, state: str = QUEUED, created: float = None,
+                 started: float = None, finished: float = None, result: str = None, error: str = None, owner: str = None):
+        self.id = id or uuid.uuid4().hex
+        self.key = key
+        self.action = action
+        self.payload = payload
+        self.state = state
+        self.created = created or time.time()
+        self.started = started
+        self.finished = finished
+        self.result = result
+        self.error = error
+        # The process (see `process_owner`) that queued or runs this job.
+        self.owner = owner
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "key": self.key,
+            "action": self.action,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "duration": self.duration,
+            "result": self.result,
+            "error": self.error,
+            "owner": self.owner,
+        }
+
+
+class JobRunner:
+    """
+    Runs content type (re)indexing in background threads, so webhooks don't have to wait for it.
+
+    Jobs are keyed by content type, a job that is still queued is replaced by newer requests for the same key, so any
+    amount of publishes collapse into one job. Jobs with the same key never run at the same time. When a `database`
+    is given, jobs are kept in a local sqlite database, so queued jobs survive restarts and can be inspected from
+    another process.
+
+    Several processes may share a database (e.g. web workers and the CLI), each owns the jobs it queued. A process
+    renews the heartbeat of its jobs every `heartbeat` seconds, the jobs of a process that stopped doing so for
+    `stale_after` seconds (or that we can tell is gone) are recovered by the next process to start.
+    """
+
+    def __init__(self, workers: int = 2, database: str = None, history: int = 100, heartbeat: float = 10,
+                 stale_after: float = 60):
+        self.workers = workers
+        self.database = database
+        self.owner = process_owner()
+        self.heartbeat = heartbeat
+        self.stale_after = stale_after
+        self.condition = threading.Condition()
+        self.queued = OrderedDict()
+        self.running = {}
+        self.history = history
+        self.finished = deque(maxlen=history)
+        self.threads = []
+        if self.database:
+            with self.connect() as db:
+                db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, key TEXT, action TEXT, payload TEXT, "
+                           "state TEXT, created REAL, started REAL, finished REAL, result TEXT, error TEXT, "
+                           "owner TEXT, heartbeat REAL)")
+                columns = [row[1] for row in db.execute("PRAGMA table_info(jobs)")]
+                for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                    if column not in columns:
+                        # A database from before we kept track of owners, its jobs count as stale.
+                        db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            threading.Thread(target=self.beat, name="cf-jobs-heartbeat", daemon=True).start()
+            self.recover()
+
+    def connect(self):
+        return sqlite3.connect(self.database, timeout=30)
+
+    def save(self, job: Job):
+        if not self.database:
+            return
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                job.id, job.key, job.action, json.dumps(job.payload), job.state, job.created, job.started,
+                job.finished, job.result, job.error, job.owner, time.time(),
+            ))
+
+    def beat(self):
+        """
+        Renews the heartbeat of the jobs we own, for as long as this process lives.
+        """
+        while True:
+            time.sleep(self.heartbeat)
+            try:
+                with self.connect() as db:
+                    db.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND state IN (?, ?)",
+                               (time.time(), self.owner, QUEUED, RUNNING))
+            except sqlite3.Error:
+                config.logger.exception("Unable to renew the heartbeat of our jobs.")
+
+    def prune(self):
+        """
+        Only keep the last `history` finished jobs in our database.
+        """
+        if not self.database:
+            return
+        with self.connect() as db:
+            db.execute("DELETE FROM jobs WHERE state IN (?, ?) AND id NOT IN (SELECT id FROM jobs WHERE state IN (?, ?) "
+                       "ORDER BY created DESC LIMIT ?)", (FINISHED, FAILED, FINISHED, FAILED, self.history))
+
+    def recover(self):
+        """
+        Queue the jobs a previous process did not get to (or did not finish). Jobs of processes that are still alive
+        are left alone, only those whose owner is gone, or whose heartbeat is stale, are taken over.
+        """
+        stale = time.time() - self.stale_after
+        with self.connect() as db:
+            rows = db.execute("SELECT id, key, action, payload, created, owner, heartbeat FROM jobs WHERE state IN (?, ?) "
+                              "ORDER BY created", (QUEUED, RUNNING)).fetchall()
+        for id, key, action, payload, created, owner, heartbeat in rows:
+            if owner == self.owner or not (heartbeat is None or heartbeat < stale or owner_gone(owner)):
+                continue
+            with self.connect() as db:
+                # Another process may be recovering the same job, only one of us gets to take it over.
+                claimed = db.execute("UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ? AND owner IS ? AND heartbeat IS ?",
+                                     (self.owner, time.time(), id, owner, heartbeat)).rowcount
+            if claimed:
+                self.enqueue(key, action, json.loads(payload), id=id, created=created)
+
+    def enqueue(self, key: str, action: str, payload: dict, **kwargs) -> Job:
+        with self.condition:
+            job = self.queued.get(key, None)
+            if job is not None:
+                # Newer requests replace what is queued, but keep their place in the queue.
+                job.action, job.payload = action, payload
+            else:
+                job = self.queued[key] = Job(key, action, payload, owner=self.owner, **kwargs)
+            self.save(job)
+            self.start()
+            self.condition.notify()
+        return job
+
+    def start(self):
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self.work, name=f"cf-jobs-{len(self.threads)}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def next_job(self):
+        for key, job in self.queued.items():
+            if key not in self.running:
+                return self.queued.pop(key)
+        return None
+
+    def work(self):
+        while True:
+            with self.condition:
+                job = self.next_job()
+                while job is None:
+                    self.condition.wait()
+                    job = self.next_job()
+                job.state, job.started = RUNNING, time.time()
+                self.running[job.key] = job
+                self.save(job)
+            try:
+                job.result = self.run(job)
+                job.state = FINISHED
+            except Exception as e:
+                config.logger.exception(f"Job '{job.key}' ({job.action}) failed.")
+                job.state, job.error = FAILED, str(e)
+            with self.condition:
+                job.finished = time.time()
+                self.running.pop(job.key, None)
+                self.finished.appendleft(job)
+                self.save(job)
+                self.prune()
+                self.condition.notify_all()
+
+    def run(self, job: Job):
+        from cf_es_mirror.contentful import ContentType
+        obj = ContentType(job.payload)
+        if job.action == "unpublish":
+            obj.remove_index()
+            return "removed"
+        return obj.reindex_if_needed()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait until all jobs are done.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.queued and not self.running, timeout=timeout)
+
+    def status(self) -> dict:
+        """
+        The jobs of this process only, as kept in its memory. See `load_jobs` for the jobs of all processes sharing
+        our database.
+        """
+        with self.condition:
+            return {
+                "owner": self.owner,
+                "queued": [job.as_dict() for job in self.queued.values()],
+                "running": [job.as_dict() for job in self.running.values()],
+                "finished": [job.as_dict() for job in self.finished],
+            }
+
+
+def load_jobs(database: str, limit: int = 100) -> dict:
+    """
+    Reads the jobs from a job database, e.g. to show the jobs of the web process from the CLI.
+    """
+    status = {QUEUED: [], RUNNING: [], "finished": []}
+    with sqlite3.connect(database, timeout=30) as db:
+        # The owner is only known once a process that keeps track of it migrated the database.
+        owner = "owner" if "owner" in [row[1] for row in db.execute("PRAGMA table_info(jobs)")] else "NULL"
+        rows = db.execute(f"SELECT id, key, action, payload, state, created, started, finished, result, error, {owner} "
+                          "FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+    for id, key, action, payload, state, created, started, finished, result, error, owner in rows:
+        job = Job(key, action, None, id=id, state=state, created=created, started=started, finished=finished,
+                  result=result, error=error, owner=owner)
+        status[state if state in (QUEUED, RUNNING) else "finished"].append(job.as_dict())
+    return status
@@ -0,0 +1,131 @@
+import json
+import os
+import socket
+import time
+import uuid
+
+from elasticsearch.exceptions import ConflictError, NotFoundError
+
+from cf_es_mirror.config import config
+
+
+class LeaseLost(Exception):
+    """
+    Raised when a lease expired and was taken over by someone else.
+    """
+
+
+class Lease:
+    """
+    A lock stored as a document in elastic, which expires unless its owner keeps renewing it.
+
+    Acquiring uses `op_type=create`, every other change uses `if_seq_no`/`if_primary_term`, so concurrent processes
+    can never both own the lease. If the owner dies, the lease simply expires after `ttl` seconds and can be taken
+    over. Contenders can leave their request on the lease (see `request`), which the owner picks up on `release`.
+    """
+
+    def __init__(self, index: str, key: str, ttl: int = None):
+        self.index = index
+        self.key = key
+        self.ttl = ttl or config.REINDEX_LEASE_TTL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.seq_no = self.primary_term = None
+        self.data = {}
+
+    def _track(self, response):
+        self.seq_no, self.primary_term = response["_seq_no"], response["_primary_term"]
+
+    def _body(self):
+        now = time.time()
+        return {**self.data, "owner": self.owner, "heartbeat": now, "expires": now + self.ttl}
+
+    def acquire(self, **data) -> bool:
+        """
+        Try to acquire the lease, without waiting.
+
+        :returns: True if we own the lease.
+        """
+        self.data = data
+        try:
+            self._track(config.elastic.index(index=self.index, id=self.key, body=self._body(), op_type="create", refresh=True))
+            return True
+        except ConflictError:
+            pass
+
+        current = config.elastic.get(index=self.index, id=self.key, ignore=[404])
+        if not current.get("found", False):
+            # Released in the meantime, give it one more go.
+            try:
+                self._track(config.elastic.index(index=self.index, id=self.key, body=self._body(), op_type="create", refresh=True))
+                return True
+            except ConflictError:
+                return False
+        if current["_source"].get("expires", 0) >= time.time():
+            return False
+
+        config.logger.warning(f"Taking over expired lease '{self.index}/{self.key}' from '{current['_source'].get('owner')}'.")
+        try:
+            self._track(config.elastic.index(index=self.index, id=self.key, body=self._body(), refresh=True,
+                                             if_seq_no=current["_seq_no"], if_primary_term=current["_primary_term"]))
+            return True
+        except ConflictError:
+            return False
+
+    def heartbeat(self, **data):
+        """
+        Renew the lease, optionally updating the data stored with it.
+        """
+        self.data.update(data)
+        try:
+            self._track(config.elastic.index(index=self.index, id=self.key, body=self._body(), refresh=True,
+                                             if_seq_no=self.seq_no, if_primary_term=self.primary_term))
+        except ConflictError:
+            current = config.elastic.get(index=self.index, id=self.key, ignore=[404])
+            if not current.get("found", False) or current["_source"].get("owner") != self.owner:
+                raise LeaseLost(f"Lost lease '{self.index}/{self.key}'.")
+            # A contender left a request on our lease, keep it around.
+            self.data["pending"] = current["_source"].get("pending")
+            self._track(config.elastic.index(index=self.index, id=self.key, body=self._body(), refresh=True,
+                                             if_seq_no=current["_seq_no"], if_primary_term=current["_primary_term"]))
+
+    def release(self):
+        """
+        Release the lease.
+
+        :returns: The request a contender left on the lease while we owned it (see `request`), if any.
+        """
+        pending = self.data.get("pending")
+        while True:
+            try:
+                config.elastic.delete(index=self.index, id=self.key, refresh=True,
+                                      if_seq_no=self.seq_no, if_primary_term=self.primary_term)
+                break
+            except NotFoundError:
+                break
+            except ConflictError:
+                current = config.elastic.get(index=self.index, id=self.key, ignore=[404])
+                if not current.get("found", False) or current["_source"].get("owner") != self.owner:
+                    break
+                pending = current["_source"].get("pending")
+                self._track(current)
+        return json.loads(pending) if pending else None
+
+    def request(self, data, attempts: int = 3) -> bool:
+        """
+        Leave a request on a lease owned by someone else, to be handled once they are done.
+        A newer request replaces an older one, so any amount of requests coalesce into one.
+
+        :returns: True if the request was stored.
+        """
+        for _ in range(attempts):
+            current = config.elastic.get(index=self.index, id=self.key, ignore=[404])
+            if not current.get("found", False):
+                return False
+            try:
+                config.elastic.index(index=self.index, id=self.key, refresh=True,
+                                     body={**current["_source"], "pending": json.dumps(data)},
+                                     if_seq_no=current["_seq_no"], if_primary_term=current["_primary_term"])
+                return True
+            except ConflictError:
+                continue
+        return False
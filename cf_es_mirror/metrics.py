@@ -0,0 +1,103 @@
+from cf_es_mirror.config import config
+from cf_es_mirror.util import get_path
+
+
+def metrics() -> dict:
+    """
+    Returns the state of this process' connection to elastic: how we size our bulk requests (see
+    `cf_es_mirror.bulk.BulkController`) and whether the circuit breaker is open. Disabled features are None.
+    """
+    breaker = config.breaker
+    return {
+        "bulk": config.bulk_controller.status() if config.bulk_controller is not None else None,
+        "breaker": {"open": breaker.open, "failures": breaker.failures} if breaker is not None else None,
+    }
+
+
+def index_costs(space: str, fields=False) -> dict:
+    """
+    Returns what the indices of the content types we mirror for a space cost, per alias (see `Config.index_family`),
+    counting the primary shards of the indices behind it:
+
+        {alias: {"content_type", "indices", "documents", "bytes", "indexed", "indexing_ms", "profiles", "fields"}}
+
+    "indexed" and "indexing_ms" are the amount of documents indexed and the time spent on it since the indices were
+    (re)opened. "profiles" holds the indexing profile of each field (see `field_profile`).
+
+    With `fields`, "fields" maps every field of the mapping (e.g. "fields.title.en.trigrams") to its `{"bytes",
+    "term_vectors"}` disk usage, which is expensive to analyze. Elastic keeps track of the time spent indexing per
+    index, not per field.
+    """
+    from cf_es_mirror.contentful.content_type import field_profile
+    from cf_es_mirror.contentful.schema import get_registry
+    from cf_es_mirror.contentful.sync import content_type_aliases
+
+    aliases = {
+        alias: content_type
+        for content_type in sorted(set(content_type_aliases(space).values()))
+        for alias, _ in config.index_family(content_type, space=space)
+    }
+    if not aliases:
+        return {}
+    response = config.elastic.indices.get_alias(name=",".join(aliases), ignore=[404])
+    indices = {
+        name: [alias for alias in data.get("aliases", {}) if alias in aliases]
+        for name, data in response.items() if isinstance(data, dict)
+    }
+    if not indices:
+        return {}
+    stats = config.elastic.indices.stats(index=",".join(indices), metric="docs,store,indexing")["indices"]
+
+    costs = {}
+    for name, names in indices.items():
+        primaries = stats.get(name, {}).get("primaries", {})
+        usage = {}
+        if fields:
+            usage = get_path(config.elastic.indices.disk_usage(index=name, run_expensive_tasks=True), name, "fields", default={})
+        for alias in names:
+            if alias not in costs:
+                data = get_registry().get(space, aliases[alias]) or {}
+                costs[alias] = {
+                    "content_type": aliases[alias], "indices": [], "documents": 0, "bytes": 0, "indexed": 0, "indexing_ms": 0,
+                    "profiles": {field["id"]: field_profile(aliases[alias], field) for field in data.get("fields", []) if "id" in field},
+                    "fields": {},
+                }
+            cost = costs[alias]
+            cost["indices"].append(name)
+            cost["documents"] += get_path(primaries, "docs", "count", default=0)
+            cost["bytes"] += get_path(primaries, "store", "size_in_bytes", default=0)
+            cost["indexed"] += get_path(primaries, "indexing", "index_total", default=0)
+            cost["indexing_ms"] += get_path(primaries, "indexing", "index_time_in_millis", default=0)
+            for field, data in usage.items():
+                field_cost = cost["fields"].setdefault(field, {"bytes": 0, "term_vectors": 0})
+                field_cost["bytes"] += data.get("total_in_bytes", 0)
+                field_cost["term_vectors"] += data.get("term_vectors_in_bytes", 0)
+    return costs
+
+
+def describe_costs(costs: dict) -> list:
+    """
+    Returns the lines describing `index_costs`, the most expensive fields first.
+    """
+    def size(value):
+        return f"{value / 1024 ** 2:.1f} MB"
+
+    lines = []
+    for alias, cost in costs.items():
+        per_document = cost["indexing_ms"] / cost["indexed"] if cost["indexed"] else 0
+        lines.append(f"'{alias}' ({cost['content_type']}): {cost['documents']} documents, {size(cost['bytes'])}, "
+                     f"{cost['indexing_ms'] / 1000:.1f}s indexing {cost['indexed']} documents ({per_document:.2f} ms per document).")
+        if not cost["fields"]:
+            continue
+        for field, usage in sorted(cost["fields"].items(), key=lambda item: -item[1]["bytes"]):
+            parts = field.split(".")
+            profile = cost["profiles"].get(parts[1], None) if len(parts) > 1 and parts[0] == "fields" else None
+            lines.append(f"  {field}" + (f" ({profile})" if profile else "") + f": {size(usage['bytes'])}"
+                         + (f", of which term vectors {size(usage['term_vectors'])}" if usage["term_vectors"] else ""))
+        features = {
+            "trigram subfields": sum(usage["bytes"] for field, usage in cost["fields"].items() if field.endswith(".trigrams")),
+            "keyword subfields": sum(usage["bytes"] for field, usage in cost["fields"].items() if field.endswith(".keyword")),
+            "term vectors": sum(usage["term_vectors"] for usage in cost["fields"].values()),
+        }
+        lines.append("  Features: " + ", ".join(f"{feature} {size(value)}" for feature, value in features.items()) + ".")
+    return lines
@@ -0,0 +1,230 @@
+import heapq
+import tempfile
+
+from elasticsearch.helpers import scan
+
+from cf_es_mirror.config import config
+from cf_es_mirror.util import get_path
+
+
+def sys_version(sys: dict):
+    """
+    Returns the version we compare entries on: the amount of times they were published. Delivery API data has this
+    as `revision`, management API data (such as webhook payloads and space exports) as `publishedCounter`. Their
+    `version` counts every change instead, so we never compare on it.
+    """
+    version = sys.get("revision", None)
+    if version is None:
+        version = sys.get("publishedCounter", None)
+    return version or 0
+
+
+def with_revision(body: dict) -> dict:
+    """
+    Returns `body` with the `sys.revision` we compare it on (see `sys_version`), so every document we write has it,
+    whichever API its data came from. `body` itself is left as is.
+    """
+    sys = body.get("sys", None)
+    if not isinstance(sys, dict) or sys.get("revision", None) is not None:
+        return body
+    return {**body, "sys": {**sys, "revision": sys_version(sys)}}
+
+
+def sorted_items(items, chunk_size: int = 100000):
+    """
+    Sorts `(id, version, content_type)` tuples in bounded memory.
+
+    Items are sorted in chunks of `chunk_size`, chunks are spilled to temporary files and merged back together.
+    """
+    runs = []
+    chunk = []
+    try:
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                runs.append(_spill(sorted(chunk)))
+                chunk = []
+        if not runs:
+            yield from sorted(chunk)
+            return
+        runs.append(_spill(sorted(chunk)))
+        yield from heapq.merge(*[_read(run) for run in runs])
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill(chunk):
+    run = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for doc_id, version, content_type in chunk:
+        run.write(f"{doc_id}\t{version}\t{content_type}\n")
+    run.seek(0)
+    return run
+
+
+def _read(run):
+    for line in run:
+        doc_id, version, content_type = line.rstrip("\n").split("\t")
+        yield doc_id, int(version), content_type
+
+
+def merge_join(left, right):
+    """
+    Joins two streams of `(id, version, content_type)` tuples, both sorted by id.
+
+    :returns: A generator of `(id, left item, right item)` tuples, where either item is None if it is missing.
+    """
+    left, right = iter(left), iter(right)
+    a, b = next(left, None), next(right, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], a, None
+            a = next(left, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], None, b
+            b = next(right, None)
+        else:
+            yield a[0], a, b
+            a, b = next(left, None), next(right, None)
+
+
+def unique(items):
+    """
+    Drops consecutive duplicate ids, e.g. the per-locale documents of an entry.
+    """
+    last = None
+    for item in items:
+        if item[0] != last:
+            last = item[0]
+            yield item
+
+
+def contentful_items(client, page_size: int = 1000):
+    """
+    Scans all entries of a space, only fetching `sys`.
+    """
+    skip = 0
+    while True:
+        page = client.entries({"select": "sys", "locale": "*", "order": "sys.id", "limit": page_size, "skip": skip})
+        for item in page.items:
+            yield item.raw["sys"]["id"], sys_version(item.raw["sys"]), get_path(item.raw, "sys", "contentType", "sys", "id")
+        skip += len(page.items)
+        if not page.items or skip >= page.total:
+            return
+
+
+def elastic_items(alias: str, content_type: str, page_size: int = 5000):
+    """
+    Scans all documents of an alias sorted by id, using a point in time and `search_after`.
+
+    Only `sys.id` and `sys.revision` are fetched, using docvalue fields rather than loading `_source`.
+    """
+    pit = config.elastic.open_point_in_time(index=alias, keep_alive="2m")["id"]
+    try:
+        search_after = None
+        while True:
+            body = {
+                "pit": {"id": pit, "keep_alive": "2m"},
+                "size": page_size,
+                "sort": [{"sys.id": "asc"}],
+                "_source": False,
+                "docvalue_fields": ["sys.id", "sys.revision"],
+                "query": {"match_all": {}},
+            }
+            if search_after is not None:
+                body["search_after"] = search_after
+            response = config.elastic.search(body=body)
+            pit = response.get("pit_id", pit)
+            hits = response["hits"]["hits"]
+            for hit in hits:
+                fields = hit.get("fields", {})
+                yield hit["_id"], (fields.get("sys.revision") or [0])[0], content_type
+            if len(hits) < page_size:
+                return
+            search_after = hits[-1]["sort"]
+    finally:
+        config.elastic.close_point_in_time(body={"id": pit}, ignore=[404])
+
+
+class Reconciler:
+    """
+    Compares the entries in Contentful with the documents in elastic, and repairs the differences.
+
+    Both sides are reduced to sorted `(id, version, content_type)` streams and merge-joined, so only the repairs
+    currently being batched are ever held in memory.
+    """
+
+    def __init__(self, space: str, indexer, dry_run=False, batch_size: int = 100):
+        self.space = space
+        self.client = config.client(space)
+        self.indexer = indexer
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.stats = {"checked": 0, "missing": 0, "stale": 0, "orphaned": 0}
+        self.pending = []
+
+    def content_types(self):
+        index = config.content_type_index(space=self.space)
+        if not config.elastic.indices.exists(index=index):
+            return set()
+        return set(hit["_id"] for hit in scan(config.elastic, index=index, query={"_source": False}))
+
+    def elastic_items(self, content_types):
+        streams = []
+        for content_type in content_types:
+            # With the "per_locale" layout, the index of the first locale holds all entries as well.
+            alias, _ = config.index_family(content_type, space=self.space)[0]
+            if config.elastic.indices.exists_alias(name=alias):
+                streams.append(unique(elastic_items(alias, content_type)))
+        return heapq.merge(*streams)
+
+    def run(self):
+        content_types = self.content_types()
+        # We can only repair entries of the content types we mirror.
+        cf_items = (item for item in contentful_items(self.client) if item[2] in content_types)
+        for doc_id, cf, es in merge_join(sorted_items(cf_items), self.elastic_items(content_types)):
+            self.stats["checked"] += 1
+            if es is None:
+                self.stats["missing"] += 1
+                self.fetch(doc_id)
+            elif cf is None:
+                self.stats["orphaned"] += 1
+                self.remove(doc_id, es[2])
+            elif cf[1] != es[1] or cf[2] != es[2]:
+                self.stats["stale"] += 1
+                if cf[2] != es[2]:
+                    self.remove(doc_id, es[2])
+                self.fetch(doc_id)
+        self.flush()
+        if not self.dry_run:
+            self.indexer.flush()
+        return self.stats
+
+    def remove(self, doc_id: str, content_type: str):
+        if self.dry_run:
+            return
+        obj = self.indexer.entry({
+            "sys": {
+                "id": doc_id,
+                "space": {"sys": {"id": self.space}},
+                "contentType": {"sys": {"id": content_type}},
+            },
+        })
+        if obj.valid:
+            obj.remove()
+
+    def fetch(self, doc_id: str):
+        if self.dry_run:
+            return
+        self.pending.append(doc_id)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        ids, self.pending = self.pending, []
+        for item in self.client.entries({"sys.id[in]": ",".join(ids), "locale": "*", "include": 0, "limit": len(ids)}):
+            obj = self.indexer.entry(item.raw)
+            if obj.valid:
+                obj.publish()
@@ -0,0 +1,77 @@
+"""
+JSON encoding and decoding for our hot paths: the elastic transport, webhook bodies and export files.
+
+Uses `orjson` when it is installed (and `SERIALIZER` is not set to "json"), the `json` module otherwise.
+"""
+import hashlib
+import json
+
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer as BaseJSONSerializer
+
+from cf_es_mirror.config import config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def use_orjson() -> bool:
+    return orjson is not None and config.SERIALIZER != "json"
+
+
+def loads(data):
+    """
+    Decodes JSON from `str` or `bytes`.
+    """
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data, default=None) -> str:
+    if use_orjson():
+        return orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, default=default, ensure_ascii=False, separators=(",", ":"))
+
+
+def fingerprint(data) -> str:
+    """
+    Returns a short hash of `data`, e.g. to name the index of a content type after its fields.
+
+    This always uses the `json` module, as the hash has to stay the same for existing indices regardless of the
+    serializer in use.
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode('ascii', 'ignore')).hexdigest()[:8]
+
+
+def digest(data) -> str:
+    """
+    Returns a hash of the contents of `data`, regardless of its key order, e.g. to tell whether a document changed.
+    """
+    if use_orjson():
+        encoded = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    else:
+        encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class JSONSerializer(BaseJSONSerializer):
+    """
+    The serializer of the elastic client (see `Config.elastic`), using `orjson` when available.
+    """
+
+    def loads(self, s):
+        if not use_orjson():
+            return super().loads(s)
+        try:
+            return orjson.loads(s)
+        except ValueError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        if isinstance(data, (str, bytes)) or not use_orjson():
+            return super().dumps(data)
+        # Falls back on the base class for what orjson doesn't know, such as `Decimal`.
+        return dumps(data, default=self.default)
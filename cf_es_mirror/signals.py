@@ -14,6 +14,11 @@ annotate_entry_index = signal('annotate-entry-index')
 pre_entry_index = signal('pre-entry-index')
 post_entry_index = signal('post-entry-index')
 
+# Sent by `cf_es_mirror.bulk.BulkIndexer` once per batch and content type, with the `(space, id, body)` items.
+annotate_entry_batch = signal('annotate-entry-batch')
+pre_entry_batch_index = signal('pre-entry-batch-index')
+post_entry_batch_index = signal('post-entry-batch-index')
+
 
 __all__ = [
     'pre_index_remove',
@@ -29,4 +34,8 @@ __all__ = [
     'annotate_entry_index',
     'pre_entry_index',
     'post_entry_index',
+
+    'annotate_entry_batch',
+    'pre_entry_batch_index',
+    'post_entry_batch_index',
 ]
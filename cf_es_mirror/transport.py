@@ -0,0 +1,338 @@
+import os
+import threading
+import time
+
+from elasticsearch import Transport as BaseTransport
+from elasticsearch.exceptions import ConnectionError, TransportError
+
+from cf_es_mirror.util import get_path
+
+try:
+    from elasticsearch import AsyncTransport as BaseAsyncTransport
+except ImportError:  # pragma: no cover, requires aiohttp
+    BaseAsyncTransport = None
+
+
+# The statuses elastic uses to tell us it is overloaded.
+OVERLOADED = (429, 503)
+
+# The version of the entry a spooled delete removed, kept on its action line in the spool only (see `Spool.current`).
+SPOOL_VERSION = "cf_mirror_version"
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Raised instead of doing a request while elastic is overloaded, see `CircuitBreaker`.
+    """
+
+    def __str__(self):
+        return "CircuitOpenError(elastic is overloaded, not sending requests for now)"
+
+
+def overloaded(e: Exception) -> bool:
+    """
+    Whether `e` tells us elastic is overloaded, and the request is worth trying again later.
+    """
+    return isinstance(e, CircuitOpenError) or (isinstance(e, TransportError) and e.status_code in OVERLOADED)
+
+
+def raise_for_items(response: dict):
+    """
+    Raises a `TransportError` for an action elastic failed in a bulk `response`, preferring one telling us it is
+    overloaded (see `overloaded`). A missing document, or pending alias (see `require_alias`), is no failure.
+    """
+    failed = [result for item in response.get("items", []) for result in item.values()
+              if result.get("status", 500) >= 300 and result.get("status") != 404]
+    if failed:
+        result = next((result for result in failed if result.get("status") in OVERLOADED), failed[0])
+        error = result.get("error", None)
+        raise TransportError(result.get("status", 500), error.get("type", None) if isinstance(error, dict) else error, result)
+
+
+class CircuitBreaker:
+    """
+    Stops us from sending requests to elastic for `reset_after` seconds, once it responded with 429/503 (or could not
+    be reached, or did not answer in time) `threshold` times in a row. After that, a single request is let through to
+    test the waters; if that fails as well the breaker opens again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        return self.opened is not None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened is None:
+                return True
+            if self.probing or time.monotonic() - self.opened < self.reset_after:
+                return False
+            self.probing = True
+            return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+            self.probing = False
+
+    def release(self):
+        """
+        Lets the next request test the waters, when the request that did could not tell us how elastic is doing.
+        """
+        with self.lock:
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.threshold:
+                self.opened = time.monotonic()
+
+
+class TransportMixin:
+    """
+    Adds per-operation timeouts and a `CircuitBreaker` to an elastic transport, see `Transport` and `AsyncTransport`.
+
+    `timeouts` maps an operation ("write", "bulk", "alias" or "task") to the timeout in seconds of its requests,
+    any request not listed uses the default `timeout` of the client. An explicit `request_timeout` always wins.
+    """
+
+    def __init__(self, *args, timeouts: dict = None, breaker: CircuitBreaker = None, **kwargs):
+        self.timeouts = timeouts or {}
+        self.breaker = breaker
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def operation(method: str, url: str):
+        parts = [part for part in url.split("?", 1)[0].split("/") if part]
+        if "_bulk" in parts:
+            return "bulk"
+        if "_aliases" in parts or "_alias" in parts:
+            return "alias"
+        if parts and parts[0] == "_tasks":
+            return "task"
+        if method in ("PUT", "POST", "DELETE") and any(part in parts for part in ("_doc", "_create", "_update")):
+            return "write"
+        return None
+
+    def prepare(self, method, url, params):
+        """
+        Returns the `params` of a request with its timeout, raising `CircuitOpenError` if our breaker is open.
+        """
+        timeout = self.timeouts.get(self.operation(method, url), None)
+        if timeout and "request_timeout" not in (params or {}):
+            params = {**(params or {}), "request_timeout": timeout}
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("N/A", "Circuit open")
+        return params
+
+    def report(self, e: Exception = None):
+        """
+        Tells our breaker how a request went, `e` being what it raised (if anything).
+        """
+        if self.breaker is None:
+            return
+        if e is None:
+            self.breaker.success()
+        elif isinstance(e, TransportError):
+            if overloaded(e) or isinstance(e, ConnectionError):
+                # Overloaded, down or not answering in time (`ConnectionTimeout` is a `ConnectionError`).
+                self.breaker.failure()
+            else:
+                # Anything else is still an answer, so elastic is not overloaded.
+                self.breaker.success()
+        else:
+            # E.g. a serialization error, which tells us nothing about elastic. We must not keep the breaker waiting
+            #  for a probe that never reports back though.
+            self.breaker.release()
+
+
+class Transport(TransportMixin, BaseTransport):
+    """
+    The transport of our elastic client, see `TransportMixin`.
+    """
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        params = self.prepare(method, url, params)
+        try:
+            result = super().perform_request(method, url, headers=headers, params=params, body=body)
+        except Exception as e:
+            self.report(e)
+            raise
+        self.report()
+        return result
+
+
+if BaseAsyncTransport is not None:
+    class AsyncTransport(TransportMixin, BaseAsyncTransport):
+        """
+        The transport of our async elastic client (see `Config.async_elastic`), see `TransportMixin`.
+        """
+
+        async def perform_request(self, method, url, headers=None, params=None, body=None):
+            params = self.prepare(method, url, params)
+            try:
+                result = await super().perform_request(method, url, headers=headers, params=params, body=body)
+            except Exception as e:
+                self.report(e)
+                raise
+            self.report()
+            return result
+else:  # pragma: no cover
+    AsyncTransport = None
+
+
+def spool_delete(line: dict, version) -> dict:
+    """
+    Returns delete action `line` as we spool it, with the version of the entry it removes (see `SPOOL_VERSION`).
+    """
+    return {**line, SPOOL_VERSION: version}
+
+
+class Spool:
+    """
+    A file we append bulk request lines to when elastic is overloaded, to be replayed later on (see `replay`).
+
+    Writes keep happening once elastic recovered, so a spooled action may be outdated by the time it is replayed.
+    Only the last action per document is replayed, and only if elastic doesn't have a newer version of the entry.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def append(self, lines):
+        from cf_es_mirror import serializer
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(serializer.dumps(line) + "\n")
+
+    def actions(self, f):
+        """
+        Yields the spooled actions of `f`, each a list of the action line and (unless it's a delete) its document.
+        """
+        from cf_es_mirror import serializer
+        lines = (serializer.loads(line) for line in f if line.strip())
+        for action in lines:
+            yield [action] if next(iter(action)) == "delete" else [action, next(lines)]
+
+    @staticmethod
+    def version(action):
+        """
+        Returns the entry version of a spooled action, None if it has none (e.g. our references).
+        """
+        from cf_es_mirror.reconcile import sys_version
+        if len(action) == 1:
+            return action[0].get(SPOOL_VERSION, None)
+        sys = action[1].get("sys", None) if isinstance(action[1], dict) else None
+        return sys_version(sys) if isinstance(sys, dict) and sys.get("id", None) else None
+
+    def current(self, elastic, actions) -> list:
+        """
+        Leaves out the actions elastic has a newer version of the entry for than the action does, looking these up
+        using a single `mget`. Actions without a version are kept.
+        """
+        from cf_es_mirror.reconcile import sys_version
+        versioned = [action for action in actions if self.version(action) is not None]
+        if not versioned:
+            return actions
+        docs = elastic.mget(body={"docs": [
+            {"_index": meta["_index"], "_id": meta["_id"], "_source": ["sys.revision"]}
+            for meta in (next(iter(action[0].values())) for action in versioned)
+        ]})["docs"]
+        outdated = set()
+        for action, doc in zip(versioned, docs):
+            if doc.get("found", False) and sys_version(get_path(doc, "_source", "sys", default={})) > self.version(action):
+                outdated.add(id(action))
+        return [action for action in actions if id(action) not in outdated]
+
+    def send(self, elastic, actions, controller=None) -> int:
+        """
+        Sends a batch of spooled actions, spooling whatever elastic rejects again. Actions elastic has a newer
+        version of the entry for are left out (see `current`).
+
+        :returns: The amount of actions elastic accepted.
+        """
+        actions = self.current(elastic, actions)
+        if not actions:
+            return 0
+        start = time.monotonic()
+        try:
+            response = elastic.bulk(body=[
+                {key: value for key, value in line.items() if key != SPOOL_VERSION} if i == 0 else line
+                for action in actions for i, line in enumerate(action)
+            ])
+        except TransportError as e:
+            if controller is not None and overloaded(e):
+                controller.reject()
+            raise
+        rejected = []
+        for action, item in zip(actions, response.get("items", [])):
+            if next(iter(item.values()), {}).get("status") in OVERLOADED:
+                rejected.append(action)
+        if rejected:
+            self.append(line for action in rejected for line in action)
+        if controller is not None:
+            if rejected:
+                controller.reject(time.monotonic() - start)
+            else:
+                controller.success(time.monotonic() - start)
+        return len(actions) - len(rejected)
+
+    def replay(self, elastic, batch_size: int = None, controller=None) -> int:
+        """
+        Sends the spooled actions to elastic, removing the spool once everything is sent.
+
+        The spool is moved aside first, so anything spooled in the meantime ends up in a new spool. If elastic fails
+        us halfway, whatever we did not send yet is put back. Only the last action per document is sent, so the
+        actions of the spool are read into memory first.
+
+        Batches are `batch_size` actions, or sized by `controller` (see `cf_es_mirror.bulk.BulkController`) if not
+        given, falling back to 1000.
+
+        :returns: The amount of actions replayed.
+        """
+        with self.lock:
+            if not os.path.exists(self.path):
+                return 0
+            replaying = f"{self.path}.replaying"
+            if not os.path.exists(replaying):
+                os.replace(self.path, replaying)
+
+        replayed = 0
+        with open(replaying, "r", encoding="utf-8") as f:
+            last = {}
+            for action in self.actions(f):
+                meta = next(iter(action[0].values()))
+                key = (meta.get("_index"), meta.get("_id"))
+                # Moved to the end, so the order of the last actions is kept.
+                last.pop(key, None)
+                last[key] = action
+            actions = iter(list(last.values()))
+            batch = []
+            try:
+                for action in actions:
+                    batch.append(action)
+                    if len(batch) >= (batch_size or (controller.size if controller is not None else 1000)):
+                        replayed += self.send(elastic, batch, controller)
+                        batch = []
+                if batch:
+                    replayed += self.send(elastic, batch, controller)
+                    batch = []
+            except Exception:
+                self.append(line for action in batch for line in action)
+                self.append(line for action in actions for line in action)
+                raise
+            finally:
+                os.remove(replaying)
+        return replayed
@@ -47,6 +47,14 @@ def split_dict(x: str, sep: str = ',', valsep: str = '=', default: Any = None):
     return {key: val for key, val in [y.split(valsep, 1) for y in x]}
 
 
+def split_dict_list(x: str, sep: str = ',', valsep: str = '=', listsep: str = '|', default: Any = None):
+    if not x:
+        return default
+    if isinstance(x, dict):
+        return x
+    return {key: split_list(val, sep=listsep, default=[]) for key, val in split_dict(x, sep=sep, valsep=valsep).items()}
+
+
 def to_bool(x: str, default: Any = False):
     if x is None:
         return default
@@ -69,6 +77,17 @@ def to_int(x: str, default: Any = 0):
     return try_int(x, default)
 
 
+def to_float(x: str, default: Any = 0.0):
+    if x is None:
+        return default
+    if isinstance(x, (int, float)):
+        return float(x)
+    try:
+        return float(x)
+    except:
+        return default
+
+
 def merge(a, b):
     for k, v in b.items():
         if isinstance(v, dict):
@@ -81,10 +100,12 @@ def merge(a, b):
 
 __all__ = [
     'to_int',
+    'to_float',
     'try_int',
     'to_bool',
     'split_list',
     'split_dict',
+    'split_dict_list',
     'cached_property',
     'get_path',
 ]
\ No newline at end of file
@@ -1,7 +1,35 @@
+import base64
+
 from cf_es_mirror.config import config
 from cf_es_mirror.contentful import ContentfulType
 
 
+def validate_auth(headers, authorization) -> bool:
+    """
+    Checks the request against WEBHOOK_AUTH, if configured.
+
+    :returns: True if the request is authenticated (or no authentication is configured).
+    """
+    if not config.WEBHOOK_AUTH:
+        return True
+    if authorization is None:
+        auth_type, _, auth_info = headers.get("Authorization", "").partition(" ")
+        if auth_type == "Basic":
+            try:
+                username, password = base64.b64decode(auth_info).decode("ascii").split(":")
+            except Exception:
+                return False
+            authorization = dict(username=username, password=password)
+    try:
+        if config.WEBHOOK_AUTH[authorization["username"]] != authorization["password"]:
+            config.logger.info("Received unauthenticated request.")
+            return False
+    except:
+        config.logger.info("Received unauthenticated request.")
+        return False
+    return True
+
+
 def validate_request(headers, authorization, json_data):
     """
     :returns: Either an integer indicating the error type, or a tuple of the object and the action name.
@@ -33,29 +61,35 @@ def validate_request(headers, authorization, json_data):
         config.logger.info(f"Received request with invalid Content-Type: '{content_type}'")
         return -1
 
+    topic = parse_topic(headers['X-Contentful-Topic'])
+    if topic is None:
+        return -1
+
+    if not validate_auth(headers, authorization):
+        return -2
+
+    return validate_event(*topic, json_data)
+
+
+def parse_topic(topic):
+    """
+    Splits a webhook topic (e.g. "ContentManagement.Entry.publish") into its type and action.
+
+    :returns: A tuple of the type and action, or None if the topic is invalid.
+    """
     try:
-        _, _type, action = headers['X-Contentful-Topic'].split('.', 2)
+        _, _type, action = topic.split('.', 2)
     except:
-        return -1
+        return None
+    return _type, action
 
-    if config.WEBHOOK_AUTH:
-        if authorization is None:
-            auth_header = headers.get("Authorization", " ")
-            auth_type, auth_info = auth_header.split(None, 1)
-            if auth_type == "Basic":
-                try:
-                    username, password = base64.b64decode(auth_info).decode("ascii").split(":")
-                except Exception:
-                    return -2
-                authorization = dict(username=username, password=password)
-        try:
-            if config.WEBHOOK_AUTH[authorization["username"]] != authorization["password"]:
-                config.logger.info("Received unauthenticated request.")
-                return -2
-        except:
-            config.logger.info("Received unauthenticated request.")
-            return -2
 
+def validate_event(_type, action, json_data):
+    """
+    Validates the type, action and data of a webhook event, once the request itself is validated.
+
+    :returns: See `validate_request`, this only returns 0, -3 or a tuple of the object and the action name.
+    """
     klass = ContentfulType.get_type(_type)
     if not klass:
         config.logger.info(f"Received webhook request for invalid type: '{_type}/{action}'")
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+
+from elasticsearch.exceptions import TransportError
+
+from cf_es_mirror.asgi import application
+from cf_es_mirror.transport import Spool
+
+from .base import BaseTestCase
+
+
+class FakeIndices:
+    def __init__(self, aliases):
+        self.aliases = aliases
+
+    async def get_alias(self, name, **kwargs):
+        found = [alias for alias in name.split(",") if alias in self.aliases]
+        return {f"{alias}-index": {"aliases": {alias: {}}} for alias in found} or {"error": "alias missing", "status": 404}
+
+
+class FakeAsyncElastic:
+    """
+    Records the calls an async webhook makes, rather than sending them to elastic.
+    """
+
+    def __init__(self, *aliases, overloaded=False):
+        self.indices = FakeIndices(aliases)
+        self.overloaded = overloaded
+        self.calls = []
+
+    async def index(self, **kwargs):
+        if self.overloaded:
+            raise TransportError(429, "es_rejected_execution_exception")
+        self.calls.append(("index", kwargs["index"], kwargs["id"]))
+
+    async def delete(self, **kwargs):
+        self.calls.append(("delete", kwargs["index"], kwargs["id"]))
+
+    async def bulk(self, body, **kwargs):
+        self.calls.append(("bulk", len(body)))
+
+
+def entry(doc_id, content_type="blog"):
+    return {
+        "sys": {
+            "id": doc_id,
+            "type": "Entry",
+            "space": {"sys": {"id": "sp"}},
+            "contentType": {"sys": {"id": content_type}},
+        },
+        "fields": {"title": {"en": doc_id}},
+    }
+
+
+def call(topic, body, auth="test:test"):
+    headers = [
+        (b"x-contentful-topic", f"ContentManagement.Entry.{topic}".encode()),
+        (b"x-contentful-webhook-name", b"test"),
+        (b"content-type", b"application/vnd.contentful.management.v1+json"),
+        (b"authorization", b"Basic " + base64.b64encode(auth.encode())),
+    ]
+    scope = {"type": "http", "method": "POST", "path": "/hooks/v1/webhook-update", "headers": headers}
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent[0]["status"]
+
+
+class AsgiTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "WEBHOOK_AUTH": {"test": "test"},
+        "ACCEPTED_SPACE_IDS": ["sp"],
+    }
+
+    def setUp(self):
+        from cf_es_mirror.config import Config, config
+        self.elastic = FakeAsyncElastic(config.index("blog", space="sp"))
+        Config.instance.async_elastic = self.elastic
+
+    def test_publish(self):
+        self.assertEqual(call("publish", entry("a")), 200)
+        self.assertEqual(call("delete", entry("b")), 200)
+        self.assertEqual([name for name, *_ in self.elastic.calls], ["index", "delete"])
+
+    def test_missing_index(self):
+        self.assertEqual(call("publish", entry("a", content_type="page")), 200)
+        self.assertEqual(self.elastic.calls, [])
+
+    def test_spool(self):
+        from cf_es_mirror.config import Config, config
+        Config.instance.async_elastic = FakeAsyncElastic(config.index("blog", space="sp"), overloaded=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            Config.instance.spool = Spool(os.path.join(tmp, "spool.ndjson"))
+            try:
+                # Like the sync write path, writes are spooled while elastic is overloaded.
+                self.assertEqual(call("publish", entry("a")), 200)
+                with open(Config.instance.spool.path, encoding="utf-8") as f:
+                    self.assertEqual([next(iter(action[0].values()))["_id"] for action in Config.instance.spool.actions(f)], ["a"])
+            finally:
+                Config.instance.spool = None
+
+    def test_auth(self):
+        self.assertEqual(call("publish", entry("a"), auth="test:wrong"), 401)
+        self.assertEqual(self.elastic.calls, [])
@@ -0,0 +1,176 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from elasticsearch.exceptions import TransportError
+
+from cf_es_mirror.batch import apply_events, parse_events
+
+from .base import BaseTestCase
+
+
+class FakeIndices:
+    def __init__(self, *aliases):
+        self.aliases = aliases or ("sp-blog",)
+
+    def get_alias(self, name, **kwargs):
+        found = [alias for alias in name.split(",") if alias in self.aliases]
+        return {f"{alias}-index": {"aliases": {alias: {}}} for alias in found} or {"error": "alias missing", "status": 404}
+
+
+class FakeElastic:
+    """
+    Accepts every bulk action, except for documents with a "fail" title, and those with a "busy" title while
+    overloaded.
+    """
+
+    def __init__(self):
+        self.indices = FakeIndices()
+        self.requests = []
+        self.documents = {}
+
+    def bulk(self, body, **kwargs):
+        self.requests.append(body)
+        items = []
+        lines = iter(body)
+        for action in lines:
+            op_type, meta = next(iter(action.items()))
+            document = next(lines) if op_type == "index" else {}
+            title = document.get("fields", {}).get("title", {}).get("en")
+            status = {"fail": 400, "busy": 429}.get(title, 200)
+            if status == 200:
+                if op_type == "index":
+                    self.documents[(meta["_index"], meta["_id"])] = document
+                else:
+                    self.documents.pop((meta["_index"], meta["_id"]), None)
+            items.append({op_type: {"_id": meta["_id"], "status": status, "error": "failed" if status >= 300 else None}})
+        return {"items": items}
+
+    def mget(self, body, **kwargs):
+        docs = []
+        for doc in body["docs"]:
+            document = self.documents.get((doc["_index"], doc["_id"]), None)
+            if document is None:
+                docs.append({"_id": doc["_id"], "found": False})
+            else:
+                docs.append({"_id": doc["_id"], "found": True, "_source": {k: document[k] for k in doc["_source"] if k in document}})
+        return {"docs": docs}
+
+
+def event(action, doc_id, version, title="title", content_type="blog"):
+    return {
+        "topic": f"ContentManagement.Entry.{action}",
+        "body": {
+            "sys": {"id": doc_id, "type": "Entry", "version": version, "space": {"sys": {"id": "sp"}},
+                    "contentType": {"sys": {"id": content_type}}},
+            "fields": {"title": {"en": title}},
+        },
+    }
+
+
+class FakeJobs:
+    def __init__(self):
+        self.queued = []
+
+    def enqueue(self, key, action, payload):
+        self.queued.append((key, action))
+
+
+class BatchTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+    }
+
+    def setUp(self):
+        from cf_es_mirror.config import Config
+        self.elastic = Config.instance.elastic = FakeElastic()
+
+    def test_parse(self):
+        events = [event("publish", "a", 1), event("delete", "a", 2)]
+        self.assertEqual(parse_events(json.dumps(events).encode()), events)
+        self.assertEqual(parse_events("\n".join(json.dumps(e) for e in events).encode() + b"\n"), events)
+        with self.assertRaises(ValueError):
+            parse_events(b'{"topic": "x"')
+
+    def test_apply(self):
+        results = apply_events([
+            event("delete", "a", 3),
+            event("publish", "a", 2),
+            event("publish", "b", 1, title="fail"),
+            event("publish", "c", 1, content_type="page"),
+            {"topic": "nonsense"},
+            event("publish", "d", 1, title="d"),
+        ])
+        self.assertEqual([result["status"] for result in results], [200, 200, 400, 204, 400, 200])
+        # A single bulk request, in which the delete of "a" (version 3) comes after its publish (version 2).
+        self.assertEqual(len(self.elastic.requests), 1)
+        actions = [line for line in self.elastic.requests[0] if "index" in line or "delete" in line]
+        self.assertEqual([(next(iter(line)), next(iter(line.values()))["_id"]) for line in actions],
+                         [("index", "a"), ("delete", "a"), ("index", "b"), ("index", "d")])
+
+    def test_pending_reindex(self):
+        # A reindex is populating a new index, which gets our writes as well.
+        self.elastic.indices = FakeIndices("sp-blog", "sp-blog+pending")
+        results = apply_events([event("publish", "a", 1), event("delete", "b", 1)])
+        self.assertEqual([result["status"] for result in results], [200, 200])
+        actions = [line for line in self.elastic.requests[0] if "index" in line or "delete" in line]
+        self.assertEqual(actions, [
+            {"index": {"_index": "sp-blog", "_id": "a"}},
+            {"index": {"_index": "sp-blog+pending", "_id": "a", "require_alias": True}},
+            {"delete": {"_index": "sp-blog", "_id": "b"}},
+            {"delete": {"_index": "sp-blog+pending", "_id": "b"}},
+        ])
+        self.assertEqual(self.elastic.documents[("sp-blog", "a")], self.elastic.documents[("sp-blog+pending", "a")])
+
+    def test_content_types_first(self):
+        from cf_es_mirror.config import Config
+        from cf_es_mirror.contentful import ContentType
+        Config.instance.REINDEX_IN_BACKGROUND = True
+        jobs = Config.instance.jobs = FakeJobs()
+        reindexed = []
+        content_type = lambda id: {
+            "topic": "ContentManagement.ContentType.publish",
+            "body": {"sys": {"id": id, "type": "ContentType", "space": {"sys": {"id": "sp"}}}, "fields": []},
+        }
+        try:
+            with mock.patch.object(ContentType, "reindex_if_needed", lambda self: reindexed.append(self.document_id)):
+                results = apply_events([event("publish", "a", 1), content_type("blog"), content_type("page")])
+        finally:
+            Config.instance.REINDEX_IN_BACKGROUND = False
+        self.assertEqual([result["status"] for result in results], [200, 200, 200])
+        # The index of "blog" has to exist for the entry in the same batch, "page" can wait.
+        self.assertEqual(reindexed, ["blog"])
+        self.assertEqual(jobs.queued, [("sp.page", "publish")])
+
+    def test_store_failed(self):
+        from cf_es_mirror.contentful import Entry
+        from cf_es_mirror.signals import post_entry_index
+        # With a reindex in progress, a single entry is written to both indices using a bulk request.
+        self.elastic.indices = FakeIndices("sp-blog", "sp-blog+pending")
+        indexed = []
+        receiver = lambda sender, **kwargs: indexed.append(kwargs["id"])
+        post_entry_index.connect(receiver, sender="blog")
+        try:
+            with self.assertRaises(TransportError) as raised:
+                Entry(event("publish", "a", 1, title="fail")["body"]).store()
+        finally:
+            post_entry_index.disconnect(receiver)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(indexed, [])
+
+    def test_store_spooled(self):
+        from cf_es_mirror.config import Config
+        from cf_es_mirror.contentful import Entry
+        from cf_es_mirror.transport import Spool
+        self.elastic.indices = FakeIndices("sp-blog", "sp-blog+pending")
+        with tempfile.TemporaryDirectory() as tmp:
+            Config.instance.spool = Spool(os.path.join(tmp, "spool.ndjson"))
+            try:
+                Entry(event("publish", "a", 1, title="busy")["body"]).store()
+                with open(Config.instance.spool.path) as f:
+                    spooled = [json.loads(line) for line in f]
+            finally:
+                Config.instance.spool = None
+        # Rejected as elastic is overloaded, so the write is spooled to try again later.
+        self.assertEqual([line["index"]["_index"] for line in spooled if "index" in line], ["sp-blog", "sp-blog+pending"])
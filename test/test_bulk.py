@@ -0,0 +1,174 @@
+from cf_es_mirror.bulk import BulkController, BulkIndexer
+from cf_es_mirror.contentful.content_type import HASH_FIELD
+from cf_es_mirror.signals import annotate_entry_batch, post_entry_batch_index, pre_entry_batch_index, pre_entry_index
+
+from .base import BaseTestCase
+from .test_batch import FakeElastic, event
+
+
+class BulkSignalsTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+    }
+
+    def setUp(self):
+        from cf_es_mirror.config import Config
+        self.elastic = Config.instance.elastic = FakeElastic()
+
+    def test_no_receivers(self):
+        with BulkIndexer() as indexer:
+            data = event("publish", "a", 1)["body"]
+            indexer.entry(data).publish()
+        # Nothing annotates our documents, so they are sent as is (other than their hash).
+        self.assertEqual(self.elastic.requests[0][1]["fields"], data["fields"])
+        self.assertNotIn(HASH_FIELD, data)
+
+    def test_pre_index_receivers(self):
+        def change(sender, space, id, body):
+            body["fields"]["title"]["en"] = "changed"
+            body["fields"]["extra"] = {"en": 1}
+            body["fields"]["tags"]["en"].append("changed")
+            body["sys"]["changed"] = True
+
+        pre_entry_index.connect(change, sender="blog")
+        try:
+            data = event("publish", "a", 1)["body"]
+            data["fields"]["tags"] = {"en": ["tag"]}
+            with BulkIndexer() as indexer:
+                entry = indexer.entry(data)
+                entry.publish()
+                self.assertEqual(entry.build_body()["fields"], data["fields"])
+        finally:
+            pre_entry_index.disconnect(change)
+
+        # Receivers change the document we send, not the data of the entry.
+        self.assertEqual(self.elastic.requests[0][1]["fields"]["title"]["en"], "changed")
+        self.assertNotEqual(data["fields"]["title"]["en"], "changed")
+        self.assertNotIn("extra", data["fields"])
+        self.assertEqual(data["fields"]["tags"], {"en": ["tag"]})
+        self.assertNotIn("changed", data["sys"])
+
+    def test_pre_batch_index_receivers(self):
+        def change(sender, space, items):
+            for _, _, body in items:
+                body["fields"]["tags"]["en"].append("changed")
+                body["sys"]["changed"] = True
+
+        pre_entry_batch_index.connect(change, sender="blog")
+        try:
+            data = event("publish", "a", 1)["body"]
+            data["fields"]["tags"] = {"en": ["tag"]}
+            with BulkIndexer() as indexer:
+                indexer.entry(data).publish()
+        finally:
+            pre_entry_batch_index.disconnect(change)
+
+        self.assertEqual(self.elastic.requests[0][1]["fields"]["tags"]["en"], ["tag", "changed"])
+        self.assertEqual(data["fields"]["tags"], {"en": ["tag"]})
+        self.assertNotIn("changed", data["sys"])
+
+    def test_batch_signals(self):
+        lookups = []
+        indexed = []
+
+        def annotate(sender, space, items):
+            lookups.append([doc_id for _, doc_id, _ in items])
+            return {doc_id: {"price": len(doc_id)} for _, doc_id, _ in items}
+
+        def post(sender, space, items):
+            indexed.extend((doc_id, body.get("price")) for _, doc_id, body in items)
+
+        annotate_entry_batch.connect(annotate, sender="blog")
+        post_entry_batch_index.connect(post, sender="blog")
+        try:
+            data = event("publish", "a", 1)["body"]
+            with BulkIndexer() as indexer:
+                indexer.entry(data).publish()
+                indexer.entry(event("publish", "bb", 1)["body"]).publish()
+                indexer.entry(event("publish", "c", 1, content_type="blog2")["body"]).publish()
+        finally:
+            annotate_entry_batch.disconnect(annotate)
+            post_entry_batch_index.disconnect(post)
+
+        # One lookup for the whole batch of the content type we are connected to.
+        self.assertEqual(lookups, [["a", "bb"]])
+        self.assertEqual(indexed, [("a", 1), ("bb", 2)])
+        self.assertNotIn("price", data)
+
+    def test_skip_unchanged(self):
+        with BulkIndexer() as indexer:
+            indexer.entry(event("publish", "a", 1)["body"]).publish()
+            indexer.entry(event("publish", "b", 1)["body"]).publish()
+        self.assertEqual(indexer.indexed, 2)
+
+        with BulkIndexer() as indexer:
+            unchanged = indexer.entry(event("publish", "a", 1)["body"])
+            unchanged.publish()
+            indexer.entry(event("publish", "b", 2, title="changed")["body"]).publish()
+        self.assertEqual((indexer.indexed, indexer.skipped, indexer.skip_ratio), (1, 1, 0.5))
+        self.assertEqual(unchanged.result, {"status": 200})
+        self.assertEqual([line["index"]["_id"] for line in self.elastic.requests[-1][::2]], ["b"])
+
+
+class RejectingElastic(FakeElastic):
+    """
+    Rejects documents with a 429 the first `times` times they are sent.
+    """
+
+    def __init__(self, times):
+        super().__init__()
+        self.times = times
+
+    def bulk(self, body, **kwargs):
+        response = super().bulk(body, **kwargs)
+        for item in response["items"]:
+            result = next(iter(item.values()))
+            if self.times.get(result["_id"], 0):
+                self.times[result["_id"]] -= 1
+                result["status"] = 429
+        return response
+
+
+class BulkBackPressureTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+        "ELASTIC_BULK_BACKOFF": 0,
+        "ELASTIC_BULK_RETRIES": 2,
+    }
+
+    def test_controller(self):
+        controller = BulkController(size=100, minimum=50, maximum=200, step=50, max_concurrency=2, target_latency=1)
+        controller.success(0.1)
+        controller.success(0.1)
+        self.assertEqual((controller.size, controller.concurrency), (200, 1))
+        # Only once our requests are as large as we allow, we send more of them at the same time.
+        controller.success(0.1)
+        self.assertEqual((controller.size, controller.concurrency), (200, 2))
+        controller.success(2)
+        self.assertEqual((controller.size, controller.concurrency), (100, 2))
+        controller.reject()
+        self.assertEqual((controller.size, controller.concurrency), (50, 1))
+        self.assertEqual(controller.status()["rejected"], 1)
+
+    def test_retry_rejected(self):
+        from cf_es_mirror.config import Config
+        elastic = Config.instance.elastic = RejectingElastic({"b": 2})
+        entries = []
+        with BulkIndexer(batch_size=10) as indexer:
+            for doc_id in ("a", "b", "c"):
+                entries.append(indexer.entry(event("publish", doc_id, 1)["body"]))
+                entries[-1].publish()
+
+        # Only the rejected document is sent again.
+        self.assertEqual([[line["index"]["_id"] for line in body[::2]] for body in elastic.requests],
+                         [["a", "b", "c"], ["b"], ["b"]])
+        self.assertEqual([entry.result["status"] for entry in entries], [200, 200, 200])
+        self.assertEqual((indexer.indexed, indexer.retried), (3, 2))
+
+        elastic = Config.instance.elastic = RejectingElastic({"a": 5})
+        with BulkIndexer(batch_size=10) as indexer:
+            entry = indexer.entry(event("publish", "a", 2)["body"])
+            entry.publish()
+        self.assertEqual(len(elastic.requests), 3)
+        self.assertEqual(entry.result["status"], 429)
+        self.assertEqual(indexer.failed, 1)
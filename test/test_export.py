@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+
+from .base import BaseTestCase
+
+from cf_es_mirror.config import Config
+from cf_es_mirror.contentful.export import import_export, iter_items, iter_export
+
+
+EXPORT = {
+    "contentTypes": [
+        {"sys": {"id": "article"}, "name": "Article {with] brackets", "fields": [{"id": "title", "type": "Symbol"}]},
+    ],
+    "tags": [],
+    "entries": [
+        {"sys": {"id": "one"}, "fields": {"title": {"en": "A \"quoted\" [title]"}}},
+        {"sys": {"id": "two"}, "fields": {"list": {"en": [{"nested": ["}", "{"]}]}}},
+    ],
+    "locales": [{"code": "en", "default": True}],
+    "webhooks": ["not", "objects"],
+}
+
+
+class FakeEntry:
+    valid = True
+
+    def __init__(self, data, actions):
+        self.document_id = data["sys"]["id"]
+        self.actions = actions
+
+    @property
+    def store_unpublished(self):
+        return Config.instance.ALLOW_UNPUBLISHED
+
+    def __getattr__(self, action):
+        return lambda: self.actions.append((self.document_id, action))
+
+
+class FakeIndexer:
+    """
+    Records what `import_export` does with each entry, rather than writing it.
+    """
+
+    def __init__(self):
+        self.actions = []
+
+    def entry(self, data):
+        return FakeEntry(data, self.actions)
+
+    def flush(self):
+        pass
+
+
+def entry(id, **sys):
+    return {"sys": {"id": id, "type": "Entry", **sys}, "fields": {"title": {"en": id}}}
+
+
+PUBLISH_STATES = {
+    "entries": [
+        entry("published", version=5, publishedVersion=4),
+        entry("draft", version=3),
+        entry("changed", version=7, publishedVersion=4),
+        entry("archived", version=6, publishedVersion=4, archivedVersion=5),
+    ],
+}
+
+
+class ExportTestCase(BaseTestCase):
+    def test_iter_items(self):
+        data = json.dumps(EXPORT).encode()
+        items = list(iter_items(data))
+        self.assertEqual([section for section, _ in items], ["contentTypes", "entries", "entries", "locales"])
+        self.assertEqual([item for _, item in items], [*EXPORT["contentTypes"], *EXPORT["entries"], *EXPORT["locales"]])
+
+    def test_iter_items_sections(self):
+        data = json.dumps(EXPORT, indent=2).encode()
+        items = list(iter_items(data, sections=["entries"]))
+        self.assertEqual([item for _, item in items], EXPORT["entries"])
+
+    def test_iter_export(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(EXPORT, f)
+        try:
+            self.assertEqual(len(list(iter_export(f.name))), 4)
+        finally:
+            os.unlink(f.name)
+
+    def import_export(self, data):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(data, f)
+        try:
+            indexer = FakeIndexer()
+            return import_export(f.name, indexer), indexer.actions
+        finally:
+            os.unlink(f.name)
+
+    def test_import_publish_states(self):
+        Config.instance.ALLOW_UNPUBLISHED = False
+        with self.assertLogs(Config.instance.logger, "WARNING") as logs:
+            result, actions = self.import_export(PUBLISH_STATES)
+        # Drafts are skipped, as are entries whose published version is not in the export.
+        self.assertEqual(result, (0, 2))
+        self.assertEqual(actions, [("published", "publish"), ("archived", "archive")])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("'changed'", logs.output[0])
+
+    def test_import_unpublished(self):
+        Config.instance.ALLOW_UNPUBLISHED = True
+        with self.assertNoLogs(Config.instance.logger, "WARNING"):
+            result, actions = self.import_export(PUBLISH_STATES)
+        self.assertEqual(result, (0, 4))
+        self.assertEqual(actions, [("published", "publish"), ("draft", "save"), ("changed", "publish"),
+                                   ("archived", "archive")])
@@ -0,0 +1,172 @@
+import time
+
+from elasticsearch.exceptions import TransportError
+
+from cf_es_mirror.contentful import ContentType
+
+from .base import BaseTestCase
+
+
+class FakeIndices:
+    def __init__(self):
+        self.deleted = []
+
+    def delete(self, index, **kwargs):
+        self.deleted.append(index)
+
+
+class FakeElastic:
+    def __init__(self):
+        self.indices = FakeIndices()
+        self.updates = []
+
+    def update(self, index, id, body, **kwargs):
+        self.updates.append(body["doc"])
+
+
+class VersionsElastic:
+    """
+    Holds `{index: {id: revision}}`, serving the sorted scans of `cf_es_mirror.reconcile.elastic_items`.
+    """
+
+    def __init__(self, **indices):
+        self.indices = indices
+        self.reindexed = []
+        self.deleted = []
+        self.tasks = FakeTasks()
+
+    def open_point_in_time(self, index, **kwargs):
+        return {"id": index}
+
+    def close_point_in_time(self, **kwargs):
+        pass
+
+    def search(self, body, **kwargs):
+        return {"hits": {"hits": [
+            {"_id": doc_id, "fields": {"sys.revision": [revision]}, "sort": [doc_id]}
+            for doc_id, revision in sorted(self.indices[body["pit"]["id"]].items())
+        ]}}
+
+    def reindex(self, body, **kwargs):
+        self.reindexed.append((body["dest"], body["source"]["query"]["ids"]["values"]))
+        return {"task": "repair"}
+
+    def bulk(self, body, **kwargs):
+        self.deleted.extend(line["delete"]["_id"] for line in body)
+
+
+class FakeTasks:
+    def get(self, task_id, **kwargs):
+        return {"completed": True}
+
+
+class FakeLease:
+    heartbeats = 0
+
+    def heartbeat(self, **kwargs):
+        self.heartbeats += 1
+
+
+class FakeCluster:
+    """
+    Reports the indices as not ready `pending` times, answering with a 408 unless told to ignore it, as elastic does.
+    """
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.requests = []
+
+    def health(self, index, timeout, request_timeout, ignore=(), **kwargs):
+        self.requests.append((timeout, request_timeout))
+        if self.pending:
+            self.pending -= 1
+            if 408 not in ignore:
+                raise TransportError(408, "timed out")
+            return {"timed_out": True}
+        return {"timed_out": False}
+
+
+class WarmElastic:
+    def __init__(self, pending):
+        self.cluster = FakeCluster(pending)
+        self.searches = []
+
+    def search(self, index, body, **kwargs):
+        self.searches.append(kwargs["request_timeout"])
+
+
+def generation(name, age_days):
+    return {"aliases": {name: ["sp-blog"]}, "data": {}, "fingerprint": name, "retired": time.time() - age_days * 86400}
+
+
+class GenerationsTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+        "REINDEX_KEEP_GENERATIONS": 2,
+        "REINDEX_KEEP_DAYS": 7,
+    }
+
+    def test_prune(self):
+        from cf_es_mirror.config import Config
+        elastic = Config.instance.elastic = FakeElastic()
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}})
+        kept = obj.store_generations([generation("c", 0), generation("b", 1), generation("a", 2), generation("old", 8)])
+        # Pruned by count (`a`) as well as by age (`old`).
+        self.assertEqual([item["fingerprint"] for item in kept], ["c", "b"])
+        self.assertEqual(elastic.indices.deleted, ["a", "old"])
+        self.assertEqual(elastic.updates, [{"generations": kept}])
+
+    def test_generation_fingerprint(self):
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}, "fields": [{"id": "title", "type": "Symbol"}]})
+        # What the indices were created with, including the options of their mapping, rather than just their fields.
+        stored = {"fields": [{"id": "title", "type": "Symbol"}], "fingerprint": "abcd1234"}
+        self.assertEqual(obj.generation({"sp-blog-abcd1234": ["sp-blog"]}, stored)["fingerprint"], "abcd1234")
+        self.assertNotIn("fingerprint", obj.generation({}, stored)["data"])
+        self.assertEqual(obj.generation({}, {"fields": [{"id": "title", "type": "Symbol"}]})["fingerprint"], "0d79716d")
+
+    def test_verify(self):
+        from cf_es_mirror.config import Config
+        elastic = Config.instance.elastic = VersionsElastic(
+            old={"a": 2, "b": 1, "d": 3, "e": 1},
+            # `a` was written during the copy, `b` was missed, `c` was removed during the copy and `d` is outdated.
+            new={"a": 3, "c": 1, "d": 2, "e": 1},
+        )
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}})
+        body = {"source": {"index": "old"}, "dest": {"index": "new", "op_type": "create"}, "conflicts": "proceed"}
+        self.assertEqual(obj.verify(FakeLease(), body), 3)
+        # Stragglers are copied again, overwriting what the new index has.
+        self.assertEqual(elastic.reindexed, [({"index": "new"}, ["b", "d"])])
+        self.assertEqual(elastic.deleted, ["c"])
+
+    def test_verify_heartbeat(self):
+        from cf_es_mirror.config import Config
+        Config.instance.elastic = VersionsElastic(old={"a": 1, "b": 1}, new={"a": 1, "b": 1})
+        Config.instance.REINDEX_POLL_INTERVAL = 0
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}})
+        lease = FakeLease()
+        # Nothing to repair, our lease is still kept alive while we scan.
+        self.assertEqual(obj.verify(lease, {"source": {"index": "old"}, "dest": {"index": "new"}}), 0)
+        self.assertGreaterEqual(lease.heartbeats, 2)
+
+    def test_warm(self):
+        from cf_es_mirror.config import Config
+        elastic = Config.instance.elastic = WarmElastic(pending=2)
+        Config.instance.REINDEX_POLL_INTERVAL = 5
+        Config.instance.REINDEX_WARM_TIMEOUT = 60
+        Config.instance.REINDEX_WARM_REQUEST_TIMEOUT = 3
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}})
+        lease = FakeLease()
+        obj.warm(["new"], queries=["title:x"], lease=lease)
+        # We wait in steps, renewing our lease in between, and never time out before elastic does.
+        self.assertEqual(elastic.cluster.requests, [("5s", 6)] * 3)
+        self.assertEqual(lease.heartbeats, 4)
+        self.assertEqual(elastic.searches, [3, 3])
+
+    def test_warm_timeout(self):
+        from cf_es_mirror.config import Config
+        Config.instance.elastic = WarmElastic(pending=1)
+        Config.instance.REINDEX_POLL_INTERVAL = 5
+        Config.instance.REINDEX_WARM_TIMEOUT = 1
+        obj = ContentType({"sys": {"id": "blog", "space": {"sys": {"id": "sp"}}}})
+        with self.assertRaises(TransportError):
+            obj.warm(["new"], lease=FakeLease())
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import threading
+
+from cf_es_mirror.jobs import FAILED, FINISHED, JobRunner, load_jobs
+
+from .base import BaseTestCase
+
+
+class BlockingRunner(JobRunner):
+    """
+    Doesn't touch elastic, records what it ran instead. Blocks until released, so we can queue jobs behind it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.ran = []
+        self.release = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def run(self, job):
+        self.release.wait(5)
+        self.ran.append((job.key, job.action, job.payload))
+        if job.action == "fail":
+            raise ValueError("Failed on purpose")
+        return "done"
+
+
+class JobRunnerTestCase(BaseTestCase):
+    def test_collapse(self):
+        runner = BlockingRunner(workers=2)
+        runner.enqueue("sp.blog", "publish", {"v": 1})
+        # Wait for the first job to be picked up, the next ones have to queue up behind it.
+        while not runner.running:
+            threading.Event().wait(0.01)
+        for version in range(2, 6):
+            runner.enqueue("sp.blog", "publish", {"v": version})
+        runner.enqueue("sp.blog", "unpublish", {"v": 6})
+        self.assertEqual(len(runner.queued), 1)
+        runner.release.set()
+        self.assertTrue(runner.wait(5))
+        self.assertEqual(runner.ran, [("sp.blog", "publish", {"v": 1}), ("sp.blog", "unpublish", {"v": 6})])
+
+    def test_status(self):
+        runner = BlockingRunner(workers=1)
+        runner.release.set()
+        runner.enqueue("sp.blog", "publish", {})
+        runner.enqueue("sp.page", "fail", {})
+        self.assertTrue(runner.wait(5))
+        status = runner.status()
+        self.assertEqual(status["queued"], [])
+        self.assertEqual([(job["key"], job["state"]) for job in status["finished"]],
+                         [("sp.page", FAILED), ("sp.blog", FINISHED)])
+        self.assertEqual(status["finished"][0]["error"], "Failed on purpose")
+
+    def test_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, "jobs.sqlite")
+            runner = BlockingRunner(workers=1, database=database)
+            runner.release.set()
+            runner.enqueue("sp.blog", "publish", {"v": 1})
+            self.assertTrue(runner.wait(5))
+            status = load_jobs(database)
+            self.assertEqual([(job["key"], job["state"], job["result"]) for job in status["finished"]],
+                             [("sp.blog", FINISHED, "done")])
+
+            # Jobs of a process that is still alive are left to it.
+            with runner.connect() as db:
+                db.execute("UPDATE jobs SET state = 'running'")
+            alive = BlockingRunner(workers=1, database=database)
+            self.assertEqual(alive.queued, {})
+            self.assertEqual(load_jobs(database)["running"][0]["owner"], runner.owner)
+
+            # Jobs that were queued when a process stopped are picked up by the next.
+            with runner.connect() as db:
+                db.execute("UPDATE jobs SET state = 'queued', heartbeat = 0")
+            recovered = BlockingRunner(workers=1, database=database)
+            recovered.release.set()
+            self.assertTrue(recovered.wait(5))
+            self.assertEqual(recovered.ran, [("sp.blog", "publish", {"v": 1})])
+            self.assertEqual(load_jobs(database)["finished"][0]["owner"], recovered.owner)
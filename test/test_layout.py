@@ -0,0 +1,181 @@
+from .base import BaseTestCase, config
+
+from cf_es_mirror.contentful.content_type import (
+    ALL_FIELD_PREFIX, FALLBACK_FIELD, ContentType, field_profile, fill_fallbacks, get_language_analyzer, localize_body,
+    per_language_field, shard_count,
+)
+
+
+class LayoutTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "LANGUAGES": ["en", "de"],
+        "DEFAULT_LANGUAGE": "en",
+        "INDEX_LAYOUT": "per_locale",
+        "SHARD_TARGET_SIZE": 1,
+        "SHARD_TARGET_DOCS": 1000,
+        "AUTO_SHARDS": True,
+        "MIN_SHARDS": 1,
+        "MAX_SHARDS": 4,
+    }
+
+    def test_index_family(self):
+        self.assertEqual(config.index_family("article", space="space"), [("space-article-en", "en"), ("space-article-de", "de")])
+
+    def test_localize_body(self):
+        body = {"sys": {"id": "x"}, "fields": {"title": {"en": "Hello", "de": "Hallo"}, "count": {"en": 1}}}
+        self.assertEqual(localize_body(body, "de"), {"sys": {"id": "x"}, "fields": {"title": {"de": "Hallo"}, "count": {"en": 1}}, "locale": "de"})
+        self.assertEqual(localize_body(body, "en")["fields"], {"title": {"en": "Hello"}, "count": {"en": 1}})
+
+    def test_per_locale_mapping(self):
+        self.assertEqual(set(per_language_field({"type": "Text", "localized": True}, locale="de")["properties"]), {"de", "en"})
+        self.assertEqual(set(per_language_field({"type": "Text"}, locale="de")["properties"]), {"en"})
+        self.assertEqual(set(per_language_field({"type": "Text", "localized": True})["properties"]), {"en", "de"})
+
+    def test_shard_count(self):
+        self.assertEqual(shard_count(0, 0), 1)
+        self.assertEqual(shard_count(2500, 0), 3)
+        self.assertEqual(shard_count(10, 2 * 1024 ** 3 + 1), 3)
+        self.assertEqual(shard_count(10 ** 6, 0), 4)
+
+    def test_shard_count_configured(self):
+        from cf_es_mirror.config import Config
+        # Sizing a large index on its contents never gives it less shards than configured.
+        Config.instance.NUMBER_OF_SHARDS = 3
+        Config.instance.MIN_SHARDS = None
+        Config.instance.SHARD_TARGET_SIZE = 30
+        Config.instance.SHARD_TARGET_DOCS = 50000000
+        Config.instance.MAX_SHARDS = 16
+        try:
+            self.assertEqual(shard_count(2 * 10 ** 6, 5 * 1024 ** 3), 3)
+            self.assertEqual(shard_count(10 ** 9, 0), 16)
+        finally:
+            self.setUpClass()
+
+    def test_fingerprint_options(self):
+        from cf_es_mirror.config import Config
+        obj = ContentType({"sys": {"id": "article", "space": {"sys": {"id": "space"}}}, "fields": [{"id": "title", "type": "Symbol"}]})
+        # Each of these adds fields to our mapping, so changing them has to give us new indices.
+        for setting in ("SKIP_UNCHANGED", "LOCALE_FALLBACKS", "EAGER_GLOBAL_ORDINALS"):
+            with self.subTest(setting=setting):
+                before = obj.fingerprint
+                enabled = getattr(Config.instance, setting)
+                setattr(Config.instance, setting, not enabled)
+                try:
+                    self.assertNotEqual(obj.fingerprint, before)
+                finally:
+                    setattr(Config.instance, setting, enabled)
+                self.assertEqual(obj.fingerprint, before)
+
+    def test_plan_shards(self):
+        class FakeIndices:
+            def stats(self, index, **kwargs):
+                return {"indices": {"space-article-1": {"primaries": {"docs": {"count": 1500}, "store": {"size_in_bytes": 10}}}}}
+
+        class FakeElastic:
+            indices = FakeIndices()
+
+        from cf_es_mirror.config import Config
+        Config.instance.elastic = FakeElastic()
+        obj = ContentType({"sys": {"id": "article", "space": {"sys": {"id": "space"}}}})
+        # Going from the "combined" layout, each locale gets all documents.
+        obj.existing_aliases = {"space-article-1": ["space-article"]}
+        self.assertEqual(obj.plan_shards(), {"space-article-en": (2, 1500, 5), "space-article-de": (2, 1500, 5)})
+        obj.existing_aliases = {}
+        self.assertEqual(obj.plan_shards()["space-article-en"], (config.NUMBER_OF_SHARDS, None, None))
+
+
+class ProfilesTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "INDEX_PROFILE": "fulltext",
+        "INDEX_PROFILES": {"article": "fuzzy", "article.summary": "minimal"},
+    }
+
+    def test_field_profile(self):
+        marked = {"id": "body", "type": "Text", "validations": [{"size": {"max": 10}, "message": "Too long [index:full]"}]}
+        self.assertEqual(field_profile("article", {"id": "summary", "type": "Text"}), "minimal")
+        self.assertEqual(field_profile("article", marked), "full")
+        self.assertEqual(field_profile("article", {"id": "title", "type": "Text"}), "fuzzy")
+        self.assertEqual(field_profile("page", {"id": "title", "type": "Text"}), "fulltext")
+
+    def test_profiles(self):
+        text = {"type": "text"}
+        self.assertEqual(get_language_analyzer("en", text, profile="minimal"), {"type": "text", "fields": {}})
+        self.assertEqual(get_language_analyzer("en", text, profile="fulltext"), {"type": "text", "fields": {}, "analyzer": "english"})
+        self.assertEqual(set(get_language_analyzer("en", text, profile="fuzzy")["fields"]), {"trigrams"})
+        self.assertEqual(get_language_analyzer("en", text, profile="full")["term_vector"], "with_positions_offsets")
+
+
+class AllFieldsTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "LANGUAGES": ["en", "de"],
+        "DEFAULT_LANGUAGE": "en",
+        "ALL_FIELDS": ["article"],
+    }
+
+    def content_type(self, document_id):
+        return ContentType({
+            "sys": {"id": document_id, "type": "ContentType", "space": {"sys": {"id": "space"}}},
+            "fields": [
+                {"id": "title", "type": "Symbol", "localized": True},
+                {"id": "code", "type": "Symbol"},
+                {"id": "rating", "type": "Number", "localized": True},
+            ],
+        })
+
+    def test_all_fields(self):
+        properties = self.content_type("article").build_mapping()["properties"]
+        fields = properties["fields"]["properties"]
+        self.assertEqual(properties[f"{ALL_FIELD_PREFIX}de"]["analyzer"], "german")
+        self.assertEqual(fields["title"]["properties"]["de"]["copy_to"], [f"{ALL_FIELD_PREFIX}de"])
+        self.assertEqual(fields["code"]["properties"]["en"]["copy_to"], [f"{ALL_FIELD_PREFIX}en", f"{ALL_FIELD_PREFIX}de"])
+        self.assertNotIn("copy_to", fields["rating"]["properties"]["en"])
+
+        properties = self.content_type("article").build_mapping(locale="de")["properties"]
+        self.assertEqual([name for name in properties if name.startswith(ALL_FIELD_PREFIX)], [f"{ALL_FIELD_PREFIX}de"])
+
+        properties = self.content_type("page").build_mapping()["properties"]
+        self.assertFalse([name for name in properties if name.startswith(ALL_FIELD_PREFIX)])
+        self.assertNotEqual(self.content_type("article").fingerprint, self.content_type("page").fingerprint)
+
+
+class FallbacksTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "LANGUAGES": ["en", "de", "de-CH", "fr"],
+        "DEFAULT_LANGUAGE": "en",
+        "LOCALE_FALLBACKS": True,
+    }
+
+    def test_fallback_chains(self):
+        class FakeClient:
+            calls = 0
+
+            def raw_locales(self):
+                self.calls += 1
+                return [
+                    {"code": "en", "fallbackCode": None},
+                    {"code": "de", "fallbackCode": "en"},
+                    {"code": "de-CH", "fallbackCode": "de"},
+                    {"code": "fr"},
+                ]
+
+        client = FakeClient()
+        previous = config.clients.get(config.SPACE_ID, None)
+        config.clients[config.SPACE_ID] = client
+        try:
+            self.assertEqual(config.fallback_chains(), {"de": ["en"], "de-CH": ["de", "en"]})
+            config.fallback_chains()
+            self.assertEqual(client.calls, 1)
+        finally:
+            config.clients.pop(config.SPACE_ID)
+            if previous is not None:
+                config.clients[config.SPACE_ID] = previous
+            config.locale_fallbacks.pop(config.SPACE_ID, None)
+
+    def test_fill_fallbacks(self):
+        body = {"fields": {"title": {"en": "Title", "de": "Titel"}, "code": {"en": "x"}}}
+        filled = fill_fallbacks(body, ["title"], {"de": ["en"], "de-CH": ["de", "en"]})
+        self.assertEqual(filled["fields"]["title"], {"en": "Title", "de": "Titel", "de-CH": "Titel"})
+        self.assertEqual(filled["fields"]["code"], {"en": "x"})
+        self.assertEqual(filled[FALLBACK_FIELD], ["title.de-CH"])
+        self.assertNotIn("de-CH", body["fields"]["title"])
+        self.assertIs(fill_fallbacks(body, ["title"], {"fr": ["it"]}), body)
@@ -0,0 +1,47 @@
+from .base import BaseTestCase, config
+
+from cf_es_mirror.contentful import links
+from cf_es_mirror.contentful.links import EntryCache
+
+
+def link(doc_id):
+    return {"sys": {"type": "Link", "linkType": "Entry", "id": doc_id}}
+
+
+class FakeEntry:
+    space = "space"
+    content_type = "article"
+
+
+class LinksTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "DENORMALIZE": {"article.author": ["name"]},
+    }
+
+    def test_cache_bounds(self):
+        cache = EntryCache(size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        # "b" was the least recently used item
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_cache_ttl(self):
+        cache = EntryCache(size=2, ttl=-1)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_links_for(self):
+        self.assertEqual(links.links_for("article"), {"author": ["name"]})
+        self.assertEqual(links.links_for("author"), {})
+
+    def test_denormalize(self):
+        links.get_cache().put(("space", "bob"), {"fields": {"name": {"en": "Bob"}, "bio": {"en": "..."}}})
+        body = {"fields": {"author": {"en": link("bob"), "nl": [link("bob"), {"sys": {"type": "Link", "linkType": "Asset", "id": "x"}}]}}}
+        self.assertEqual(links.denormalize(FakeEntry(), body), ["bob"])
+        self.assertEqual(body["fields"]["author"]["en"]["fields"], {"name": {"en": "Bob"}})
+        self.assertEqual(body["fields"]["author"]["nl"][0]["fields"], {"name": {"en": "Bob"}})
+        self.assertNotIn("fields", body["fields"]["author"]["nl"][1])
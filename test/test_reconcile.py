@@ -0,0 +1,117 @@
+from .base import BaseTestCase
+from .test_batch import FakeElastic, FakeIndices, event
+
+from cf_es_mirror.bulk import BulkIndexer
+from cf_es_mirror.reconcile import Reconciler, merge_join, sorted_items, unique
+
+
+class ReconcileTestCase(BaseTestCase):
+    def test_sorted_items_spills(self):
+        items = [(f"id{i % 7}{i}", i, "ct") for i in range(50)]
+        self.assertEqual(list(sorted_items(items, chunk_size=8)), sorted(items))
+        self.assertEqual(list(sorted_items(items)), sorted(items))
+
+    def test_merge_join(self):
+        left = [("a", 1, "ct"), ("b", 2, "ct"), ("d", 1, "ct")]
+        right = [("b", 1, "ct"), ("c", 1, "ct"), ("d", 1, "ct")]
+        self.assertEqual([(doc_id, a is not None, b is not None) for doc_id, a, b in merge_join(left, right)], [
+            ("a", True, False),
+            ("b", True, True),
+            ("c", False, True),
+            ("d", True, True),
+        ])
+
+    def test_unique(self):
+        self.assertEqual(list(unique([("a", 1, "ct"), ("a", 1, "ct"), ("b", 1, "ct")])), [("a", 1, "ct"), ("b", 1, "ct")])
+
+
+class ReconcileIndices(FakeIndices):
+    def exists_alias(self, name, **kwargs):
+        return name in self.aliases
+
+
+class ReconcileElastic(FakeElastic):
+    """
+    Serves the sorted scans of `cf_es_mirror.reconcile.elastic_items` from the documents written to it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.indices = ReconcileIndices()
+
+    def open_point_in_time(self, index, **kwargs):
+        return {"id": index}
+
+    def close_point_in_time(self, **kwargs):
+        pass
+
+    def search(self, body, **kwargs):
+        hits = []
+        for (index, doc_id), document in sorted(self.documents.items()):
+            if index == body["pit"]["id"]:
+                fields = {"sys.id": [doc_id]}
+                if "revision" in document["sys"]:
+                    fields["sys.revision"] = [document["sys"]["revision"]]
+                hits.append({"_id": doc_id, "fields": fields, "sort": [doc_id]})
+        return {"hits": {"hits": hits}}
+
+
+class FakePage(list):
+    @property
+    def items(self):
+        return self
+
+    @property
+    def total(self):
+        return len(self)
+
+
+class FakeItem:
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class FakeClient:
+    """
+    Has the given `{id: revision}` entries, as the delivery API does.
+    """
+
+    def __init__(self, revisions):
+        self.revisions = revisions
+
+    def entries(self, query):
+        return FakePage(FakeItem({"sys": {"id": doc_id, "revision": revision, "contentType": {"sys": {"id": "blog"}}}})
+                        for doc_id, revision in sorted(self.revisions.items())[query["skip"]:])
+
+
+class BlogReconciler(Reconciler):
+    def content_types(self):
+        return {"blog"}
+
+
+class ReconcileWebhookTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+        "SPACE_TOKENS": {"sp": "token"},
+    }
+
+    def test_webhook_documents(self):
+        from cf_es_mirror.config import Config
+        elastic = Config.instance.elastic = ReconcileElastic()
+        # Management API payloads count every change in `version`, their publishes in `publishedCounter`.
+        up_to_date = event("publish", "a", 9)["body"]
+        up_to_date["sys"]["publishedCounter"] = 4
+        outdated = event("publish", "b", 2)["body"]
+        outdated["sys"]["publishedCounter"] = 1
+        with BulkIndexer() as indexer:
+            indexer.entry(up_to_date).publish()
+            indexer.entry(outdated).publish()
+        self.assertEqual(elastic.documents[("sp-blog", "a")]["sys"]["revision"], 4)
+        self.assertNotIn("revision", up_to_date["sys"])
+
+        Config.instance.clients["sp"] = FakeClient({"a": 4, "b": 2})
+        try:
+            stats = BlogReconciler("sp", None, dry_run=True).run()
+        finally:
+            Config.instance.clients.pop("sp")
+        self.assertEqual(stats, {"checked": 2, "missing": 0, "stale": 1, "orphaned": 0})
@@ -0,0 +1,53 @@
+from cf_es_mirror.contentful.content_type import ContentType
+from cf_es_mirror.contentful.richtext import add_rich_text, extract_text
+
+from .base import BaseTestCase
+
+
+def text(value):
+    return {"nodeType": "text", "value": value, "marks": [], "data": {}}
+
+
+def node(node_type, *content):
+    return {"nodeType": node_type, "content": list(content), "data": {}}
+
+
+class RichTextTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "LANGUAGES": ["en", "de"],
+        "DEFAULT_LANGUAGE": "en",
+        "RICH_TEXT_SEARCH": True,
+        "RICH_TEXT_SOURCE": False,
+    }
+
+    def test_extract_text(self):
+        document = node(
+            "document",
+            node("heading-1", text("Title")),
+            node("paragraph", text("Some "), text("bold"), text(" text, "), node("hyperlink", text("a link")), text(".")),
+            node("embedded-entry-block"),
+            node("unordered-list", node("list-item", node("paragraph", text("one"))), node("list-item", node("paragraph", text("two  ")))),
+        )
+        self.assertEqual(extract_text(document), "Title Some bold text, a link. one two")
+        self.assertEqual(extract_text(None), "")
+
+    def test_deeply_nested(self):
+        document = text("deep")
+        for _ in range(100000):
+            document = node("blockquote", document)
+        self.assertEqual(extract_text(node("document", document)), "deep")
+
+    def test_add_rich_text(self):
+        body = {"fields": {"body": {"en": node("document", node("paragraph", text("Hello")))}, "title": {"en": "x"}}}
+        self.assertEqual(add_rich_text(body, ["body"])["fields"]["body-text"], {"en": "Hello"})
+        self.assertNotIn("body-text", body["fields"])
+        self.assertIs(add_rich_text(body, ["missing"]), body)
+
+    def test_mapping(self):
+        ct = ContentType({
+            "sys": {"id": "article", "type": "ContentType", "space": {"sys": {"id": "space"}}},
+            "fields": [{"id": "body", "type": "RichText", "localized": True}],
+        })
+        built = ct.build_mapping()
+        self.assertEqual(built["properties"]["fields"]["properties"]["body-text"]["properties"]["de"]["analyzer"], "german")
+        self.assertIn("fields.body", built["_source"]["excludes"])
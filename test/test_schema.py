@@ -0,0 +1,86 @@
+from cf_es_mirror.contentful import ContentType, Entry
+from cf_es_mirror.contentful.content_type import REINDEX_UNCHANGED
+from cf_es_mirror.contentful.schema import SchemaRegistry, update_content_types
+
+from .base import BaseTestCase
+from .test_sync import FakeClient, response
+
+
+def content_type(ct_id, fields=None):
+    return {
+        "sys": {"id": ct_id, "type": "ContentType", "space": {"sys": {"id": "sp"}}},
+        "fields": fields or [{"id": "title", "type": "Symbol"}],
+    }
+
+
+class FakeIndices:
+    def __init__(self, elastic):
+        self.elastic = elastic
+
+    def get_alias(self, index, **kwargs):
+        self.elastic.requests.append(("get_alias", index))
+        return {f"{alias}-0d79716d": {"aliases": {alias: {}}} for alias in self.elastic.aliases}
+
+
+class FakeElastic:
+    """
+    Holds the documents of the content types index, and the aliases of our indices.
+    """
+
+    def __init__(self, documents, aliases=("sp-blog", "sp-page")):
+        self.documents = documents
+        self.aliases = aliases
+        self.indices = FakeIndices(self)
+        self.requests = []
+
+    def search(self, index, body, **kwargs):
+        self.requests.append(("search", index))
+        return {"hits": {"hits": [
+            {"_id": ct_id, "_source": {k: v for k, v in source.items() if k in body["_source"]}}
+            for ct_id, source in self.documents.items()
+        ]}}
+
+    def get(self, index, id, **kwargs):
+        self.requests.append(("get", index, id))
+        if id not in self.documents:
+            return {"_id": id, "found": False}
+        return {"_id": id, "found": True, "_source": self.documents[id]}
+
+
+class ContentTypesClient(FakeClient):
+    CONTENT_TYPES = [content_type("blog"), content_type("page")]
+
+    def _http_get(self, url, query):
+        self.queries.append(dict(query))
+        return response({"items": self.CONTENT_TYPES, "total": len(self.CONTENT_TYPES)})
+
+
+class SchemaTestCase(BaseTestCase):
+    EXTRA_SETTINGS = {
+        "ACCEPTED_SPACE_IDS": ["sp"],
+    }
+
+    def test_update_unchanged(self):
+        from cf_es_mirror.config import Config
+        blog, page = (ContentType(data) for data in ContentTypesClient.CONTENT_TYPES)
+        elastic = Config.instance.elastic = FakeElastic({
+            "blog": {**blog.data, "fingerprint": blog.fingerprint, "targets": blog.targets},
+            "page": {**page.data, "fingerprint": page.fingerprint, "targets": page.targets},
+        })
+        results = update_content_types(ContentTypesClient())
+        self.assertEqual(results, {"blog": REINDEX_UNCHANGED, "page": REINDEX_UNCHANGED})
+        # A request for our fingerprints and one for our aliases tell us nothing changed.
+        self.assertEqual(elastic.requests, [("search", "sp-_content-types"), ("get_alias", "sp-*")])
+
+    def test_cached_schema(self):
+        from cf_es_mirror.config import Config
+        registry = SchemaRegistry()
+        elastic = Config.instance.elastic = FakeElastic({"blog": content_type("blog")})
+        self.assertEqual(registry.get("sp", "blog")["fields"], [{"id": "title", "type": "Symbol"}])
+        self.assertIsNone(registry.get("sp", "page"))
+        registry.get("sp", "blog")
+        registry.get("sp", "page")
+        self.assertEqual(len(elastic.requests), 2)
+
+        entry = Entry({"sys": {"id": "a", "space": {"sys": {"id": "sp"}}, "contentType": {"sys": {"id": "blog"}}}})
+        self.assertEqual(entry.schema["sys"]["id"], "blog")
@@ -0,0 +1,22 @@
+from decimal import Decimal
+
+from cf_es_mirror import serializer
+from cf_es_mirror.serializer import JSONSerializer
+
+from .base import BaseTestCase, config
+
+
+class SerializerTestCase(BaseTestCase):
+    def test_round_trip(self):
+        data = {"sys": {"id": "a"}, "fields": {"title": {"en": "Ünïcode"}, "price": {"en": Decimal("1.5")}}}
+        for codec in ("json", "orjson"):
+            with self.subTest(codec=codec):
+                config.instance.SERIALIZER = codec
+                es = JSONSerializer()
+                self.assertEqual(es.loads(es.dumps(data)), {**data, "fields": {**data["fields"], "price": {"en": 1.5}}})
+                self.assertEqual(serializer.loads(serializer.dumps({"a": [1, None]}).encode()), {"a": [1, None]})
+                self.assertEqual(es.dumps('{"raw": true}'), '{"raw": true}')
+
+    def test_fingerprint(self):
+        # Existing indices are named after this, so it must never change.
+        self.assertEqual(serializer.fingerprint([{"id": "title", "type": "Symbol"}]), "0d79716d")
@@ -0,0 +1,84 @@
+import json
+import unittest
+
+import requests
+
+from cf_es_mirror.contentful import Client
+
+
+def response(data):
+    result = requests.Response()
+    result.status_code = 200
+    result._content = json.dumps(data).encode()
+    return result
+
+
+class FakeClient(Client):
+    """
+    Serves sync pages from memory.
+    """
+
+    PAGES = {
+        None: {"items": [
+            {"sys": {"type": "Entry", "id": "a"}},
+            {"sys": {"type": "Asset", "id": "b"}},
+        ], "nextPageUrl": "https://cdn.contentful.com/spaces/sp/environments/master/sync?sync_token=page2"},
+        "page2": {"items": [
+            {"sys": {"type": "DeletedEntry", "id": "c"}},
+        ], "nextSyncUrl": "https://cdn.contentful.com/spaces/sp/environments/master/sync?sync_token=done"},
+    }
+
+    def __init__(self):
+        super().__init__("sp", "token", content_type_cache=False)
+        self.queries = []
+
+    def _http_get(self, url, query):
+        self.queries.append(dict(query))
+        return response(self.PAGES[query.get("sync_token")])
+
+
+class RawSyncTestCase(unittest.TestCase):
+    def test_pages(self):
+        client = FakeClient()
+        sync = client.raw_sync({"initial": True})
+        self.assertEqual([(kind, item["sys"]["id"]) for kind, item in sync],
+                         [("Entry", "a"), ("Asset", "b"), ("DeletedEntry", "c")])
+        self.assertEqual(sync.next_sync_token, "done")
+        self.assertEqual(client.queries, [{"initial": "true"}, {"sync_token": "page2"}])
+
+    def test_lazy(self):
+        client = FakeClient()
+        pages = client.raw_sync({"initial": True}).pages()
+        next(pages)
+        # The next page is only fetched once we get to it.
+        self.assertEqual(len(client.queries), 1)
+
+
+class FakeIndexer:
+    def __init__(self):
+        self.published = []
+        self.flushes = 0
+
+    def entry(self, data):
+        indexer = self
+
+        class FakeEntry:
+            valid = data["sys"]["type"] == "Entry"
+
+            def publish(self):
+                indexer.published.append(data["sys"]["id"])
+        return FakeEntry()
+
+    def flush(self):
+        self.flushes += 1
+
+
+class BackfillTestCase(unittest.TestCase):
+    def test_backfill(self):
+        from cf_es_mirror.contentful.sync import backfill_content_type
+        client = FakeClient()
+        indexer = FakeIndexer()
+        self.assertEqual(backfill_content_type(client, "blog", indexer), 1)
+        self.assertEqual(indexer.published, ["a"])
+        self.assertEqual(indexer.flushes, 2)
+        self.assertEqual(client.queries[0], {"initial": "true", "type": "Entry", "content_type": "blog"})
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from elasticsearch import Transport as BaseTransport
+from elasticsearch.exceptions import ConnectionTimeout, SerializationError, TransportError
+
+from cf_es_mirror.transport import SPOOL_VERSION, CircuitBreaker, Spool, Transport, overloaded, spool_delete
+
+from .base import BaseTestCase
+
+
+class FakeElastic:
+    """
+    Rejects the documents in `reject` with a 429, accepts everything else.
+    """
+
+    def __init__(self, reject=(), versions=None):
+        self.reject = set(reject)
+        self.versions = versions or {}
+        self.requests = []
+
+    def mget(self, body, **kwargs):
+        return {"docs": [
+            {"_id": doc["_id"], "found": True, "_source": {"sys": {"revision": self.versions[doc["_id"]]}}}
+            if doc["_id"] in self.versions else {"_id": doc["_id"], "found": False}
+            for doc in body["docs"]
+        ]}
+
+    def bulk(self, body, **kwargs):
+        self.requests.append(body)
+        items = []
+        for line in body:
+            if "index" in line or "delete" in line:
+                op_type, meta = next(iter(line.items()))
+                items.append({op_type: {"_id": meta["_id"], "status": 429 if meta["_id"] in self.reject else 200}})
+        return {"items": items}
+
+
+class TransportTestCase(BaseTestCase):
+    def test_breaker(self):
+        breaker = CircuitBreaker(threshold=2, reset_after=0.05)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        # A single request may test whether elastic recovered.
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.success()
+        self.assertTrue(breaker.allow())
+
+    def test_breaker_transport(self):
+        breaker = CircuitBreaker(threshold=1, reset_after=0)
+        transport = Transport([{"host": "localhost"}], breaker=breaker)
+        with mock.patch.object(BaseTransport, "perform_request", side_effect=ConnectionTimeout("TIMEOUT", "timed out", None)):
+            with self.assertRaises(ConnectionTimeout):
+                transport.perform_request("GET", "/_search")
+        # Elastic not answering in time counts against it.
+        self.assertTrue(breaker.open)
+        with mock.patch.object(BaseTransport, "perform_request", side_effect=SerializationError("bad")):
+            with self.assertRaises(SerializationError):
+                transport.perform_request("GET", "/_search")
+        # The probe did not tell us anything, the next request may try again.
+        self.assertTrue(breaker.allow())
+
+    def test_overloaded(self):
+        self.assertTrue(overloaded(TransportError(429, "es_rejected_execution_exception")))
+        self.assertFalse(overloaded(TransportError(400, "mapper_parsing_exception")))
+
+    def test_operation(self):
+        self.assertEqual(Transport.operation("POST", "/_bulk"), "bulk")
+        self.assertEqual(Transport.operation("POST", "/_aliases"), "alias")
+        self.assertEqual(Transport.operation("GET", "/_tasks/node:1"), "task")
+        self.assertEqual(Transport.operation("PUT", "/space-blog/_doc/a"), "write")
+        self.assertIsNone(Transport.operation("POST", "/space-blog/_search"))
+
+    def test_spool(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spool = Spool(os.path.join(tmp, "spool.ndjson"))
+            spool.append([{"index": {"_index": "blog", "_id": "a"}}, {"title": "a"}, {"delete": {"_index": "blog", "_id": "b"}}])
+            spool.append([{"index": {"_index": "blog", "_id": "c"}}, {"title": "c"}])
+
+            elastic = FakeElastic(reject=["c"])
+            self.assertEqual(spool.replay(elastic, batch_size=2), 2)
+            self.assertEqual([len(body) for body in elastic.requests], [3, 2])
+            # Rejected writes stay spooled.
+            elastic = FakeElastic()
+            self.assertEqual(spool.replay(elastic), 1)
+            self.assertEqual(elastic.requests, [[{"index": {"_index": "blog", "_id": "c"}}, {"title": "c"}]])
+            self.assertEqual(spool.replay(elastic), 0)
+
+    def test_spool_outdated(self):
+        def index(doc_id, revision):
+            return [{"index": {"_index": "blog", "_id": doc_id}}, {"sys": {"id": doc_id, "revision": revision}}]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            spool = Spool(os.path.join(tmp, "spool.ndjson"))
+            spool.append(index("a", 1) + index("b", 2) + index("a", 2))
+            spool.append([spool_delete({"delete": {"_index": "blog", "_id": "c"}}, 3)])
+            # `b` and `c` were written again after elastic recovered.
+            elastic = FakeElastic(versions={"a": 1, "b": 3, "c": 4})
+            self.assertEqual(spool.replay(elastic), 1)
+            # Only the last action of `a` is replayed, and our version is not sent to elastic.
+            self.assertEqual(elastic.requests, [index("a", 2)])
+            self.assertNotIn(SPOOL_VERSION, str(elastic.requests))